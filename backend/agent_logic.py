@@ -6,6 +6,7 @@ Contains all research and planning tools used by the orchestrator and the main a
 from langchain_core.tools import tool
 from tavily import TavilyClient
 import os
+import re
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -124,6 +125,10 @@ Return ONLY the number (integer)."""
         return 2500
 
 
+# Rupee amounts written as ₹1200, Rs. 1200 or INR 1200
+_FARE_RUPEE_RE = re.compile(r'(?:₹|\bRs\.?|\bINR)\s*(\d{1,6})')
+
+
 def estimate_transport_cost(origin: str, destination: str, num_people: int) -> float:
     """
     Estimates round-trip transportation cost from origin to destination using Tavily search.
@@ -146,13 +151,12 @@ def estimate_transport_cost(origin: str, destination: str, num_people: int) -> f
         )
         
         # Extract content and look for prices
-        import re
         all_prices = []
         for result in response.get('results', []):
             content = result.get('content', '')
             # Find rupee amounts
-            rupee_matches = re.findall(r'[₹Rs\.]\s*(\d{1,6})', content)
-            all_prices.extend([int(m) for m in rupee_matches if 500 <= int(m) <= 50000])
+            rupee_matches = _FARE_RUPEE_RE.findall(content)
+            all_prices.extend(v for m in rupee_matches if 500 <= (v := int(m)) <= 50000)
         
         if all_prices:
             # Use median of found prices as estimate
@@ -554,6 +558,305 @@ def get_quick_transport_options(from_location: str, to_location: str, city: str)
         return f"⚠️ Could not fetch transport options: {str(e)}"
 
 
+# ============================================================================
+# STYLE REFERENCE TOOLS (Loaded by the planning agent on demand)
+# ============================================================================
+
+# Worked examples kept out of the planning prompt so they are only paid for
+# when the agent asks for them.
+
+# Fully worked itinerary day.
+STYLE_EXAMPLE_DAY_ITINERARY = """\
+## 📅 Day 1: Arrival & North Goa Beach Exploration
+
+![Goa Beaches](https://source.unsplash.com/1600x900/?goa,beach,sunset)
+
+### Morning: Smooth Arrival & Strategic Check-in (9:00 AM - 1:00 PM)
+
+✈️ **Arrival at Goa International Airport (Dabolim)**
+Your flight touches down around 9:00 AM. Exit through Arrivals (Terminal 1).
+
+🚗 **Airport → Hotel Transfer**
+**Transport**: Pre-booked Ola/Uber to Calangute (avoid airport taxis - overpriced)
+**Cost**: ₹800-1000 for sedan (35 km, 50 minutes)
+**💡 Pro Tip**: Book cab while still in airport WiFi zone for better rates
+
+🏨 **Check-in: Seashell Suites & Villas** (Calangute Beach Road)
+**Why I chose this property** (researched 6 hotels in your budget range):
+- ❌ Rejected: Baga Beach Resort (₹4500 - over budget, noisy party area)
+- ❌ Rejected: Candolim Inn (₹2500 - 3km from beach, poor reviews 2.9★)
+- ❌ Rejected: Anjuna Hostel (₹1200 - too basic for your comfort level)
+- ✅ **Selected: Seashell Suites** - ₹3200/night
+
+**What makes it perfect**:
+- Location: 400m walk to Calangute Beach (best beach in North Goa for families)
+- Reviews: 4.4★ on Google (730 reviews), guests praise cleanliness
+- Included: Complimentary breakfast (saves ₹400/day), pool access, beach towels
+- Value analysis: Breakfast included means actual cost = ₹2800/night vs competitors
+
+**📱 [Book Seashell Suites on MakeMyTrip](https://www.makemytrip.com/hotels/seashell_suites_villas-details-goa.html)**
+
+**Check-in logistics**:
+- Standard check-in: 2:00 PM (request early if available)
+- Documents needed: ID proof, booking confirmation
+- 💡 **Insider tip**: Ask for sea-facing room on 2nd floor (best view, same price)
+
+**Quick Refresh & Lunch** (1:00 PM - 2:30 PM)
+
+After check-in, quick shower and change for beach exploration.
+
+🍽️ **Lunch: Pousada by the Beach** (5-min walk from hotel)
+**Why here over other options**:
+- Researched 8 restaurants in Calangute
+- Pousada: Authentic Goan-Portuguese fusion, locals' favorite
+- Compared to: Brittos (touristy, inflated prices), Souza Lobo (good but ₹800 more expensive)
+
+**What to order** (tested & recommended):
+- **Goan Fish Curry with Rice** (₹380) - Made with fresh kingfish, coconut-based gravy
+- **Prawn Balchão** (₹420) - Spicy pickled prawns, Goan specialty
+- **Bebinca for dessert** (₹180) - Traditional 7-layer pudding
+- Fresh lime soda (₹80)
+**Total for 2**: ₹1,060 including taxes
+
+**📱 [View on Zomato](https://www.google.com/search?q=Pousada+by+the+Beach+Calangute+zomato)**
+
+**💡 Pro Tips**:
+- Request table on covered patio (ocean breeze without direct sun)
+- Order dishes medium-spicy first (Goan spice levels are REAL)
+- Try their house special - Sorpotel if adventurous (pork dish)
+
+![Goan Seafood](https://source.unsplash.com/1600x900/?goan,seafood,curry)
+
+### Afternoon: Calangute Beach Experience (3:00 PM - 6:30 PM)
+
+**Beach Time Logistics**:
+- Distance from lunch spot: 300m (5-min walk)
+- Beach access: Public, free entry
+- Best spot: Northern end (less crowded than central shacks area)
+
+**Activities & Experiences**:
+
+🏖️ **Beach Relaxation** (3:00 PM - 4:30 PM)
+- Rent beach sunbeds: ₹200 for 2 beds + umbrella (from shack owners)
+- **Vendor tip**: Say "just sitting, will order drinks later" to avoid pushy sales
+- Swimming: Safe in marked zones (lifeguards on duty till 6 PM)
+
+🚤 **Water Sports** (4:30 PM - 5:30 PM) - Optional but recommended
+- **Parasailing**: ₹1,200 per person (8-min flight, 100m height)
+- **Jet Ski**: ₹900 for 15 minutes (double rider)
+- **Banana Boat**: ₹400 per person (group of 6)
+
+**My recommendation**: Skip jet ski (crowded, rushed), do parasailing
+**Why**: Aerial view of entire North Goa coastline is once-in-lifetime photo op
+
+**📱 [Pre-book Water Sports](https://www.makemytrip.com/activities/goa-water-sports-booking.html)**
+
+**💡 Safety Note**: Mandatory life jackets provided. Avoid water sports after 5:30 PM (rougher tides).
+
+☕ **Sunset Refreshments** (5:30 PM - 6:30 PM)
+- Stay on beach, order from any shack
+- **Recommended**: Fresh coconut water (₹60) + Goan cashew feni tasting (₹200)
+- Watch sunset (around 6:15 PM in November)
+
+### Evening: Authentic Goan Dinner & Night Market (7:00 PM - 10:30 PM)
+
+🚗 **Transport to Baga** (6:45 PM)
+- Hotel → Baga: Ola/Uber auto (₹120, 10 mins)
+- **Why Baga for dinner**: Better restaurant options than Calangute after dark
+
+🍽️ **Dinner: Sublime** (7:30 PM) - North Goan Cuisine Specialist
+**Selection process**:
+- Shortlisted 12 Baga restaurants
+- Eliminated: Tito's (nightclub food, average quality), Britto's (tourist trap pricing)
+- **Sublime won because**: Chef Malvika sources ingredients from local farms, menu changes based on daily catch
+
+**Recommended dishes**:
+- **Crab Xec Xec** (₹580) - Spicy crab curry, Goan delicacy
+- **Kingfish Recheado** (₹490) - Red masala stuffed fish, grilled
+- **Mushroom Xacuti** (₹320) - For vegetarian option
+- **Sannas** (₹80) - Steamed rice cakes (pair perfectly with curry)
+- **Sol Kadi** (₹100) - Kokum drink (digestive, refreshing)
+
+**Total**: ₹1,570 for 2 people
+
+**📱 [View on Zomato](https://www.google.com/search?q=Sublime+Restaurant+Baga+Goa+zomato)**
+
+**💡 Insider secrets**:
+- Book window table (call ahead: +91-XXXXXXXXXX)
+- Ask for "fisherman's catch of the day" (not on menu, best value)
+- Try their house-made Goan liqueur (complimentary shot after meal)
+
+**Post-Dinner**: Walk along Baga Beach Road (5 mins), browse night market stalls
+- Souvenirs: Handmade jewelry (₹500-800), Goan spice packets (₹200)
+- **Bargaining tip**: Start at 50% of quoted price
+
+🚗 **Return to Hotel** (10:00 PM)
+- Baga → Hotel: Uber (₹140, 10 mins)
+
+### 💰 Day 1 Total Costs:
+- Airport transfer: ₹900
+- Hotel: ₹3,200 (breakfast included tomorrow)
+- Lunch: ₹1,060
+- Beach sunbeds: ₹200
+- Water sports: ₹2,400 (₹1,200 × 2 for parasailing)
+- Evening transport: ₹260 (₹120 + ₹140)
+- Sunset drinks: ₹200
+- Dinner: ₹1,570
+- Shopping: ₹500
+
+**Day 1 Grand Total: ₹10,290**
+
+**💡 Money-saving alternatives if over budget**:
+- Skip water sports: Save ₹2,400
+- Lunch at beach shack instead: Save ₹400
+- Share meals (portions are large): Save ₹500
+"""
+
+
+# Hotel shortlist with eliminations and net-cost reasoning.
+STYLE_EXAMPLE_HOTEL_REASONING = """\
+**Example 1: Hotel Selection with Smart Reasoning**
+❌ BAD: "Stay at Beach Resort. ₹5,000/night."
+✅ EXCELLENT: "🏨 Recommended: Seaside Cottage (₹4,200/night)
+
+My research process:
+- Searched 6 properties in Varkala beach area
+- Eliminated: Palm Resort (₹2,800 but 3km from beach, ₹300 daily auto = false economy)
+- Eliminated: Luxury Haven (₹9,000 - exceeds your moderate budget tier)
+- Eliminated: Backpacker Inn (₹1,200 but 2.9★ rating, noise complaints)
+- Shortlisted: Beach Shack (₹3,500), Seaside Cottage (₹4,200), Ocean View (₹4,800)
+- Final choice: Seaside Cottage
+  ✓ Best value: Only ₹700 more than Beach Shack but includes breakfast (saves ₹600/day)
+  ✓ Location: 2-min walk to main beach (vs 15-min for Ocean View)
+  ✓ Quality: 4.4★ with 320+ reviews praising cleanliness, friendly staff
+  ✓ Net cost: ₹4,200 - ₹600 breakfast = ₹3,600 effective (cheaper than Beach Shack!)
+
+📱 [Book Seaside Cottage](actual-booking-url)"
+"""
+
+# Attraction timing, guide choice and transport trade-offs.
+STYLE_EXAMPLE_ACTIVITY_TIMING = """\
+**Example 2: Activity Selection with Context Awareness**
+❌ BAD: "Visit Amber Fort. ₹500 entry."
+✅ EXCELLENT: "🏰 Amber Fort Tour (9:00 AM - 12:00 PM) - ₹500 entry + ₹200 audio guide
+
+Why morning timing: 
+- Temperatures hit 38°C by noon in May → Morning visit avoids heat exhaustion
+- Fort opens 8am, arriving at 9am means smaller crowds (tour groups come 11am+)
+- Morning light is best for photography (east-facing ramparts)
+
+Why audio guide recommended:
+- Fort history spans 400 years → Self-exploration misses stories
+- Audio guide (₹200) cheaper than human guide (₹800) for your group
+- Allows flexible pacing vs rushed group tours
+
+Smart logistics:
+- Located 11km from your hotel in old city
+- 🚗 Take Ola/Uber: ₹180 one-way, 25 mins (vs ₹50 bus but 1.5 hours with changes)
+- Time value: Extra ₹260 (₹130 per person) saves 2 hours → Use for lunch at heritage restaurant
+
+Post-visit:
+- Return to city for lunch (12:30 PM) at nearby Peacock Rooftop (5-min from fort)
+- Afternoon: Rest at hotel during peak heat (1-4 PM), resume sightseeing post-4 PM when cool"
+"""
+
+# Restaurant choice with dishes, prices and insider tips.
+STYLE_EXAMPLE_FOOD_RECOMMENDATION = """\
+**Example 3: Food Recommendation with Local Intelligence**
+❌ BAD: "Lunch at Karim's Restaurant. ₹600."
+✅ EXCELLENT: "🍽️ Lunch: Al Jawahar (1:00 PM) - ₹650 for 2
+
+Why this choice over famous Karim's:
+- Researched 5 Old Delhi food institutions
+- Karim's: More touristy now, long waits (45+ min), reviews mention quality declined
+- Al Jawahar: Next door to Karim's, same legacy (est. 1948), locals prefer it
+- What locals say: 'Old-timers know Al Jawahar's mutton burra is unmatched'
+
+What to order:
+✓ Mutton Burra (₹280) - Signature dish, slow-cooked for 4 hours
+✓ Chicken Jahangiri (₹220) - Mughlai specialty with 15-spice blend
+✓ Roomali Roti (₹40) - Paper-thin, fresh from tandoor
+✓ Total: ₹540 + ₹110 tip/taxes = ₹650
+
+Insider tips:
+- Ask for corner table on 1st floor (best ambiance, avoid ground floor crowd)
+- Order food slightly less spicy (default is very spicy for tourist palates)
+- Skip desserts here (heavy meal), get kulfi from nearby Kuremal later
+
+📱 [View on Zomato](https://www.google.com/search?q=Al+Jawahar+Old+Delhi+zomato)"
+"""
+
+# A full day sequenced by location, weather and fatigue.
+STYLE_EXAMPLE_DAY_FLOW = """\
+**Example 4: Day Planning with Logical Flow**
+❌ BAD: "Morning: Beach. Afternoon: Fort. Evening: Market."
+✅ EXCELLENT: "📅 Day 3: Coastal Exploration & History
+
+My planning logic for this day:
+- Clustered south coast attractions (minimize travel time)
+- Sequenced by: weather timing → lunch proximity → sunset spot
+- Built in rest break (you're on Day 3, fatigue sets in)
+
+Morning (8:00 AM - 12:00 PM): Lighthouse Point
+🚗 Hotel → Lighthouse: Ola (₹140, 15 min)
+🗼 Lighthouse climb - ₹50, stunning 360° views
+⏰ Why early: Opens 8am, best light for photos, cool breeze, empty (crowds post-10am)
+📸 Photography tip: South side has dramatic cliff formations
+
+Midday (12:30 PM): Strategic lunch near afternoon activity
+🍽️ Cliff Edge Cafe (walking distance from lighthouse - 800m, 10-min walk)
+Why this location: Next activity (fort) is 2km south → Lunch here = no backtracking
+
+Afternoon (2:00 PM - 4:00 PM): Coastal Fort
+🚗 Cafe → Fort: Share auto (₹30 per person, 5 min)
+🏰 Fort entry ₹100, self-guided (small fort, no guide needed)
+⏰ Why afternoon: Fort faces west → Shaded during midday heat, golden light by 4pm
+
+Rest Break (4:00 PM - 5:30 PM): Back to hotel
+Why essential: 3 days of sightseeing + heat = fatigue management
+🚗 Fort → Hotel: Ola (₹160, 20 min)
+💡 Use this time: Shower, rest, recharge for evening market visit
+
+Evening (5:30 PM - 9:00 PM): Sunset Market
+🚗 Hotel → Market: Auto (₹80, 10 min)
+🌅 Timing rationale: Market opens 5pm, sunset at 6:30pm → Perfect transition from shopping to waterfront dining
+🛍️ Budget: ₹1,500 for handicrafts/souvenirs
+
+Dinner (8:00 PM): Market area seafood shacks
+🦞 Fresh catch pricing: ₹800 for 2 (tiger prawns + fish + rice)
+
+Day 3 total: ₹3,400 (transport ₹460 + activities ₹200 + food ₹1,450 + shopping ₹1,500 - accommodation separate)"
+"""
+
+STYLE_EXAMPLES = {
+    "day_itinerary": STYLE_EXAMPLE_DAY_ITINERARY,
+    "hotel_reasoning": STYLE_EXAMPLE_HOTEL_REASONING,
+    "activity_timing": STYLE_EXAMPLE_ACTIVITY_TIMING,
+    "food_recommendation": STYLE_EXAMPLE_FOOD_RECOMMENDATION,
+    "day_flow": STYLE_EXAMPLE_DAY_FLOW,
+}
+
+
+@tool
+def get_style_example(kind: str = "day_itinerary") -> str:
+    """
+    Returns a worked example showing the expected level of detail, reasoning,
+    pricing, and booking-link formatting. Fetch the relevant kind right before
+    writing that part of the plan.
+    
+    Args:
+        kind: One of "day_itinerary" (complete Day 1), "hotel_reasoning",
+            "activity_timing", "food_recommendation", or "day_flow"
+    
+    Returns:
+        str: The requested worked example
+    """
+    example = STYLE_EXAMPLES.get(kind)
+    if example is None:
+        return f"Unknown example kind '{kind}'. Available: {', '.join(STYLE_EXAMPLES)}"
+    return example
+
+
 # ============================================================================
 # TOOL COLLECTIONS
 # ============================================================================
@@ -573,7 +876,8 @@ PLANNING_TOOLS = [
     get_booking_link,
     find_authentic_local_food,
     get_realtime_weather,
-    get_travel_advisory
+    get_travel_advisory,
+    get_style_example
 ]
 
 # Optimization tools for dynamic replanning
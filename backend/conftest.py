@@ -0,0 +1,37 @@
+"""
+Shared pytest setup.
+
+server.py initializes Firebase and the Tavily client at import time, so
+tests that import it get a throwaway service account (never used for a
+network call) and placeholder API keys.
+"""
+
+import json
+import os
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+
+def _test_service_account() -> str:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_key = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode()
+    return json.dumps({
+        "type": "service_account",
+        "project_id": "voyage-test",
+        "private_key_id": "test",
+        "private_key": private_key,
+        "client_email": "test@voyage-test.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    })
+
+
+if not os.getenv("FIREBASE_CREDENTIALS"):
+    os.environ["FIREBASE_CREDENTIALS"] = _test_service_account()
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
@@ -3,13 +3,16 @@ User Dashboard Service for Voyage Travel Planner
 Aggregates data from trips and expenses for comprehensive dashboard view
 """
 
+import asyncio
 from datetime import datetime, timezone
 from typing import List, Dict, Optional
 import uuid
 from collections import defaultdict
+from functools import lru_cache
+from firestore_service import run_in_firestore_pool
 from schemas import (
     UserDashboard, DashboardStats, TripSummaryCard, RecentActivity,
-    BudgetInsight
+    BudgetInsight, UpcomingTrip, TripSummary
 )
 
 
@@ -24,10 +27,14 @@ class DashboardService:
         self.db = firestore_client
         self.firestore_service = firestore_service
     
-    def get_user_dashboard(self, user_id: str, user_email: str = None) -> UserDashboard:
+    async def get_user_dashboard(self, user_id: str, user_email: str = None) -> UserDashboard:
         """
         Get complete dashboard data for a user
         
+        The independent Firestore reads (trips, expenses, profile, saved
+        destinations) run concurrently, so latency is the slowest read
+        rather than the sum of all of them.
+        
         Args:
             user_id: User ID
             user_email: User email (optional)
@@ -35,11 +42,17 @@ class DashboardService:
         Returns:
             UserDashboard with all aggregated data (expense tracking + trip planning)
         """
-        # Get all user's trips
-        trips = self._get_user_trips(user_id)
+        trips, all_expenses, profile, saved_destinations = await asyncio.gather(
+            run_in_firestore_pool(self._get_user_trips, user_id),
+            run_in_firestore_pool(self._get_all_user_expenses, user_id),
+            run_in_firestore_pool(self._get_user_profile, user_id),
+            run_in_firestore_pool(self._get_saved_destinations, user_id),
+        )
         
-        # Get all expenses
-        all_expenses = self._get_all_user_expenses(user_id)
+        # Unread alerts for every trip in one pass (reuses the trip IDs above)
+        alerts_by_trip = await run_in_firestore_pool(
+            self._count_unread_alerts_by_trip, [trip['trip_id'] for trip in trips]
+        )
         
         # Calculate overall statistics
         stats = self._calculate_dashboard_stats(trips, all_expenses)
@@ -50,8 +63,17 @@ class DashboardService:
         upcoming_trips = []
         completed_trips = []
         
+        # Split expenses by trip once instead of rescanning them for every card
+        expenses_by_trip = defaultdict(list)
+        for expense in all_expenses:
+            expenses_by_trip[expense.get('trip_id')].append(expense)
+        
         for trip in trips:
-            trip_card = self._create_trip_summary_card(trip, all_expenses)
+            trip_card = self._create_trip_summary_card(
+                trip,
+                expenses_by_trip.get(trip['trip_id'], []),
+                alerts_count=alerts_by_trip.get(trip['trip_id'], 0)
+            )
             
             if trip_card.status == "ongoing":
                 active_trips.append(trip_card)
@@ -72,7 +94,7 @@ class DashboardService:
         budget_insights = self._generate_budget_insights(trips, all_expenses, stats)
         
         # Count unread alerts
-        unread_alerts = self._count_unread_alerts(user_id)
+        unread_alerts = sum(alerts_by_trip.values())
         
         # Calculate spending trend
         spending_trend = self._calculate_spending_trend(all_expenses)
@@ -98,43 +120,39 @@ class DashboardService:
                 "display_name": display_name
             }
         
-        # Get user profile for preferences
-        profile = None
-        if self.firestore_service:
+        # Upcoming and past trips are partitioned from the same trips query
+        # (no extra reads); the next trip gets the countdown card
+        upcoming_trip = None
+        if upcoming_trips:
+            next_card = upcoming_trips[0]
+            next_trip = next(t for t in trips if t['trip_id'] == next_card.trip_id)
             try:
-                profile = self.firestore_service.get_user_profile(user_id=user_id)
+                upcoming_trip = UpcomingTrip(
+                    id=next_card.trip_id,
+                    destination=next_card.destination,
+                    origin_city=next_trip.get('origin_city') or "",
+                    start_date=next_card.start_date.date().isoformat(),
+                    num_days=(next_card.end_date - next_card.start_date).days + 1,
+                    num_people=next_trip.get('num_people') or 1,
+                    budget=next_card.total_budget,
+                    countdown_days=(next_card.start_date - now).days
+                )
             except Exception as e:
-                print(f"Could not fetch profile: {e}")
+                print(f"Error converting upcoming trip card: {e}")
         
         # Past trips summary (convert completed TripSummaryCards to TripSummary format)
-        from schemas import TripSummary
         past_trips = []
         for trip_card in completed_trips[:10]:  # Max 10 past trips
             try:
                 past_trips.append(TripSummary(
-                    trip_id=trip_card.trip_id,
+                    id=trip_card.trip_id,
                     destination=trip_card.destination,
-                    start_date=trip_card.start_date,
-                    end_date=trip_card.end_date,
                     num_days=(trip_card.end_date - trip_card.start_date).days + 1,
-                    budget=trip_card.total_budget,
-                    interests="",  # Not available in TripSummaryCard
                     created_at=trip_card.start_date
                 ))
             except Exception as e:
                 print(f"Error converting trip card: {e}")
         
-        # Saved destinations
-        saved_destinations = []
-        if self.db:
-            try:
-                saved_ref = self.db.collection('saved_destinations').where('user_id', '==', user_id)
-                for doc in saved_ref.stream():
-                    dest_data = doc.to_dict()
-                    saved_destinations.append(dest_data)
-            except Exception as e:
-                print(f"Error fetching saved destinations: {e}")
-        
         # Personalized suggestions (if profile has learned preferences)
         personalized_suggestions = []
         if profile and profile.get('learned_preferences'):
@@ -163,6 +181,7 @@ class DashboardService:
             top_categories=top_categories,
             # Trip planning section
             user_info=user_info,
+            upcoming_trip=upcoming_trip,
             past_trips=past_trips,
             saved_destinations=saved_destinations,
             personalized_suggestions=personalized_suggestions,
@@ -185,6 +204,29 @@ class DashboardService:
         
         return trips
     
+    def _get_user_profile(self, user_id: str) -> Optional[Dict]:
+        """Get user profile for preferences"""
+        if not self.firestore_service:
+            return None
+        
+        try:
+            return self.firestore_service.get_user_profile(user_id=user_id)
+        except Exception as e:
+            print(f"Could not fetch profile: {e}")
+            return None
+    
+    def _get_saved_destinations(self, user_id: str) -> List[Dict]:
+        """Get saved destinations for a user"""
+        if not self.db:
+            return []
+        
+        try:
+            saved_ref = self.db.collection('saved_destinations').where('user_id', '==', user_id)
+            return [doc.to_dict() for doc in saved_ref.stream()]
+        except Exception as e:
+            print(f"Error fetching saved destinations: {e}")
+            return []
+    
     def _get_all_user_expenses(self, user_id: str) -> List[Dict]:
         """Get all expenses for a user across all trips"""
         if not self.db:
@@ -294,7 +336,9 @@ class DashboardService:
             favorite_destination=favorite_destination
         )
     
-    def _create_trip_summary_card(self, trip: Dict, all_expenses: List[Dict]) -> TripSummaryCard:
+    def _create_trip_summary_card(
+        self, trip: Dict, all_expenses: List[Dict], alerts_count: Optional[int] = None
+    ) -> TripSummaryCard:
         """Create a summary card for a trip"""
         now = datetime.now(timezone.utc)
         
@@ -356,7 +400,8 @@ class DashboardService:
                 last_expense_date = datetime.fromisoformat(last_expense_date.replace('Z', '+00:00'))
         
         # Count unread alerts for this trip
-        alerts_count = self._count_trip_alerts(trip_id)
+        if alerts_count is None:
+            alerts_count = self._count_trip_alerts(trip_id)
         
         return TripSummaryCard(
             trip_id=trip_id,
@@ -519,25 +564,23 @@ class DashboardService:
         
         return insights
     
-    def _count_unread_alerts(self, user_id: str) -> int:
-        """Count unread budget alerts for user"""
-        if not self.db:
-            return 0
-        
-        # Get all user's trips
-        trips_ref = self.db.collection('trips').where('user_id', '==', user_id)
-        trip_ids = [doc.id for doc in trips_ref.stream()]
-        
-        # Count unread alerts across all trips
-        unread_count = 0
-        for trip_id in trip_ids:
+    def _count_unread_alerts_by_trip(self, trip_ids: List[str]) -> Dict[str, int]:
+        """Count unread budget alerts per trip in as few queries as possible"""
+        counts = defaultdict(int)
+        if not self.db or not trip_ids:
+            return counts
+        
+        # 'in' filters accept at most 30 values, so query in chunks of 30
+        for i in range(0, len(trip_ids), 30):
             alerts_ref = self.db.collection('budget_alerts')\
-                .where('trip_id', '==', trip_id)\
-                .where('is_read', '==', False)
+                .where('trip_id', 'in', trip_ids[i:i + 30])\
+                .where('is_read', '==', False)\
+                .select(['trip_id'])
             
-            unread_count += len(list(alerts_ref.stream()))
+            for doc in alerts_ref.stream():
+                counts[doc.get('trip_id')] += 1
         
-        return unread_count
+        return counts
     
     def _count_trip_alerts(self, trip_id: str) -> int:
         """Count unread alerts for a specific trip"""
@@ -548,7 +591,8 @@ class DashboardService:
             .where('trip_id', '==', trip_id)\
             .where('is_read', '==', False)
         
-        return len(list(alerts_ref.stream()))
+        # Server-side aggregation instead of downloading every alert
+        return alerts_ref.count().get()[0][0].value
     
     def _calculate_spending_trend(self, expenses: List[Dict]) -> str:
         """Calculate overall spending trend"""
@@ -601,6 +645,7 @@ class DashboardService:
         return categories[:limit]
 
 
+@lru_cache(maxsize=None)
 def get_dashboard_service(firestore_client, firestore_service=None):
-    """Factory function to get dashboard service instance"""
+    """Factory function to get the shared dashboard service instance"""
     return DashboardService(firestore_client, firestore_service)
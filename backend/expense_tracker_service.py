@@ -7,6 +7,8 @@ from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional, Tuple
 import uuid
 from collections import defaultdict
+from functools import lru_cache
+from firestore_service import batched_write
 from schemas import (
     Expense, ExpenseCategory, ExpenseTrackerSummary, 
     BudgetAlert, ExpenseAnalyticsResponse
@@ -509,12 +511,6 @@ class ExpenseTrackerService:
         # Calculate new total budget
         new_total = sum(budget_breakdown.values())
         
-        # Update trip
-        trip_ref.update({
-            'budget_breakdown': budget_breakdown,
-            'budget': new_total
-        })
-        
         # Log the adjustment
         adjustment_log = {
             'trip_id': trip_id,
@@ -525,7 +521,14 @@ class ExpenseTrackerService:
             'timestamp': datetime.now(timezone.utc)
         }
         
-        self.db.collection('budget_adjustments').add(adjustment_log)
+        # Update trip and log the adjustment in one atomic batch
+        batch = self.db.batch()
+        batch.update(trip_ref, {
+            'budget_breakdown': budget_breakdown,
+            'budget': new_total
+        })
+        batch.set(self.db.collection('budget_adjustments').document(), adjustment_log)
+        batch.commit()
         
         return {
             "category": category,
@@ -815,33 +818,36 @@ class ExpenseTrackerService:
         """Check if new expense triggers any budget alerts"""
         # Get current spending
         summary = self.get_expense_tracker(trip_id)
+        alerts = []
         
         # Check overall budget threshold
         if summary.percentage_used >= 75 and summary.percentage_used < 90:
-            self._create_alert(trip_id, "warning", None, 
-                             f"You've used {summary.percentage_used:.1f}% of your budget")
+            alerts.append(self._build_alert(trip_id, "warning", None, 
+                                            f"You've used {summary.percentage_used:.1f}% of your budget"))
         elif summary.percentage_used >= 90:
-            self._create_alert(trip_id, "critical", None,
-                             f"CRITICAL: {summary.percentage_used:.1f}% of budget used!")
+            alerts.append(self._build_alert(trip_id, "critical", None,
+                                            f"CRITICAL: {summary.percentage_used:.1f}% of budget used!"))
         
         # Check category threshold
         for cat in summary.categories:
             if cat.name == category and cat.percentage_used >= 90:
-                self._create_alert(trip_id, "warning", category,
-                                 f"{category} budget is {cat.percentage_used:.1f}% used")
+                alerts.append(self._build_alert(trip_id, "warning", category,
+                                                f"{category} budget is {cat.percentage_used:.1f}% used"))
+        
+        # All triggered alerts are written in one batch
+        if alerts and self.db:
+            alerts_ref = self.db.collection('budget_alerts')
+            batched_write(self.db, [(alerts_ref.document(), alert) for alert in alerts])
     
-    def _create_alert(
+    def _build_alert(
         self,
         trip_id: str,
         alert_type: str,
         category: Optional[str],
         message: str
-    ):
-        """Create a budget alert"""
-        if not self.db:
-            return
-        
-        alert = {
+    ) -> Dict:
+        """Build a budget alert document"""
+        return {
             'alert_id': f"alert_{uuid.uuid4().hex[:12]}",
             'trip_id': trip_id,
             'alert_type': alert_type,
@@ -850,8 +856,6 @@ class ExpenseTrackerService:
             'created_at': datetime.now(timezone.utc),
             'is_read': False
         }
-        
-        self.db.collection('budget_alerts').add(alert)
     
     def _group_expenses(
         self,
@@ -1017,6 +1021,7 @@ class ExpenseTrackerService:
             }
 
 
+@lru_cache(maxsize=None)
 def get_expense_tracker_service(firestore_client=None):
-    """Factory function to get expense tracker service instance"""
+    """Factory function to get the shared expense tracker service instance"""
     return ExpenseTrackerService(firestore_client)
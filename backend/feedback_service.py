@@ -3,19 +3,32 @@ Post-Trip Feedback Service for Voyage
 Collects and manages user feedback after trip completion
 """
 
-from datetime import datetime
-from typing import Dict, List, Optional
-from google.cloud.firestore import Client
+import logging
+from datetime import datetime, timezone
+from functools import lru_cache
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from cachetools import TTLCache
+from google.cloud.firestore import AsyncClient, Increment, SERVER_TIMESTAMP, async_transactional
+
+logger = logging.getLogger(__name__)
 
 
 class FeedbackService:
-    """Service for handling post-trip feedback"""
+    """Service for handling post-trip feedback (uses the async Firestore client)"""
     
-    def __init__(self, db: Client):
+    def __init__(self, db: AsyncClient):
         self.db = db
         self.feedback_collection = db.collection('trip_feedback')
+        # Running totals maintained on every submission so stats are one read
+        self.stats_doc = db.collection('stats').document('feedback_rollup')
+        # Feedback rarely changes after submission, so short-lived read caches
+        # absorb repeated views; submit_feedback invalidates affected keys
+        self._trip_cache = TTLCache(maxsize=10000, ttl=60)
+        self._user_cache = TTLCache(maxsize=5000, ttl=30)
+        self._cache_lock = Lock()
     
-    def submit_feedback(
+    async def submit_feedback(
         self,
         trip_id: str,
         user_id: str,
@@ -42,6 +55,7 @@ class FeedbackService:
         Returns:
             Feedback document data
         """
+        now = datetime.now(timezone.utc)
         feedback_data = {
             'trip_id': trip_id,
             'user_id': user_id,
@@ -51,54 +65,174 @@ class FeedbackService:
             'highlights': highlights,
             'improvements': improvements,
             'comment': comment or '',
-            'created_at': datetime.now(),
-            'updated_at': datetime.now()
+            'created_at': now,
+            'updated_at': now
         }
         
-        # Check if feedback already exists
-        existing = self.feedback_collection.where('trip_id', '==', trip_id).where('user_id', '==', user_id).limit(1).get()
+        # One feedback document per (trip, user): a deterministic ID lets us
+        # look it up directly instead of scanning the trip_id/user_id index
+        doc_id = f"{trip_id}_{user_id}"
+        doc_ref = self.feedback_collection.document(doc_id)
         
-        if existing:
-            # Update existing feedback
-            doc_id = existing[0].id
-            self.feedback_collection.document(doc_id).update({
-                **feedback_data,
-                'created_at': existing[0].to_dict().get('created_at'),  # Keep original
-                'updated_at': datetime.now()
-            })
-            feedback_data['feedback_id'] = doc_id
-        else:
-            # Create new feedback
-            doc_ref = self.feedback_collection.add(feedback_data)
-            feedback_data['feedback_id'] = doc_ref[1].id
+        # The rollup delta depends on the previous submission, so the read and
+        # all writes share one transaction; a concurrent resubmission for the
+        # same (trip, user) makes this one retry against the fresh document
+        @async_transactional
+        async def write_feedback(transaction):
+            existing = await doc_ref.get(transaction=transaction)
+            previous = existing.to_dict() if existing.exists else None
+            stats = await self.stats_doc.get(transaction=transaction)
+            
+            if previous is None:
+                # Feedback written before deterministic IDs used .add(); move
+                # it to doc_id so the user keeps a single feedback document
+                legacy = await (
+                    self.feedback_collection
+                    .where('trip_id', '==', trip_id)
+                    .where('user_id', '==', user_id)
+                    .limit(1)
+                    .get(transaction=transaction)
+                )
+                if legacy:
+                    previous = legacy[0].to_dict()
+                    transaction.delete(legacy[0].reference)
+            
+            # Keep original creation time when updating existing feedback
+            feedback_data['created_at'] = previous.get('created_at', now) if previous else now
+            
+            transaction.set(doc_ref, feedback_data, merge=True)
+            # update() rather than a merge set(): an unknown trip_id fails the
+            # whole commit instead of creating a bare trip_plans document
+            transaction.update(
+                self.db.collection('trip_plans').document(trip_id),
+                {
+                    'feedback_submitted': True,
+                    'feedback_date': SERVER_TIMESTAMP
+                }
+            )
+            # Until _rebuild_feedback_rollup seeds the rollup, leave it alone:
+            # the rebuild counts this document. Once seeded, every stored
+            # feedback document (legacy ones included) is already counted, so
+            # subtracting the previous submission is safe
+            if self._is_seeded(stats):
+                transaction.set(self.stats_doc, self._build_stats_delta(feedback_data, previous), merge=True)
         
-        # Update trip with feedback flag
-        try:
-            trip_ref = self.db.collection('trip_plans').document(trip_id)
-            trip_ref.update({
-                'feedback_submitted': True,
-                'feedback_date': datetime.now()
-            })
-        except Exception as e:
-            print(f"Warning: Could not update trip feedback flag: {e}")
+        await write_feedback(self.db.transaction())
+        feedback_data['feedback_id'] = doc_id
         
-        print(f"✅ Feedback submitted for trip {trip_id}")
+        with self._cache_lock:
+            self._trip_cache.pop(trip_id, None)
+            for key in [k for k in self._user_cache.keys() if k[0] == user_id]:
+                self._user_cache.pop(key, None)
+        
+        logger.info("Feedback submitted for trip %s", trip_id)
         return feedback_data
     
-    def get_trip_feedback(self, trip_id: str) -> Optional[Dict]:
+    @staticmethod
+    def _is_seeded(snapshot) -> bool:
+        """Whether a rollup snapshot was written by _rebuild_feedback_rollup"""
+        return snapshot.exists and bool((snapshot.to_dict() or {}).get('seeded'))
+    
+    @staticmethod
+    def _build_stats_delta(feedback: Dict, previous: Optional[Dict] = None) -> Dict:
+        """
+        Build the Increment update for the feedback rollup document.
+        
+        When a user resubmits feedback for the same trip, the previous
+        submission is subtracted so the rollup counts each trip once.
+        """
+        highlights: Dict[str, int] = {}
+        improvements: Dict[str, int] = {}
+        
+        for highlight in feedback.get('highlights', []):
+            highlights[highlight] = highlights.get(highlight, 0) + 1
+        for improvement in feedback.get('improvements', []):
+            improvements[improvement] = improvements.get(improvement, 0) + 1
+        
+        total = 1
+        rating_sum = feedback.get('rating', 0)
+        recommendations = 1 if feedback.get('would_recommend') else 0
+        
+        if previous:
+            total -= 1
+            rating_sum -= previous.get('rating', 0)
+            recommendations -= 1 if previous.get('would_recommend') else 0
+            for highlight in previous.get('highlights', []):
+                highlights[highlight] = highlights.get(highlight, 0) - 1
+            for improvement in previous.get('improvements', []):
+                improvements[improvement] = improvements.get(improvement, 0) - 1
+        
+        return {
+            'total_feedback': Increment(total),
+            'rating_sum': Increment(rating_sum),
+            'recommendations': Increment(recommendations),
+            'highlights': {k: Increment(v) for k, v in highlights.items() if v},
+            'improvements': {k: Increment(v) for k, v in improvements.items() if v},
+            'updated_at': SERVER_TIMESTAMP
+        }
+    
+    async def get_trip_feedback(self, trip_id: str) -> Optional[Dict]:
         """Get feedback for a specific trip"""
-        results = self.feedback_collection.where('trip_id', '==', trip_id).limit(1).get()
+        with self._cache_lock:
+            if trip_id in self._trip_cache:
+                return self._trip_cache[trip_id]
         
+        results = await self.feedback_collection.where('trip_id', '==', trip_id).limit(1).get()
+        
+        feedback = None
         if results:
             feedback = results[0].to_dict()
             feedback['feedback_id'] = results[0].id
-            return feedback
         
-        return None
+        with self._cache_lock:
+            self._trip_cache[trip_id] = feedback
+        return feedback
     
-    def get_user_feedback_history(self, user_id: str) -> List[Dict]:
-        """Get all feedback submitted by a user"""
-        results = self.feedback_collection.where('user_id', '==', user_id).order_by('created_at', direction='DESCENDING').get()
+    async def get_user_feedback_history(
+        self,
+        user_id: str,
+        page_size: int = 20,
+        start_after: Optional[str] = None
+    ) -> Dict:
+        """
+        Get feedback submitted by a user, newest first, one page at a time
+        
+        Args:
+            user_id: ID of the user
+            page_size: Maximum number of feedback items to return
+            start_after: Cursor from a previous page's next_cursor
+            
+        Returns:
+            Dict with 'items' and 'next_cursor' (None on the last page)
+            
+        Raises:
+            ValueError: If start_after is not a cursor this method produced
+                (callers should answer 400)
+        """
+        cursor = self._parse_history_cursor(start_after) if start_after else None
+        
+        cache_key = (user_id, page_size, start_after)
+        with self._cache_lock:
+            if cache_key in self._user_cache:
+                return self._user_cache[cache_key]
+        
+        # Document ID breaks ties so feedback sharing a timestamp isn't
+        # skipped or repeated across pages
+        query = (
+            self.feedback_collection
+            .where('user_id', '==', user_id)
+            .order_by('created_at', direction='DESCENDING')
+            .order_by('__name__', direction='DESCENDING')
+            .limit(page_size)
+        )
+        if cursor:
+            created_at, doc_id = cursor
+            query = query.start_after({
+                'created_at': created_at,
+                '__name__': self.feedback_collection.document(doc_id)
+            })
+        
+        results = await query.get()
         
         feedback_list = []
         for doc in results:
@@ -106,13 +240,42 @@ class FeedbackService:
             feedback['feedback_id'] = doc.id
             feedback_list.append(feedback)
         
-        return feedback_list
+        next_cursor = None
+        if len(feedback_list) == page_size:
+            last = feedback_list[-1]
+            next_cursor = f"{last['created_at'].isoformat()}|{last['feedback_id']}"
+        
+        page = {
+            'items': feedback_list,
+            'next_cursor': next_cursor
+        }
+        with self._cache_lock:
+            self._user_cache[cache_key] = page
+        return page
     
-    def get_feedback_stats(self) -> Dict:
-        """Get overall feedback statistics"""
-        all_feedback = self.feedback_collection.get()
+    @staticmethod
+    def _parse_history_cursor(cursor: str) -> Tuple[datetime, str]:
+        """Split a '<created_at ISO>|<document id>' history cursor"""
+        created_at, sep, doc_id = cursor.partition('|')
+        if not sep or not doc_id or '/' in doc_id:
+            raise ValueError(f"Invalid feedback cursor: {cursor!r}")
+        try:
+            return datetime.fromisoformat(created_at), doc_id
+        except ValueError:
+            raise ValueError(f"Invalid feedback cursor: {cursor!r}") from None
+    
+    async def get_feedback_stats(self) -> Dict:
+        """Get overall feedback statistics from the rollup document"""
+        snapshot = await self.stats_doc.get()
+        
+        if self._is_seeded(snapshot):
+            rollup = snapshot.to_dict()
+        else:
+            rollup = await self._rebuild_feedback_rollup()
+        
+        total = rollup.get('total_feedback', 0)
         
-        if not all_feedback:
+        if not total:
             return {
                 'total_feedback': 0,
                 'average_rating': 0,
@@ -121,46 +284,70 @@ class FeedbackService:
                 'common_improvements': []
             }
         
-        total = len(all_feedback)
-        ratings = []
-        recommendations = 0
-        highlights_count = {}
-        improvements_count = {}
-        
-        for doc in all_feedback:
-            data = doc.to_dict()
-            ratings.append(data.get('rating', 0))
-            
-            if data.get('would_recommend', False):
-                recommendations += 1
-            
-            # Count highlights
-            for highlight in data.get('highlights', []):
-                highlights_count[highlight] = highlights_count.get(highlight, 0) + 1
-            
-            # Count improvements
-            for improvement in data.get('improvements', []):
-                improvements_count[improvement] = improvements_count.get(improvement, 0) + 1
-        
-        # Sort and get top items
+        # Rollup maps are bounded by the set of distinct options, so sorting locally is cheap
+        highlights_count = {k: v for k, v in rollup.get('highlights', {}).items() if v > 0}
+        improvements_count = {k: v for k, v in rollup.get('improvements', {}).items() if v > 0}
         top_highlights = sorted(highlights_count.items(), key=lambda x: x[1], reverse=True)[:5]
         common_improvements = sorted(improvements_count.items(), key=lambda x: x[1], reverse=True)[:5]
         
         return {
             'total_feedback': total,
-            'average_rating': sum(ratings) / len(ratings) if ratings else 0,
-            'recommendation_rate': (recommendations / total * 100) if total > 0 else 0,
+            'average_rating': rollup.get('rating_sum', 0) / total,
+            'recommendation_rate': rollup.get('recommendations', 0) / total * 100,
             'top_highlights': [{'item': h[0], 'count': h[1]} for h in top_highlights],
             'common_improvements': [{'item': i[0], 'count': i[1]} for i in common_improvements]
         }
+    
+    async def _rebuild_feedback_rollup(self) -> Dict:
+        """
+        Recompute the rollup from every feedback document and mark it seeded.
+        
+        Only needed once for feedback written before the rollup existed;
+        afterwards submit_feedback keeps the document current. Runs in a
+        transaction so submissions racing the rebuild retry against the
+        seeded rollup instead of being lost or counted twice.
+        """
+        # Only the fields the rollup needs are transferred
+        fields = ['rating', 'would_recommend', 'highlights', 'improvements']
+        
+        @async_transactional
+        async def seed_rollup(transaction):
+            snapshot = await self.stats_doc.get(transaction=transaction)
+            if self._is_seeded(snapshot):
+                # Another request seeded it first
+                return snapshot.to_dict()
+            
+            docs = await self.feedback_collection.select(fields).get(transaction=transaction)
+            
+            rollup = {
+                'total_feedback': 0,
+                'rating_sum': 0,
+                'recommendations': 0,
+                'highlights': {},
+                'improvements': {}
+            }
+            for doc in docs:
+                data = doc.to_dict()
+                rollup['total_feedback'] += 1
+                rollup['rating_sum'] += data.get('rating', 0)
+                
+                if data.get('would_recommend', False):
+                    rollup['recommendations'] += 1
+                
+                for highlight in data.get('highlights', []):
+                    rollup['highlights'][highlight] = rollup['highlights'].get(highlight, 0) + 1
+                
+                for improvement in data.get('improvements', []):
+                    rollup['improvements'][improvement] = rollup['improvements'].get(improvement, 0) + 1
+            
+            transaction.set(self.stats_doc, {**rollup, 'seeded': True, 'updated_at': SERVER_TIMESTAMP})
+            logger.info("Rebuilt feedback rollup from %d documents", rollup['total_feedback'])
+            return rollup
+        
+        return await seed_rollup(self.db.transaction())
 
-
-# Singleton instance
-_feedback_service_instance = None
-
-def get_feedback_service(db: Client) -> FeedbackService:
+# Singleton instance (memoized by lru_cache)
+@lru_cache(maxsize=None)
+def get_feedback_service(db: AsyncClient) -> FeedbackService:
     """Get or create the feedback service singleton"""
-    global _feedback_service_instance
-    if _feedback_service_instance is None:
-        _feedback_service_instance = FeedbackService(db)
-    return _feedback_service_instance
+    return FeedbackService(db)
@@ -2,13 +2,59 @@
 Firebase Authentication utilities for FastAPI
 """
 
+import hashlib
+import threading
+import time
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from firebase_admin import auth
 from typing import Optional
+from cachetools import TTLCache
+from firestore_service import run_in_firestore_pool
 
 security = HTTPBearer(auto_error=False)  # auto_error=False makes it optional
 
+# Verified ID token claims, keyed by a token digest (raw tokens are never stored).
+# Firebase ID tokens live at most 1 hour; entries are also checked against 'exp'.
+TOKEN_CACHE_MAXSIZE = 10_000
+TOKEN_CACHE_TTL_SECONDS = 3600
+TOKEN_CLOCK_SKEW_SECONDS = 30
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_MAXSIZE, ttl=TOKEN_CACHE_TTL_SECONDS)
+_token_cache_lock = threading.Lock()
+
+
+def _token_cache_key(token: str) -> bytes:
+    """Short digest of the token used as the cache key"""
+    return hashlib.sha256(token.encode()).digest()[:16]
+
+
+async def verify_id_token_cached(token: str) -> dict:
+    """
+    Verify a Firebase ID token, reusing the result until shortly before it expires.
+    
+    Skips the RSA signature check (and any certificate fetch) for tokens that
+    were already verified. Verification runs off the event loop.
+    
+    Args:
+        token: Firebase ID token
+        
+    Returns:
+        Decoded token claims
+        
+    Raises:
+        Whatever auth.verify_id_token raises for invalid or expired tokens
+    """
+    key = _token_cache_key(token)
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+    if cached and cached['exp'] - TOKEN_CLOCK_SKEW_SECONDS > time.time():
+        return cached['claims']
+    
+    claims = await run_in_firestore_pool(auth.verify_id_token, token)
+    with _token_cache_lock:
+        _token_cache[key] = {'claims': claims, 'exp': claims.get('exp', 0)}
+    return claims
+
 
 class FirebaseUser:
     """
@@ -47,8 +93,8 @@ async def get_current_user(
     token = credentials.credentials
 
     try:
-        # Verify the Firebase ID token
-        decoded_token = auth.verify_id_token(token)
+        # Verify the Firebase ID token (cached, off the event loop)
+        decoded_token = await verify_id_token_cached(token)
 
         # Extract user information
         uid = decoded_token.get('uid')
@@ -93,7 +139,7 @@ async def get_optional_user(
     
     try:
         token = credentials.credentials
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = await verify_id_token_cached(token)
         
         uid = decoded_token.get('uid')
         email = decoded_token.get('email', 'unknown@example.com')
@@ -3,7 +3,7 @@ Firebase configuration and initialization
 """
 
 import firebase_admin
-from firebase_admin import credentials, auth, firestore
+from firebase_admin import credentials, auth, firestore, firestore_async
 import os
 import json
 from dotenv import load_dotenv
@@ -71,6 +71,20 @@ def get_firestore_client():
         return None
 
 
+# Get async Firestore client
+def get_async_firestore_client():
+    """
+    Get async Firestore database client for use from async endpoints.
+    RPCs are awaited instead of blocking the event loop thread.
+    """
+    try:
+        db = firestore_async.client()
+        return db
+    except Exception as e:
+        print(f"[ERROR] Error getting async Firestore client: {e}")
+        return None
+
+
 # Firebase Auth helper functions
 def verify_firebase_token(id_token: str):
     """
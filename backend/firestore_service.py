@@ -1,12 +1,60 @@
-﻿from firebase_config import get_firestore_client
+﻿from firebase_config import get_firestore_client, get_async_firestore_client
 from datetime import datetime
 from typing import Optional, Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import copy
 import logging
+import threading
+from cachetools import TTLCache
     
 
 
 logger = logging.getLogger(__name__)
 
+# Bounded pool for the blocking Firestore/Firebase Admin SDKs, so async endpoints
+# never run them on the event loop thread
+FIRESTORE_POOL_MAX_WORKERS = 32
+FIRESTORE_POOL = ThreadPoolExecutor(
+    max_workers=FIRESTORE_POOL_MAX_WORKERS, thread_name_prefix="firestore"
+)
+
+
+async def run_in_firestore_pool(fn, *args, **kwargs):
+    """Run a blocking SDK call on FIRESTORE_POOL and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(FIRESTORE_POOL, partial(fn, *args, **kwargs))
+
+# Firestore rejects batches with more than 500 writes
+FIRESTORE_BATCH_LIMIT = 500
+
+
+def batched_write(db, ops, chunk_size: int = FIRESTORE_BATCH_LIMIT) -> int:
+    """
+    Commit many document writes as atomic batches instead of one RPC each.
+    
+    Args:
+        db: Firestore client
+        ops: Iterable of (DocumentReference, data) pairs to set
+        chunk_size: Writes per batch (at most 500)
+        
+    Returns:
+        Number of documents written
+    """
+    ops = list(ops)
+    for i in range(0, len(ops), chunk_size):
+        batch = db.batch()
+        for doc_ref, data in ops[i:i + chunk_size]:
+            batch.set(doc_ref, data)
+        batch.commit()
+    return len(ops)
+
+# Short-lived read-through cache for user profiles; writes invalidate the entry.
+# Per-process only - each worker keeps its own copy.
+PROFILE_CACHE_MAXSIZE = 10_000
+PROFILE_CACHE_TTL_SECONDS = 60
+
 class FirestoreService:
     def create_user_profile(self, user_id: str, email: str, name: str = None) -> Dict[str, Any]:
         """Create a new user profile in Firestore"""
@@ -21,6 +69,7 @@ class FirestoreService:
                 'learned_preferences': {}
             }
             self.db.collection('user_profiles').document(user_id).set(profile_data)
+            self.invalidate_user_profile(user_id)
             profile_data['id'] = user_id
             return profile_data
         except Exception as e:
@@ -37,6 +86,7 @@ class FirestoreService:
                 profile_data['created_at'] = datetime.utcnow()
             
             self.db.collection('user_profiles').document(user_id).set(profile_data, merge=True)
+            self.invalidate_user_profile(user_id)
             print(f"✅ Created/Updated profile for user {user_id}")
             return True
         except Exception as e:
@@ -81,15 +131,19 @@ class FirestoreService:
             raise
 
     def get_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
-        """Get user profile data from Firestore"""
+        """Get user profile data from Firestore (served from cache for up to 60s)"""
         if not self.db:
             print(f"⚠️ Firestore not initialized")
             return None
+        cached = self.get_cached_user_profile(user_id)
+        if cached is not None:
+            return cached
         try:
             doc = self.db.collection('user_profiles').document(user_id).get()
             if doc.exists:
                 profile_data = doc.to_dict()
                 profile_data['id'] = doc.id
+                self.cache_user_profile(user_id, profile_data)
                 return profile_data
             else:
                 print(f"❌ User profile {user_id} does not exist in user_profiles collection")
@@ -123,8 +177,29 @@ class FirestoreService:
             return False
     def __init__(self):
         self.db = get_firestore_client()
+        # Async client for services that await Firestore RPCs on the event loop
+        self.async_db = get_async_firestore_client()
+        self._profile_cache = TTLCache(maxsize=PROFILE_CACHE_MAXSIZE, ttl=PROFILE_CACHE_TTL_SECONDS)
+        self._profile_cache_lock = threading.Lock()
         print("[OK] FirestoreService initialized")
     
+    def get_cached_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get a copy of the cached profile, or None on a miss"""
+        with self._profile_cache_lock:
+            profile_data = self._profile_cache.get(user_id)
+        # Copies so callers can't mutate the cached entry
+        return copy.deepcopy(profile_data) if profile_data is not None else None
+    
+    def cache_user_profile(self, user_id: str, profile_data: Dict[str, Any]):
+        """Store a copy of a freshly read profile"""
+        with self._profile_cache_lock:
+            self._profile_cache[user_id] = copy.deepcopy(profile_data)
+    
+    def invalidate_user_profile(self, user_id: str):
+        """Drop a cached profile after it was written"""
+        with self._profile_cache_lock:
+            self._profile_cache.pop(user_id, None)
+    
     def get_user_trip_plans(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
         """Get all trip plans for a user"""
         if not self.db:
@@ -292,3 +367,103 @@ class FirestoreService:
             return []
 
 firestore_service = FirestoreService()
+
+
+class ProfileBatcher:
+    """
+    Coalesces concurrent user profile lookups into a single get_all RPC.
+    
+    Requests arriving within MAX_WAIT_MS of each other (up to MAX_BATCH)
+    are fetched together, so a burst of logins costs ~1 round trip.
+    """
+    MAX_BATCH = 50
+    MAX_WAIT_MS = 5
+    
+    def __init__(self, async_db, collection: str = 'user_profiles', profile_cache=None):
+        self.async_db = async_db
+        self.collection = collection
+        # Optional FirestoreService whose profile cache is read and filled
+        self.profile_cache = profile_cache
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight = set()  # Strong refs so pending fetches aren't GC'd
+    
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a user profile, batched with other concurrent lookups
+        
+        Args:
+            user_id: User ID
+            
+        Returns:
+            Profile dict (with 'id') or None if the profile does not exist
+        """
+        if not self.async_db:
+            return None
+        
+        if self.profile_cache:
+            cached = self.profile_cache.get_cached_user_profile(user_id)
+            if cached is not None:
+                return cached
+        
+        # Started lazily and restarted if the caller is on a different loop:
+        # a worker left on a closed loop never finishes and would strand requests
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._collect_batches())
+        
+        future = loop.create_future()
+        await self._queue.put((user_id, future))
+        return await future
+    
+    async def _collect_batches(self):
+        """Drain the queue into batches bounded by size and wait time"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.MAX_WAIT_MS / 1000
+            while len(batch) < self.MAX_BATCH:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Don't hold up the next batch while this one is in flight
+            task = asyncio.create_task(self._fetch_batch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+    
+    async def _fetch_batch(self, batch):
+        """Fetch one batch of profiles and resolve the waiting futures"""
+        user_ids = list(dict.fromkeys(user_id for user_id, _ in batch))
+        collection_ref = self.async_db.collection(self.collection)
+        profiles = {}
+        try:
+            refs = [collection_ref.document(user_id) for user_id in user_ids]
+            async for doc in self.async_db.get_all(refs):
+                if doc.exists:
+                    profile_data = doc.to_dict()
+                    profile_data['id'] = doc.id
+                    profiles[doc.id] = profile_data
+                    if self.profile_cache:
+                        self.profile_cache.cache_user_profile(doc.id, profile_data)
+        except Exception as e:
+            logger.error(f"Error batch-fetching {len(user_ids)} user profiles: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for user_id, future in batch:
+            if not future.done():
+                profile_data = profiles.get(user_id)
+                # Each caller gets its own copy in case it mutates the profile
+                future.set_result(copy.deepcopy(profile_data) if profile_data else None)
+
+
+profile_batcher = ProfileBatcher(firestore_service.async_db, profile_cache=firestore_service)
@@ -4,8 +4,19 @@ Supports SMS, WhatsApp, and Email notifications
 """
 
 import os
+import re
+import asyncio
+import queue
+import threading
+import time
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
+from twilio.base.exceptions import TwilioRestException
+import requests
+from requests.adapters import HTTPAdapter
 import smtplib
+from html import escape
+from string import Template
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
@@ -14,6 +25,108 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Authenticated SMTP connections kept open between sends
+SMTP_POOL_SIZE = 8
+SMTP_KEEPALIVE_SECONDS = 60
+
+# Keep-alive HTTPS pool shared by all Twilio SMS/WhatsApp sends
+TWILIO_POOL_CONNECTIONS = 16
+TWILIO_POOL_MAXSIZE = 32
+
+# Outbound rate per Twilio sender (long codes default to 1 message/second)
+TWILIO_MESSAGES_PER_SECOND = float(os.getenv('TWILIO_MESSAGES_PER_SECOND', '1'))
+TWILIO_MAX_RETRIES = 3
+TWILIO_RETRY_BASE_SECONDS = 0.5
+
+# Alerts waiting for background delivery; beyond this, new alerts are rejected
+ALERT_QUEUE_MAXSIZE = 1000
+
+# Severity badge colours for alert emails
+SEVERITY_COLORS = {
+    'CRITICAL': '#dc2626',
+    'HIGH': '#ea580c',
+    'MEDIUM': '#f59e0b',
+}
+DEFAULT_SEVERITY_COLOR = '#3b82f6'
+
+
+def _minify_css(css: str) -> str:
+    """Collapse whitespace in a stylesheet (enough for our hand-written CSS)"""
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};:,])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+# Static stylesheet for alert emails, minified once at import
+_ALERT_EMAIL_CSS = _minify_css("""
+    body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+    .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+    .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
+              color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }
+    .severity { color: white; padding: 5px 15px; border-radius: 20px; display: inline-block; 
+                font-weight: bold; font-size: 14px; }
+    .content { background: #f9fafb; padding: 30px; }
+    .alert-box { background: white; border-left: 4px solid #667eea; 
+                 padding: 20px; margin: 20px 0; border-radius: 5px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
+    .location { color: #6b7280; font-size: 14px; margin-top: 10px; }
+    .action-box { background: #fef3c7; border-left: 4px solid #f59e0b; 
+                  padding: 15px; margin: 20px 0; border-radius: 5px; }
+    .footer { background: #1f2937; color: #9ca3af; padding: 20px; 
+              text-align: center; font-size: 12px; border-radius: 0 0 10px 10px; }
+    h2 { margin-top: 0; color: #111827; }
+    .cta-button { background: #667eea; color: white; padding: 12px 30px; 
+                  text-decoration: none; border-radius: 5px; display: inline-block; 
+                  margin-top: 20px; font-weight: bold; }
+""")
+
+# Everything up to <body> is identical for every alert
+_ALERT_EMAIL_HEAD = (
+    '<!DOCTYPE html><html><head><meta charset="utf-8">'
+    f'<style>{_ALERT_EMAIL_CSS}</style></head>'
+)
+
+# Per-alert body, parsed once at import; the severity colour is inlined
+# so the stylesheet above stays constant
+_ALERT_EMAIL_BODY = Template(
+    '<body><div class="container">'
+    '<div class="header"><h1>🚨 Security Alert</h1>'
+    '<span class="severity" style="background-color:$severity_color">$severity PRIORITY</span></div>'
+    '<div class="content"><div class="alert-box">'
+    '<h2>$title</h2><p>$message</p>'
+    '<div class="location">📍 Location: $location</div></div>'
+    '$action_block'
+    '<p>Stay safe and keep your travel plans updated.</p>'
+    '<a href="https://voyage-app.com/alerts" class="cta-button">View All Alerts</a></div>'
+    '<div class="footer"><p>This is an automated security alert from Voyage.</p>'
+    '<p>You are receiving this because you have an active trip to $location.</p>'
+    '<p>Manage your notification preferences in the app settings.</p></div>'
+    '</div></body></html>'
+)
+
+
+class _TokenBucket:
+    """Thread-safe token bucket used to pace sends from a single sender number"""
+    
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
 
 class NotificationService:
     """Send notifications via SMS, WhatsApp, and Email"""
@@ -33,14 +146,77 @@ class NotificationService:
         self.from_email = os.getenv('FROM_EMAIL', self.smtp_email)
         self.from_name = os.getenv('FROM_NAME', 'Voyage Security Alerts')
         
+        # Reuse logged-in SMTP sessions instead of paying TLS + AUTH per email
+        self._smtp_pool: "queue.Queue[smtplib.SMTP]" = queue.Queue(maxsize=SMTP_POOL_SIZE)
+        self._smtp_keepalive_thread: Optional[threading.Thread] = None
+        self._smtp_keepalive_lock = threading.Lock()
+        
+        # Per-sender pacing so bursts don't overflow Twilio's queue
+        self._sender_buckets: Dict[str, _TokenBucket] = {}
+        self._sender_buckets_lock = threading.Lock()
+        
+        # Background alert delivery, created lazily inside the running event loop
+        self._alert_queue: Optional[asyncio.Queue] = None
+        self._alert_worker: Optional[asyncio.Task] = None
+        
         # Initialize Twilio client
         if self.twilio_account_sid and self.twilio_auth_token:
-            self.twilio_client = Client(self.twilio_account_sid, self.twilio_auth_token)
+            self.twilio_client = Client(
+                self.twilio_account_sid,
+                self.twilio_auth_token,
+                http_client=self._build_twilio_http_client()
+            )
             logger.info("✅ Twilio client initialized")
         else:
             self.twilio_client = None
             logger.warning("⚠️ Twilio credentials not configured")
     
+    @staticmethod
+    def _build_twilio_http_client() -> TwilioHttpClient:
+        """Twilio HTTP client backed by a pooled session so TLS connections are reused"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=TWILIO_POOL_CONNECTIONS,
+            pool_maxsize=TWILIO_POOL_MAXSIZE
+        )
+        session.mount('https://', adapter)
+        
+        http_client = TwilioHttpClient()
+        http_client.session = session
+        return http_client
+    
+    def _sender_bucket(self, sender: str) -> _TokenBucket:
+        """Get the rate limiter for a sender number"""
+        with self._sender_buckets_lock:
+            bucket = self._sender_buckets.get(sender)
+            if bucket is None:
+                bucket = _TokenBucket(TWILIO_MESSAGES_PER_SECOND)
+                self._sender_buckets[sender] = bucket
+            return bucket
+    
+    def _create_twilio_message(self, body: str, from_: str, to: str):
+        """
+        Create a Twilio message, pacing per sender and retrying on 429 or
+        connection errors with exponential backoff. Message creation isn't
+        idempotent, so a 5xx (the message may have gone out) is raised as-is.
+        """
+        bucket = self._sender_bucket(from_)
+        for attempt in range(TWILIO_MAX_RETRIES + 1):
+            bucket.acquire()
+            try:
+                return self.twilio_client.messages.create(body=body, from_=from_, to=to)
+            except TwilioRestException as e:
+                if e.status != 429 or attempt == TWILIO_MAX_RETRIES:
+                    raise
+                reason = f"Twilio returned {e.status}"
+            except requests.exceptions.ConnectionError as e:
+                if attempt == TWILIO_MAX_RETRIES:
+                    raise
+                reason = f"Twilio connection failed ({e})"
+            delay = TWILIO_RETRY_BASE_SECONDS * (2 ** attempt)
+            logger.warning(f"⚠️ {reason}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+    
     def send_sms(self, phone_number: str, message: str) -> Dict[str, Any]:
         """
         Send SMS notification via Twilio
@@ -65,7 +241,7 @@ class NotificationService:
             }
         
         try:
-            message_obj = self.twilio_client.messages.create(
+            message_obj = self._create_twilio_message(
                 body=message,
                 from_=self.twilio_phone_number,
                 to=phone_number
@@ -113,7 +289,7 @@ class NotificationService:
             from_whatsapp = self.twilio_whatsapp_number
             to_whatsapp = f"whatsapp:{phone_number}"
             
-            message_obj = self.twilio_client.messages.create(
+            message_obj = self._create_twilio_message(
                 body=message,
                 from_=from_whatsapp,
                 to=to_whatsapp
@@ -133,6 +309,71 @@ class NotificationService:
                 'error': str(e)
             }
     
+    def _create_smtp_conn(self) -> smtplib.SMTP:
+        """Open a new SMTP connection and authenticate it"""
+        conn = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30)
+        try:
+            conn.starttls()
+            conn.login(self.smtp_email, self.smtp_password)
+        except Exception:
+            self._close_smtp_conn(conn)
+            raise
+        return conn
+    
+    @staticmethod
+    def _close_smtp_conn(conn: smtplib.SMTP):
+        """Close an SMTP connection, ignoring errors from a dead socket"""
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+    
+    def _get_smtp_conn(self) -> smtplib.SMTP:
+        """Take a pooled SMTP connection, or open a new one if none are idle"""
+        self._ensure_smtp_keepalive()
+        try:
+            return self._smtp_pool.get_nowait()
+        except queue.Empty:
+            return self._create_smtp_conn()
+    
+    def _put_smtp_conn(self, conn: smtplib.SMTP, check: bool = False):
+        """Return a connection to the pool, closing it if unhealthy or surplus"""
+        try:
+            if check and conn.noop()[0] != 250:
+                raise smtplib.SMTPException("NOOP rejected")
+            self._smtp_pool.put_nowait(conn)
+        except (smtplib.SMTPException, OSError, queue.Full):
+            self._close_smtp_conn(conn)
+    
+    def _ensure_smtp_keepalive(self):
+        """Start the keep-alive thread the first time SMTP is used"""
+        if self._smtp_keepalive_thread is not None:
+            return
+        with self._smtp_keepalive_lock:
+            if self._smtp_keepalive_thread is None:
+                self._smtp_keepalive_thread = threading.Thread(
+                    target=self._smtp_keepalive_loop,
+                    name="smtp-keepalive",
+                    daemon=True
+                )
+                self._smtp_keepalive_thread.start()
+    
+    def _smtp_keepalive_loop(self):
+        """Send NOOP on idle pooled connections so servers don't time them out"""
+        while True:
+            time.sleep(SMTP_KEEPALIVE_SECONDS)
+            idle = []
+            while True:
+                try:
+                    idle.append(self._smtp_pool.get_nowait())
+                except queue.Empty:
+                    break
+            for conn in idle:
+                self._put_smtp_conn(conn, check=True)
+    
     def send_email(self, to_email: str, subject: str, html_body: str, text_body: Optional[str] = None) -> Dict[str, Any]:
         """
         Send email notification via SMTP
@@ -166,11 +407,20 @@ class NotificationService:
             # Add HTML version
             msg.attach(MIMEText(html_body, 'html'))
             
-            # Send email
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_email, self.smtp_password)
-                server.send_message(msg)
+            # Send email over a pooled connection; a pooled connection may
+            # have been dropped by the server, so retry once on a fresh one
+            conn = self._get_smtp_conn()
+            try:
+                try:
+                    conn.send_message(msg)
+                except smtplib.SMTPServerDisconnected:
+                    self._close_smtp_conn(conn)
+                    conn = self._create_smtp_conn()
+                    conn.send_message(msg)
+            except Exception:
+                self._close_smtp_conn(conn)
+                raise
+            self._put_smtp_conn(conn)
             
             logger.info(f"✅ Email sent to {to_email}: {subject}")
             return {
@@ -185,7 +435,7 @@ class NotificationService:
                 'error': str(e)
             }
     
-    def send_security_alert(
+    async def send_security_alert(
         self,
         alert_data: Dict[str, Any],
         user_profile: Dict[str, Any]
@@ -193,6 +443,9 @@ class NotificationService:
         """
         Send security alert via all enabled channels
         
+        Channels are dispatched concurrently on worker threads, so the
+        total time is that of the slowest channel rather than the sum.
+        
         Args:
             alert_data: Safety alert information (severity, title, message, etc.)
             user_profile: User profile with contact info and notification preferences
@@ -205,6 +458,8 @@ class NotificationService:
             'whatsapp': [],
             'email': []
         }
+        # (channel, recipient field, recipient, pending send) for each enabled channel
+        deliveries = []
         
         # Get notification preferences
         notification_prefs = user_profile.get('notification_preferences', {})
@@ -229,84 +484,37 @@ class NotificationService:
         if sms_enabled:
             phone_number = user_profile.get('phone_number')
             if phone_number:
-                sms_result = self.send_sms(phone_number, sms_message)
-                results['sms'].append({
-                    'phone_number': phone_number,
-                    **sms_result
-                })
+                deliveries.append((
+                    'sms', 'phone_number', phone_number,
+                    asyncio.to_thread(self.send_sms, phone_number, sms_message)
+                ))
         
         # Send WhatsApp
         if whatsapp_enabled:
             # Can use same phone or separate WhatsApp number
             whatsapp_number = notification_prefs.get('whatsapp_number') or user_profile.get('phone_number')
             if whatsapp_number:
-                whatsapp_result = self.send_whatsapp(whatsapp_number, sms_message)
-                results['whatsapp'].append({
-                    'phone_number': whatsapp_number,
-                    **whatsapp_result
-                })
+                deliveries.append((
+                    'whatsapp', 'phone_number', whatsapp_number,
+                    asyncio.to_thread(self.send_whatsapp, whatsapp_number, sms_message)
+                ))
         
         # Send Email
         if email_enabled:
             email = user_profile.get('email')
             if email:
-                # HTML email template
-                html_body = f"""
-                <!DOCTYPE html>
-                <html>
-                <head>
-                    <style>
-                        body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                        .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
-                                   color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-                        .severity-{severity.lower()} {{ 
-                            background-color: {'#dc2626' if severity == 'CRITICAL' else '#ea580c' if severity == 'HIGH' else '#f59e0b' if severity == 'MEDIUM' else '#3b82f6'};
-                            color: white; padding: 5px 15px; border-radius: 20px; display: inline-block; 
-                            font-weight: bold; font-size: 14px;
-                        }}
-                        .content {{ background: #f9fafb; padding: 30px; }}
-                        .alert-box {{ background: white; border-left: 4px solid #667eea; 
-                                     padding: 20px; margin: 20px 0; border-radius: 5px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }}
-                        .location {{ color: #6b7280; font-size: 14px; margin-top: 10px; }}
-                        .action-box {{ background: #fef3c7; border-left: 4px solid #f59e0b; 
-                                      padding: 15px; margin: 20px 0; border-radius: 5px; }}
-                        .footer {{ background: #1f2937; color: #9ca3af; padding: 20px; 
-                                  text-align: center; font-size: 12px; border-radius: 0 0 10px 10px; }}
-                        h2 {{ margin-top: 0; color: #111827; }}
-                        .cta-button {{ background: #667eea; color: white; padding: 12px 30px; 
-                                      text-decoration: none; border-radius: 5px; display: inline-block; 
-                                      margin-top: 20px; font-weight: bold; }}
-                    </style>
-                </head>
-                <body>
-                    <div class="container">
-                        <div class="header">
-                            <h1>🚨 Security Alert</h1>
-                            <span class="severity-{severity.lower()}">{severity} PRIORITY</span>
-                        </div>
-                        <div class="content">
-                            <div class="alert-box">
-                                <h2>{title}</h2>
-                                <p>{message}</p>
-                                <div class="location">📍 Location: {location}</div>
-                            </div>
-                            
-                            {f'<div class="action-box"><strong>⚠️ Action Required:</strong><br>{action}</div>' if action else ''}
-                            
-                            <p>Stay safe and keep your travel plans updated.</p>
-                            
-                            <a href="https://voyage-app.com/alerts" class="cta-button">View All Alerts</a>
-                        </div>
-                        <div class="footer">
-                            <p>This is an automated security alert from Voyage.</p>
-                            <p>You are receiving this because you have an active trip to {location}.</p>
-                            <p>Manage your notification preferences in the app settings.</p>
-                        </div>
-                    </div>
-                </body>
-                </html>
-                """
+                # HTML email template (values escaped, template compiled at import)
+                html_body = _ALERT_EMAIL_HEAD + _ALERT_EMAIL_BODY.substitute(
+                    severity=escape(severity),
+                    severity_color=SEVERITY_COLORS.get(severity, DEFAULT_SEVERITY_COLOR),
+                    title=escape(title),
+                    message=escape(message),
+                    location=escape(location),
+                    action_block=(
+                        f'<div class="action-box"><strong>⚠️ Action Required:</strong><br>{escape(action)}</div>'
+                        if action else ''
+                    )
+                )
                 
                 # Plain text fallback
                 text_body = f"""
@@ -327,14 +535,69 @@ class NotificationService:
                 """
                 
                 subject = f"🚨 {severity} Security Alert: {title}"
-                email_result = self.send_email(email, subject, html_body, text_body)
-                results['email'].append({
-                    'email': email,
-                    **email_result
-                })
+                deliveries.append((
+                    'email', 'email', email,
+                    asyncio.to_thread(self.send_email, email, subject, html_body, text_body)
+                ))
+        
+        outcomes = await asyncio.gather(
+            *(send for _, _, _, send in deliveries),
+            return_exceptions=True
+        )
+        
+        for (channel, field, recipient, _), outcome in zip(deliveries, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"❌ {channel} delivery failed for {recipient}: {str(outcome)}")
+                outcome = {
+                    'success': False,
+                    'error': str(outcome)
+                }
+            results[channel].append({
+                field: recipient,
+                **outcome
+            })
         
         return results
 
+    async def enqueue_security_alert(
+        self,
+        alert_data: Dict[str, Any],
+        user_profile: Dict[str, Any]
+    ) -> bool:
+        """
+        Queue a security alert for background delivery and return immediately
+        
+        Use this from request handlers so provider latency and retries never
+        hold up the API response. Delivery results are logged by the worker.
+        
+        Returns:
+            True if queued, False if the queue is full
+        """
+        if self._alert_queue is None:
+            self._alert_queue = asyncio.Queue(maxsize=ALERT_QUEUE_MAXSIZE)
+        if self._alert_worker is None or self._alert_worker.done():
+            self._alert_worker = asyncio.create_task(self._alert_delivery_worker())
+        
+        try:
+            self._alert_queue.put_nowait((alert_data, user_profile))
+            return True
+        except asyncio.QueueFull:
+            logger.error(f"❌ Alert queue full, dropping alert: {alert_data.get('title')}")
+            return False
+    
+    async def _alert_delivery_worker(self):
+        """Deliver queued alerts one at a time"""
+        while True:
+            alert_data, user_profile = await self._alert_queue.get()
+            try:
+                results = await self.send_security_alert(alert_data, user_profile)
+                sent = sum(1 for channel in results.values() for r in channel if r.get('success'))
+                logger.info(f"✅ Alert '{alert_data.get('title')}' delivered on {sent} channel(s)")
+            except Exception as e:
+                logger.error(f"❌ Alert delivery failed: {str(e)}")
+            finally:
+                self._alert_queue.task_done()
+
 
 # Global notification service instance
 notification_service = NotificationService()
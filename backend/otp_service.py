@@ -3,24 +3,94 @@ OTP Verification Service for Voyage
 Handles OTP generation, storage, and verification using Fast2SMS
 """
 
-import random
-import string
-from datetime import datetime, timedelta
+import heapq
+import hmac
+import secrets
+import threading
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional, Dict
 import os
+import re
 from dotenv import load_dotenv
+import redis
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 load_dotenv()
 
-# In-memory OTP storage (in production, use Redis or database)
+# In-memory OTP storage, used when REDIS_URL is not configured (local development)
 otp_storage: Dict[str, Dict] = {}
 
+# Min-heap of (expires_at, identifier) so cleanup only visits expired entries.
+# Re-sent OTPs leave stale heap entries; cleanup skips them by comparing expiry.
+_otp_expiry_heap: list[tuple[datetime, str]] = []
+_otp_heap_lock = threading.Lock()
+
 # OTP Configuration
 OTP_LENGTH = 6
 OTP_VALIDITY_MINUTES = 10
 MAX_ATTEMPTS = 3
 
+# Shared OTP store so every worker can verify an OTP sent by any other worker.
+# Keys expire natively, so no cleanup sweep is needed in this mode.
+REDIS_URL = os.getenv('REDIS_URL')
+redis_client: Optional[redis.Redis] = (
+    redis.Redis.from_url(REDIS_URL, decode_responses=True) if REDIS_URL else None
+)
+
+# Atomically check state, count the attempt and compare the code.
+# Returns {status, attempts_left}; status is ok/missing/used/exhausted/invalid.
+_VERIFY_OTP_SCRIPT = """
+local data = redis.call('HMGET', KEYS[1], 'otp', 'attempts', 'verified')
+if not data[1] then
+    return {'missing', 0}
+end
+if data[3] == '1' then
+    return {'used', 0}
+end
+local max_attempts = tonumber(ARGV[2])
+if tonumber(data[2]) >= max_attempts then
+    redis.call('DEL', KEYS[1])
+    return {'exhausted', 0}
+end
+local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+if data[1] == ARGV[1] then
+    redis.call('HSET', KEYS[1], 'verified', '1')
+    return {'ok', max_attempts - attempts}
+end
+return {'invalid', max_attempts - attempts}
+"""
+_verify_otp_script = redis_client.register_script(_VERIFY_OTP_SCRIPT) if redis_client else None
+
+
+# Anything that isn't a digit is stripped from phone numbers before sending
+_PHONE_CLEAN_RE = re.compile(r'\D')
+
+# Keep-alive session for Fast2SMS so OTP bursts reuse the TLS connection.
+# The send POST isn't idempotent: only retry failed connects and 429s, never
+# reads or 5xx responses, where the SMS may already have gone out.
+FAST2SMS_URL = "https://www.fast2sms.com/dev/bulkV2"
+_fast2sms_session = requests.Session()
+_fast2sms_session.mount('https://', HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=2,
+        connect=2,
+        read=0,
+        backoff_factor=0.2,
+        status_forcelist=[429],
+        allowed_methods=frozenset({'POST'}),
+        raise_on_status=False
+    )
+))
+
+
+def _otp_key(identifier: str) -> str:
+    return f"otp:{identifier}"
+
 
 # Module-level convenience functions for backward compatibility
 def send_otp(phone_number: str) -> tuple[bool, str]:
@@ -38,8 +108,8 @@ class OTPService:
     
     @staticmethod
     def generate_otp() -> str:
-        """Generate a random 6-digit OTP"""
-        return ''.join(random.choices(string.digits, k=OTP_LENGTH))
+        """Generate a random 6-digit OTP from the OS CSPRNG"""
+        return f"{secrets.randbelow(10 ** OTP_LENGTH):0{OTP_LENGTH}d}"
     
     
     @staticmethod
@@ -55,7 +125,9 @@ class OTPService:
                 return True  # Return True for development/testing
             
             # Format phone number (only digits, remove country code)
-            clean_number = phone_number.replace('+91', '').replace('+', '').replace('-', '').replace(' ', '')
+            clean_number = _PHONE_CLEAN_RE.sub('', phone_number)
+            if len(clean_number) == 12 and clean_number.startswith('91'):
+                clean_number = clean_number[2:]
             
             # Validate phone number (should be 10 digits for India)
             if len(clean_number) != 10 or not clean_number.isdigit():
@@ -63,9 +135,6 @@ class OTPService:
                 print(f"📱 Console OTP: {otp}")
                 return True
             
-            # Use Fast2SMS quick/promotional route (no sender ID needed)
-            url = "https://www.fast2sms.com/dev/bulkV2"
-            
             # Promotional route for quick SMS
             message = f"Your Voyage verification code is {otp}. Valid for {OTP_VALIDITY_MINUTES} minutes. Do not share."
             
@@ -81,7 +150,8 @@ class OTPService:
                 "authorization": api_key
             }
             
-            response = requests.post(url, json=payload, headers=headers, timeout=10)
+            # Use Fast2SMS quick/promotional route (no sender ID needed)
+            response = _fast2sms_session.post(FAST2SMS_URL, json=payload, headers=headers, timeout=(3, 7))
             
             if response.status_code == 200:
                 result = response.json()
@@ -106,14 +176,33 @@ class OTPService:
     @staticmethod
     def store_otp(identifier: str, otp: str, method: str = 'sms'):
         """Store OTP with expiry time"""
+        if redis_client:
+            key = _otp_key(identifier)
+            pipe = redis_client.pipeline()
+            pipe.delete(key)
+            pipe.hset(key, mapping={
+                'otp': otp,
+                'method': method,
+                'attempts': 0,
+                'verified': 0
+            })
+            pipe.expire(key, OTP_VALIDITY_MINUTES * 60)
+            pipe.execute()
+            print(f"💾 OTP stored for {identifier} (expires in {OTP_VALIDITY_MINUTES} min)")
+            return
+        
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(minutes=OTP_VALIDITY_MINUTES)
         otp_storage[identifier] = {
             'otp': otp,
             'method': method,
-            'created_at': datetime.now(),
-            'expires_at': datetime.now() + timedelta(minutes=OTP_VALIDITY_MINUTES),
+            'created_at': now,
+            'expires_at': expires_at,
             'attempts': 0,
             'verified': False
         }
+        with _otp_heap_lock:
+            heapq.heappush(_otp_expiry_heap, (expires_at, identifier))
         print(f"💾 OTP stored for {identifier} (expires in {OTP_VALIDITY_MINUTES} min)")
 
     
@@ -123,6 +212,15 @@ class OTPService:
         Verify OTP for given identifier
         Returns: {success: bool, message: str}
         """
+        if not isinstance(otp, str):
+            return {
+                'success': False,
+                'message': 'Invalid OTP format.'
+            }
+        
+        if redis_client:
+            return OTPService._verify_otp_redis(identifier, otp)
+        
         if identifier not in otp_storage:
             return {
                 'success': False,
@@ -139,8 +237,8 @@ class OTPService:
             }
         
         # Check expiry
-        if datetime.now() > stored_data['expires_at']:
-            del otp_storage[identifier]
+        if datetime.now(timezone.utc) > stored_data['expires_at']:
+            otp_storage.pop(identifier, None)
             return {
                 'success': False,
                 'message': 'OTP expired. Please request a new one.'
@@ -148,7 +246,7 @@ class OTPService:
         
         # Check max attempts
         if stored_data['attempts'] >= MAX_ATTEMPTS:
-            del otp_storage[identifier]
+            otp_storage.pop(identifier, None)
             return {
                 'success': False,
                 'message': f'Maximum attempts ({MAX_ATTEMPTS}) exceeded. Please request a new OTP.'
@@ -157,7 +255,8 @@ class OTPService:
         # Verify OTP
         stored_data['attempts'] += 1
         
-        if stored_data['otp'] == otp:
+        # Constant-time compare so response timing doesn't reveal matching digits
+        if hmac.compare_digest(stored_data['otp'], otp):
             stored_data['verified'] = True
             return {
                 'success': True,
@@ -170,6 +269,39 @@ class OTPService:
                 'message': f'Invalid OTP. {attempts_left} attempts remaining.'
             }
     
+    @staticmethod
+    def _verify_otp_redis(identifier: str, otp: str) -> Dict[str, any]:
+        """Verify OTP against the shared Redis store in a single atomic script call"""
+        status, attempts_left = _verify_otp_script(
+            keys=[_otp_key(identifier)],
+            args=[otp, MAX_ATTEMPTS]
+        )
+        
+        if status == 'ok':
+            return {
+                'success': True,
+                'message': 'OTP verified successfully!'
+            }
+        if status == 'missing':
+            return {
+                'success': False,
+                'message': 'No OTP found or OTP expired. Please request a new one.'
+            }
+        if status == 'used':
+            return {
+                'success': False,
+                'message': 'OTP already used. Please request a new one.'
+            }
+        if status == 'exhausted':
+            return {
+                'success': False,
+                'message': f'Maximum attempts ({MAX_ATTEMPTS}) exceeded. Please request a new OTP.'
+            }
+        return {
+            'success': False,
+            'message': f'Invalid OTP. {attempts_left} attempts remaining.'
+        }
+    
     @staticmethod
     def send_otp(phone_number: str) -> tuple[bool, str]:
         """
@@ -240,21 +372,42 @@ class OTPService:
     
     @staticmethod
     def cleanup_expired_otps():
-        """Remove expired OTPs from storage"""
-        now = datetime.now()
-        expired_keys = [
-            key for key, data in otp_storage.items()
-            if now > data['expires_at']
-        ]
-        for key in expired_keys:
-            del otp_storage[key]
+        """Remove expired OTPs from in-memory storage (Redis expires keys itself)"""
+        if redis_client:
+            return
+        
+        now = datetime.now(timezone.utc)
+        removed = 0
+        with _otp_heap_lock:
+            while _otp_expiry_heap and _otp_expiry_heap[0][0] <= now:
+                expires_at, identifier = heapq.heappop(_otp_expiry_heap)
+                data = otp_storage.get(identifier)
+                # Only evict if this heap entry still describes the stored OTP
+                if data and data['expires_at'] == expires_at:
+                    del otp_storage[identifier]
+                    removed += 1
         
-        if expired_keys:
-            print(f"🧹 Cleaned up {len(expired_keys)} expired OTPs")
+        if removed:
+            print(f"🧹 Cleaned up {removed} expired OTPs")
     
     @staticmethod
     def get_otp_status(identifier: str) -> Optional[Dict]:
         """Get OTP status for debugging"""
+        if redis_client:
+            key = _otp_key(identifier)
+            data = redis_client.hgetall(key)
+            if not data:
+                return {'exists': False}
+            ttl_seconds = max(redis_client.ttl(key), 0)
+            return {
+                'exists': True,
+                'method': data.get('method'),
+                'attempts': int(data.get('attempts', 0)),
+                'verified': data.get('verified') == '1',
+                'expires_at': (datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)).isoformat(),
+                'time_remaining': str(timedelta(seconds=ttl_seconds))
+            }
+        
         if identifier in otp_storage:
             data = otp_storage[identifier]
             return {
@@ -263,7 +416,7 @@ class OTPService:
                 'attempts': data['attempts'],
                 'verified': data['verified'],
                 'expires_at': data['expires_at'].isoformat(),
-                'time_remaining': str(data['expires_at'] - datetime.now())
+                'time_remaining': str(data['expires_at'] - datetime.now(timezone.utc))
             }
         return {'exists': False}
 
@@ -274,9 +427,8 @@ def cleanup_task():
     OTPService.cleanup_expired_otps()
 
 
-# Singleton instance
-_otp_service_instance = None
-
+# Singleton instance (memoized by lru_cache)
+@lru_cache(maxsize=1)
 def get_otp_service() -> OTPService:
     """
     Get or create the OTP service singleton instance
@@ -284,7 +436,4 @@ def get_otp_service() -> OTPService:
     Returns:
         OTPService instance
     """
-    global _otp_service_instance
-    if _otp_service_instance is None:
-        _otp_service_instance = OTPService()
-    return _otp_service_instance
+    return OTPService()
@@ -4,7 +4,7 @@ These schemas define the structure of data flowing through the system.
 """
 
 from pydantic import BaseModel, Field, EmailStr, field_validator
-from typing import Optional, List, Dict, Any, Union
+from typing import Optional, List, Dict, Any, Literal, Union
 from datetime import datetime
 
 
@@ -59,6 +59,21 @@ class TripDetails(BaseModel):
         }
 
 
+class ConversationalResponse(BaseModel):
+    """
+    Schema for the combined intent classification + reply at Step 0 of the orchestrator.
+    Conversational intents are answered in the same call; planning intents leave the reply empty.
+    """
+    intent: Literal[
+        "TRIP_PLANNING", "MODIFICATION_REQUEST", "DESTINATION_INQUIRY",
+        "RECOMMENDATION", "ADVICE", "GREETING", "OTHER"
+    ] = Field(description="What the user wants, as exactly one of the listed labels")
+    response_text: str = Field(
+        default="",
+        description="Reply to show the user for DESTINATION_INQUIRY, RECOMMENDATION, ADVICE, GREETING and OTHER. Empty for TRIP_PLANNING and MODIFICATION_REQUEST."
+    )
+
+
 class TripRequest(BaseModel):
     """
     Schema for the incoming API request.
@@ -71,12 +86,17 @@ class TripRequest(BaseModel):
         default=None,
         description="Previously extracted trip details from incomplete request (for conversation continuity)"
     )
+    conversation_id: Optional[str] = Field(
+        default=None,
+        description="Conversation ID returned by a previous response; the server restores that turn's extraction when previous_extraction is omitted"
+    )
     
     class Config:
         json_schema_extra = {
             "example": {
                 "prompt": "I want to plan a 7-day trip to Paris for 2 people with a budget of $3000",
-                "previous_extraction": None
+                "previous_extraction": None,
+                "conversation_id": None
             }
         }
 
@@ -91,6 +111,7 @@ class TripResponse(BaseModel):
     trip_id: Optional[str] = None  # Firestore document ID
     extracted_details: Optional[dict] = None
     research_data: Optional[dict] = None
+    conversation_id: Optional[str] = None  # Send back on the next turn to continue this trip
 
 
 class DestinationComparisonRequest(BaseModel):
@@ -1351,6 +1372,7 @@ class UserDashboard(BaseModel):
     
     # Trip Planning Section (from old dashboard)
     user_info: Optional[dict] = Field(default=None, description="User email and display name")
+    upcoming_trip: Optional[UpcomingTrip] = Field(default=None, description="Next upcoming trip")
     past_trips: List[TripSummary] = Field(default_factory=list, description="Completed trips summary")
     saved_destinations: List[dict] = Field(default_factory=list, description="User's saved destinations")
     personalized_suggestions: List[PersonalizedSuggestion] = Field(default_factory=list, description="AI-powered trip suggestions")
@@ -3,20 +3,51 @@
 # Core Imports & App Setup
 # =========================
 import os
-from typing import List, Optional, Union
-from datetime import datetime, timedelta
+import re
+import base64
+import sys
+import hashlib
+import atexit
+import logging
+import time
+import zlib
+import mmap
+import asyncio
+import threading
+import uuid
+from typing import Iterator, List, Optional, Union
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from string import Template
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
 from fastapi import FastAPI, HTTPException, Depends, Body, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from cachetools import LRUCache, TTLCache
+import orjson
+import redis.asyncio as aioredis
 
 # =========================
 # AI & Service Imports
 # =========================
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langgraph.prebuilt import create_react_agent
+# langchain_google_genai and langgraph are heavy; they are imported on first
+# use so workers serving only auth/dashboard traffic never load them.
+def _chat_model(**kwargs):
+    """Build a Gemini chat model (imports langchain_google_genai on first use)"""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(**kwargs)
+
+
+def _react_agent(model, tools, **kwargs):
+    """Build a LangGraph ReAct agent (imports langgraph on first use)"""
+    from langgraph.prebuilt import create_react_agent
+    return create_react_agent(model, tools, **kwargs)
 
 # =========================
 # Load Environment & Firebase
@@ -31,13 +62,79 @@ initialize_firebase()
 class TokenRequest(BaseModel):
     token: str
 
+# =========================
+# Logging
+# =========================
+# Request handlers only enqueue records; a background thread does the
+# stdout writes so logging never blocks the event loop on I/O
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_log_queue = SimpleQueue()
+_log_listener = QueueListener(_log_queue, _log_stream_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    handlers=[QueueHandler(_log_queue)]
+)
+# Send uvicorn's loggers through the same root handler
+for _uvicorn_logger in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+    logging.getLogger(_uvicorn_logger).handlers.clear()
+    logging.getLogger(_uvicorn_logger).propagate = True
+logger = logging.getLogger(__name__)
+
 # =========================
 # FastAPI App Initialization
 # =========================
+def _prime_firebase_public_keys():
+    """
+    Warm firebase_admin's cached copy of Google's ID token signing certificates,
+    so the first login on a new worker doesn't pay for the fetch.
+    
+    Uses only the public API: a well-formed but unsigned token passes the claim
+    checks, makes verify_id_token fetch the certificates, then fails on the
+    signature as expected.
+    """
+    def b64(data: dict) -> str:
+        return base64.urlsafe_b64encode(orjson.dumps(data)).rstrip(b'=').decode()
+    
+    try:
+        project_id = firebase_admin.get_app().project_id
+        now = int(time.time())
+        probe = '.'.join([
+            b64({'alg': 'RS256', 'kid': 'voyage-key-prime', 'typ': 'JWT'}),
+            b64({
+                'iss': f'https://securetoken.google.com/{project_id}',
+                'aud': project_id,
+                'sub': 'voyage-key-prime',
+                'iat': now,
+                'exp': now + 60,
+            }),
+            'c2ln',
+        ])
+        auth.verify_id_token(probe)
+    except auth.InvalidIdTokenError:
+        # Expected: the certificates were fetched and the fake signature rejected
+        logger.info("Firebase public keys prefetched")
+    except Exception as e:
+        # Best effort only - verify_id_token fetches the keys itself if needed
+        logger.warning("Could not prefetch Firebase public keys: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(_prime_firebase_public_keys)
+    await startup_event()
+    yield
+
+
 app = FastAPI(
     title="Voyage Travel Planner API",
     description="AI-powered travel planning orchestrator with Firebase authentication",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # orjson serializes large trip/feedback payloads several times faster than stdlib json
+    default_response_class=ORJSONResponse
 )
 
 # =========================
@@ -52,21 +149,18 @@ app.add_middleware(
         "https://voyage-app-1.onrender.com"
     ],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    # Explicit lists (not "*") plus max_age let browsers cache preflights for a day
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+    allow_headers=["Authorization", "Content-Type", "X-Request-ID"],
+    expose_headers=["X-Request-ID", "ETag"],
+    max_age=86400,
 )
 
-# =========================
-# Database & Auth Imports
-# =========================
-from database import get_db
-from sqlalchemy.orm import Session
-
 # =========================
 # Schemas & Service Imports
 # =========================
 from schemas import (
-    TripRequest, TripResponse, TripDetails,
+    TripRequest, TripResponse, TripDetails, ConversationalResponse,
     SavedTripPlan, SaveDestinationRequest, UserProfile,
     DestinationComparisonRequest, DestinationComparisonResponse,
     OptimizeDayRequest, OptimizeDayResponse,
@@ -100,12 +194,14 @@ from agent_logic import (
     get_minimum_daily_budget,
     get_travel_advisory,
     get_travel_document_info,
+    get_realtime_weather,
     estimate_transport_cost,
     estimate_transport_fallback
 )
-from firebase_auth import get_current_user, get_optional_user, FirebaseUser
+from firebase_auth import get_current_user, get_optional_user, verify_id_token_cached, FirebaseUser
+import firebase_admin
 from firebase_admin import auth
-from firestore_service import firestore_service
+from firestore_service import firestore_service, profile_batcher, run_in_firestore_pool
 from calendar_service import get_event_discovery_engine
 from taste_graph_service import get_taste_graph_builder
 from booking_links_service import get_booking_links_generator
@@ -122,10 +218,8 @@ from feedback_service import get_feedback_service
 # =========================
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
-    print(f"❌ Validation Error:")
-    print(f"   URL: {request.url}")
-    print(f"   Errors: {exc.errors()}")
-    print(f"   Body: {exc.body}")
+    logger.warning("validation error url=%s errors=%s", request.url, exc.errors())
+    logger.debug("validation error body=%s", exc.body)
     return JSONResponse(
         status_code=422,
         content={"detail": exc.errors(), "body": exc.body}
@@ -142,81 +236,112 @@ async def login(request: TokenRequest):
     """
 
     try:
-        # Verify Firebase ID token
-        decoded_token = auth.verify_id_token(request.token)
+        # Verify Firebase ID token (cached until expiry, verified off the event loop)
+        decoded_token = await verify_id_token_cached(request.token)
         uid = decoded_token.get('uid')
         name = decoded_token.get('name')
 
         if not uid:
             raise HTTPException(status_code=400, detail="UID missing in token")
 
-        print(f"[LOGIN] Received token for uid: {uid}")
-
-        # Pre-calculate relative dates for prompt examples (used elsewhere)
-        today = datetime.now()
-        next_week_date = (today + timedelta(days=7)).strftime('%Y-%m-%d')
-        next_month_date = (today.replace(day=1) + timedelta(days=32)).replace(day=1).strftime('%Y-%m-%d')
-        this_weekend_date = (today + timedelta(days=(5-today.weekday())%7)).strftime('%Y-%m-%d')
+        logger.info("[LOGIN] token uid=%s", uid)
 
         # Ensure we have an email from the token if available
         email = decoded_token.get('email')
 
-        # Try to get user profile from Firestore
-        user_profile = firestore_service.get_user_profile(uid)
+        # Fetch the Firestore profile and the Firebase Auth record concurrently;
+        # the auth record is only used if the profile is missing. Profile reads
+        # from concurrent logins are coalesced into one get_all RPC.
+        user_profile, firebase_user = await asyncio.gather(
+            profile_batcher.get(uid),
+            run_in_firestore_pool(auth.get_user, uid),
+            return_exceptions=True
+        )
+        if isinstance(user_profile, Exception):
+            raise user_profile
         if not user_profile:
-            print(f"[LOGIN] User profile not found for uid: {uid}. Creating new profile.")
+            logger.info("[LOGIN] profile missing uid=%s, creating", uid)
             # Try to supplement missing info from Firebase Auth
-            try:
-                firebase_user = auth.get_user(uid)
+            if isinstance(firebase_user, Exception):
+                logger.warning("[LOGIN] firebase auth lookup failed uid=%s error=%s", uid, firebase_user)
+            else:
                 if not email:
                     email = getattr(firebase_user, 'email', None)
                 if not name:
                     name = getattr(firebase_user, 'display_name', None)
-            except Exception as e:
-                print(f"Could not get user info from firebase auth: {e}")
 
             if not email:
                 email = f"{uid}@voyage.com"
-                print(f"[LOGIN] Email not found, using placeholder: {email}")
+                logger.info("[LOGIN] email missing uid=%s placeholder=%s", uid, email)
 
-            user_profile = firestore_service.create_user_profile(uid, email, name)
-            print(f"[LOGIN] Created new user profile: {user_profile}")
+            user_profile = await run_in_firestore_pool(firestore_service.create_user_profile, uid, email, name)
+            logger.info("[LOGIN] created profile uid=%s", uid)
 
         return {"userId": uid, "profile": user_profile}
+    except HTTPException:
+        raise
+    # Expected client-side failures (bad/expired tokens): no traceback needed
+    except auth.ExpiredIdTokenError:
+        logger.info("[LOGIN] expired token")
+        raise HTTPException(status_code=401, detail="Token has expired")
+    except auth.RevokedIdTokenError:
+        logger.info("[LOGIN] revoked token")
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    except (auth.InvalidIdTokenError, ValueError) as e:
+        logger.info("[LOGIN] invalid token: %s", e)
+        raise HTTPException(status_code=401, detail="Invalid authentication token")
     except Exception as e:
-        import traceback
-        print("[LOGIN] Token verification error:", repr(e))
-        traceback.print_exc()
-        if hasattr(e, 'message'):
-            raise HTTPException(status_code=401, detail=str(e.message))
-        else:
-            raise HTTPException(status_code=401, detail=str(e))
+        logger.exception("[LOGIN] unexpected error")
+        raise HTTPException(status_code=401, detail=str(e))
+
+
+# UserDashboard fields carried over into the legacy UserDashboardResponse
+_DASHBOARD_RESPONSE_FIELDS = frozenset({
+    'user_info', 'upcoming_trip', 'past_trips', 'saved_destinations',
+    'personalized_suggestions', 'quick_actions',
+})
+
+
+def _conditional_json_response(
+    request: Request, payload: BaseModel, cache_control: str = "private, no-cache"
+) -> Response:
+    """
+    Serialize a response model with orjson and tag it with a weak ETag.
+    Returns 304 Not Modified when the client's If-None-Match already matches.
+    """
+    body = orjson.dumps(payload.model_dump(mode="json"))
+    etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    
+    # Weak comparison: ignore W/ prefixes on either side
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        client_tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in client_tags or etag.removeprefix("W/") in client_tags:
+            return Response(status_code=304, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @app.get("/api/dashboard", response_model=UserDashboardResponse)
-async def get_dashboard(current_user: FirebaseUser = Depends(get_current_user)):
+async def get_dashboard(request: Request, current_user: FirebaseUser = Depends(get_current_user)):
     """
     Fetches and returns all data for the main user dashboard.
     Requires authentication.
     """
     try:
-        print(f"📊 Fetching dashboard for user: {current_user.uid}")
+        logger.info("[DASHBOARD] fetch uid=%s", current_user.uid)
         
         # Get dashboard data from the service
         dashboard_service = get_dashboard_service(firestore_service.db, firestore_service)
-        dashboard_data = dashboard_service.get_user_dashboard(current_user.uid, current_user.email)
+        dashboard_data = await dashboard_service.get_user_dashboard(current_user.uid, current_user.email)
         
         # The frontend expects a specific structure, so we'll adapt
-        return UserDashboardResponse(
+        return _conditional_json_response(request, UserDashboardResponse(
             success=True,
             message="Dashboard fetched successfully",
-            user_info=getattr(dashboard_data, 'user_info', {}),
-            upcoming_trip=getattr(dashboard_data, 'upcoming_trip', None),
-            past_trips=getattr(dashboard_data, 'past_trips', []),
-            saved_destinations=getattr(dashboard_data, 'saved_destinations', []),
-            personalized_suggestions=getattr(dashboard_data, 'personalized_suggestions', []),
-            quick_actions=getattr(dashboard_data, 'quick_actions', []),
-        )
+            **dashboard_data.model_dump(include=_DASHBOARD_RESPONSE_FIELDS),
+        ))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while fetching dashboard data: {e}")
 
@@ -233,19 +358,23 @@ class TrendingCache:
     """
     In-memory cache for trending destinations and events
     Refreshes every 6 hours to balance freshness and API costs
+    
+    Refreshes are single-flight: after expiry only one coroutine runs the
+    loader while the others wait for its result. Within the grace window the
+    stale data is served immediately and refreshed in the background.
     """
     def __init__(self):
         self.cache_timestamp = None
         self.cache_data = None
         self.cache_duration_hours = 6  # Refresh every 6 hours
+        self.stale_grace_seconds = 15 * 60  # Serve stale data this long past expiry
+        self._expires_at = 0.0  # time.monotonic() deadline
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
     
     def is_cache_valid(self) -> bool:
         """Check if cache is still valid"""
-        if self.cache_data is None or self.cache_timestamp is None:
-            return False
-        
-        elapsed = datetime.now() - self.cache_timestamp
-        return elapsed.total_seconds() < (self.cache_duration_hours * 3600)
+        return self.cache_data is not None and time.monotonic() < self._expires_at
     
     def get_cache(self):
         """Get cached data if valid"""
@@ -257,7 +386,44 @@ class TrendingCache:
         """Update cache with new data"""
         self.cache_data = data
         self.cache_timestamp = datetime.now()
-        print(f"✅ Trending cache updated at {self.cache_timestamp}")
+        self._expires_at = time.monotonic() + self.cache_duration_hours * 3600
+        logger.info("trending cache updated at=%s", self.cache_timestamp)
+    
+    def clear(self):
+        """Drop cached data so the next request regenerates it"""
+        self.cache_data = None
+        self.cache_timestamp = None
+        self._expires_at = 0.0
+    
+    async def get_or_refresh(self, loader):
+        """
+        Return cached data, running ``loader`` at most once per expiry.
+        
+        Args:
+            loader: Async callable producing fresh data
+        
+        Returns:
+            Cached or freshly loaded data
+        """
+        if self.is_cache_valid():
+            return self.cache_data
+        
+        # Stale-while-revalidate: answer now, refresh once in the background
+        if self.cache_data is not None and time.monotonic() < self._expires_at + self.stale_grace_seconds:
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh(loader))
+            return self.cache_data
+        
+        return await self._refresh(loader)
+    
+    async def _refresh(self, loader):
+        """Run the loader under the lock unless another caller already did"""
+        async with self._lock:
+            if self.is_cache_valid():
+                return self.cache_data
+            data = await loader()
+            self.set_cache(data)
+            return data
 
 # Global trending cache instance
 trending_cache = TrendingCache()
@@ -266,6 +432,7 @@ trending_cache = TrendingCache()
 # HELPER FUNCTIONS FOR IMAGE URLS
 # ============================================================================
 
+@lru_cache(maxsize=4096)
 def generate_unsplash_url(query: str, width: int = 800, height: int = 600) -> str:
     """
     Generate image URL using Lorem Picsum (reliable placeholder service).
@@ -279,9 +446,8 @@ def generate_unsplash_url(query: str, width: int = 800, height: int = 600) -> st
     Returns:
         Image URL from Lorem Picsum
     """
-    # Use hash of query to get consistent random image
-    import hashlib
-    hash_val = int(hashlib.md5(query.encode()).hexdigest(), 16) % 1000
+    # Use a cheap stable hash of the query to get a consistent random image
+    hash_val = zlib.crc32(query.encode()) % 1000
     return f"https://picsum.photos/id/{hash_val}/{width}/{height}"
 
 def generate_destination_image_url(destination: str) -> str:
@@ -298,17 +464,48 @@ def generate_food_image_url(dish_name: str) -> str:
 
 # Simple research data cache (destination → research data)
 # Cache lasts for 1 hour to avoid repeated API calls for same destination
-research_cache = {}
-research_cache_timestamps = {}
 RESEARCH_CACHE_DURATION_SECONDS = 3600  # 1 hour
+RESEARCH_CACHE_MAXSIZE = 1024
+research_cache = TTLCache(maxsize=RESEARCH_CACHE_MAXSIZE, ttl=RESEARCH_CACHE_DURATION_SECONDS)
+_research_cache_lock = threading.Lock()
+
+# Budget breakdown section of a generated plan, e.g. "💰 BUDGET BREAKDOWN"
+_BUDGET_SECTION_RE = re.compile(
+    r'💰.*?BUDGET.*?BREAKDOWN.*?\n(.*?)(?=\n[📋🎒✈️🏨]|$)',
+    re.DOTALL | re.IGNORECASE
+)
+
+# Category lines like "• Accommodation: ₹15,000" or "Accommodation: ₹15000",
+# combined into one alternation so the section is scanned once
+_BUDGET_CATEGORY_GROUPS = {
+    "accommodation": "Accommodation",
+    "food": "Food & Dining",
+    "transportation": "Transportation",
+    "activities": "Activities & Entertainment",
+    "shopping": "Shopping",
+    "emergency": "Emergency",
+}
+_BUDGET_CATEGORY_RE = re.compile(
+    r'(?:Accommodation|Hotels?|Stays?).*?₹\s*(?P<accommodation>[0-9,]+)'
+    r'|(?:Food|Dining|Meals?).*?₹\s*(?P<food>[0-9,]+)'
+    r'|(?:Transport|Travel|Flights?|Journey).*?₹\s*(?P<transportation>[0-9,]+)'
+    r'|(?:Activities|Entertainment|Attractions|Sightseeing).*?₹\s*(?P<activities>[0-9,]+)'
+    r'|(?:Shopping|Souvenirs).*?₹\s*(?P<shopping>[0-9,]+)'
+    r'|(?:Emergency|Contingency|Buffer).*?₹\s*(?P<emergency>[0-9,]+)',
+    re.IGNORECASE
+)
+
+# Minimum daily budget in get_minimum_daily_budget output, with the
+# amount patterns used when the tool's marker line is missing
+_EXTRACTED_MIN_RE = re.compile(r'EXTRACTED MINIMUM:\s*₹\s*(\d+)')
+_RUPEE_RE = re.compile(r'(?:₹|\bRs\.?|\bINR)\s*(\d{1,5})')
+_DOLLAR_RE = re.compile(r'\$\s*(\d{1,4})')
 
 def extract_budget_breakdown(trip_plan: str, total_budget: float) -> dict:
     """
     Extract budget breakdown from the trip plan text.
     Looks for budget breakdown section and categorizes expenses.
     """
-    import re
-    
     budget_breakdown = {
         "Accommodation": 0,
         "Food & Dining": 0,
@@ -322,31 +519,19 @@ def extract_budget_breakdown(trip_plan: str, total_budget: float) -> dict:
     try:
         # Look for budget breakdown section in the trip plan
         # Pattern: 💰 BUDGET BREAKDOWN or similar
-        budget_section_match = re.search(
-            r'💰.*?BUDGET.*?BREAKDOWN.*?\n(.*?)(?=\n[📋🎒✈️🏨]|$)', 
-            trip_plan, 
-            re.DOTALL | re.IGNORECASE
-        )
+        budget_section_match = _BUDGET_SECTION_RE.search(trip_plan)
         
         if budget_section_match:
             budget_text = budget_section_match.group(1)
             
-            # Extract category amounts
-            # Patterns like: "• Accommodation: ₹15,000" or "Accommodation: ₹15000"
-            patterns = {
-                "Accommodation": r'(?:Accommodation|Hotels?|Stays?).*?₹\s*([0-9,]+)',
-                "Food & Dining": r'(?:Food|Dining|Meals?).*?₹\s*([0-9,]+)',
-                "Transportation": r'(?:Transport|Travel|Flights?|Journey).*?₹\s*([0-9,]+)',
-                "Activities & Entertainment": r'(?:Activities|Entertainment|Attractions|Sightseeing).*?₹\s*([0-9,]+)',
-                "Shopping": r'(?:Shopping|Souvenirs).*?₹\s*([0-9,]+)',
-                "Emergency": r'(?:Emergency|Contingency|Buffer).*?₹\s*([0-9,]+)'
-            }
-            
-            for category, pattern in patterns.items():
-                match = re.search(pattern, budget_text, re.IGNORECASE)
-                if match:
-                    amount_str = match.group(1).replace(',', '')
-                    budget_breakdown[category] = float(amount_str)
+            # Extract category amounts (first amount per category wins)
+            found = set()
+            for match in _BUDGET_CATEGORY_RE.finditer(budget_text):
+                group = match.lastgroup
+                if group not in found:
+                    found.add(group)
+                    amount_str = match.group(group).replace(',', '')
+                    budget_breakdown[_BUDGET_CATEGORY_GROUPS[group]] = float(amount_str)
         
         # If no budget section found or totals don't match, estimate based on percentages
         total_extracted = sum(budget_breakdown.values())
@@ -363,7 +548,7 @@ def extract_budget_breakdown(trip_plan: str, total_budget: float) -> dict:
             }
     
     except Exception as e:
-        print(f"⚠️ Error extracting budget breakdown: {e}")
+        logger.warning("budget breakdown extraction failed: %s", e)
         # Fallback to standard allocation
         budget_breakdown = {
             "Accommodation": round(total_budget * 0.30),
@@ -379,144 +564,168 @@ def extract_budget_breakdown(trip_plan: str, total_budget: float) -> dict:
 
 def get_cached_research(destination: str) -> dict | None:
     """Get cached research data if still valid"""
-    if destination in research_cache:
-        timestamp = research_cache_timestamps.get(destination)
-        if timestamp:
-            age = (datetime.now() - timestamp).total_seconds()
-            if age < RESEARCH_CACHE_DURATION_SECONDS:
-                print(f"📦 Using cached research data for {destination} (age: {int(age)}s)")
-                return research_cache[destination]
-    return None
+    with _research_cache_lock:
+        data = research_cache.get(destination)
+    if data is not None:
+        logger.info("research cache hit destination=%s", destination)
+    return data
 
 def cache_research(destination: str, data: dict):
     """Cache research data for a destination"""
-    research_cache[destination] = data
-    research_cache_timestamps[destination] = datetime.now()
-    print(f"💾 Cached research data for {destination}")
+    with _research_cache_lock:
+        research_cache[destination] = data
+    logger.info("research cache store destination=%s", destination)
+
+# Research fan-outs in flight, keyed like research_cache; concurrent requests
+# for a cold destination await the first one instead of repeating it
+_research_inflight: dict = {}
+
+def _research_key(destination: str) -> str:
+    """research_cache / in-flight key: "Goa", "goa " and "GOA" share one entry"""
+    return destination.strip().lower()
+
+async def _run_research(destination: str, key: str) -> dict:
+    """Run the four research tools concurrently and cache the result under key."""
+    minimum_budget, travel_advisory, weather, document_info = await asyncio.gather(
+        get_minimum_daily_budget.ainvoke({"city": destination}),
+        get_travel_advisory.ainvoke({"city": destination}),
+        get_realtime_weather.ainvoke({"city": destination}),
+        get_travel_document_info.ainvoke({"destination": destination}),
+    )
+    research_data = {
+        "minimum_budget": minimum_budget,
+        "travel_advisory": travel_advisory,
+        "weather": weather,
+        "document_info": document_info
+    }
+    cache_research(key, research_data)
+    logger.info("research completed destination=%s", destination)
+    return research_data
+
+async def get_research(destination: str) -> dict:
+    """Get research data for a destination, sharing a single fetch between concurrent callers"""
+    key = _research_key(destination)
+    cached = get_cached_research(key)
+    if cached is not None:
+        return cached
+    task = _research_inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_run_research(destination.strip(), key))
+        _research_inflight[key] = task
+        task.add_done_callback(lambda _: _research_inflight.pop(key, None))
+    else:
+        logger.info("research in flight, joining destination=%s", key)
+    # Shielded so one caller disconnecting doesn't cancel the others' fetch
+    return await asyncio.shield(task)
+
+# Round-trip transport estimates per route and party size. Fares move
+# slowly, so a Tavily-based estimate is reused for a few hours.
+TRANSPORT_CACHE_TTL_SECONDS = 6 * 3600  # 6 hours
+TRANSPORT_CACHE_MAXSIZE = 2048
+transport_cost_cache = TTLCache(maxsize=TRANSPORT_CACHE_MAXSIZE, ttl=TRANSPORT_CACHE_TTL_SECONDS)
+_transport_cost_cache_lock = threading.Lock()
+
+def cached_transport_cost(origin: str, destination: str, num_people: int) -> float:
+    """estimate_transport_cost, reusing a recent estimate for the same route (failures are not cached)"""
+    key = (origin.strip().lower(), destination.strip().lower(), num_people)
+    with _transport_cost_cache_lock:
+        cost = transport_cost_cache.get(key)
+    if cost is not None:
+        logger.info("transport cost cache hit origin=%s destination=%s", origin, destination)
+        return cost
+    cost = estimate_transport_cost(origin=origin, destination=destination, num_people=num_people)
+    with _transport_cost_cache_lock:
+        transport_cost_cache[key] = cost
+    return cost
+
+
+@lru_cache(maxsize=1)
+def _relative_dates(day_bucket: date) -> dict:
+    """
+    Relative date strings used to resolve "next week" etc. in prompts.
+    Keyed on the day, so all callers on the same day share one computation.
+    """
+    return {
+        "today": day_bucket.strftime('%Y-%m-%d'),
+        "today_long": day_bucket.strftime('%B %d, %Y'),
+        "next_week": (day_bucket + timedelta(days=7)).strftime('%Y-%m-%d'),
+        "next_month": (day_bucket.replace(day=1) + timedelta(days=32)).replace(day=1).strftime('%Y-%m-%d'),
+        "this_weekend": (day_bucket + timedelta(days=(5 - day_bucket.weekday()) % 7)).strftime('%Y-%m-%d'),
+    }
 
 
-# ============================================================================
-# MASTER PROMPT CREATORS
-# ============================================================================
+# Model behind the planning agent. Hosted Gemini exposes no quantization knob,
+# so serving cost/latency is tuned by picking the model tier here.
+PLANNER_MODEL = os.getenv("PLANNER_MODEL", "models/gemini-2.0-flash-exp")
 
-def create_standard_planning_prompt(trip_details: TripDetails, research_data: dict, budget_tier: str, tier_description: str, user_preferences: dict = None) -> str:
+
+@lru_cache(maxsize=1)
+def get_planning_agent():
     """
-    Creates the master prompt for STANDARD trip planning (budget is sufficient).
-    This prompt contains detailed instructions for the ReAct agent.
-    Includes budget tier classification and user preferences for personalized planning.
+    ReAct agent used to generate trip plans. The compiled graph holds no
+    per-request state, so one instance is shared across requests.
     """
+    # Create ReAct agent with planning tools - OPTIMIZED FOR SPEED
+    llm = _chat_model(
+        model=PLANNER_MODEL,
+        temperature=0.9,  # Higher creativity for engaging responses
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        max_output_tokens=8192,  # Increased for comprehensive detailed plans
+        timeout=90  # Increased timeout for thorough planning
+    )
     
-    # Build personalization section if preferences exist
-    personalization_section = ""
-    if user_preferences:
-        prefs = user_preferences.get("preferences", {})
-        learned = user_preferences.get("learned_preferences", {})
-        
-        personalization_section = f"""
-**USER PREFERENCES & PERSONALIZATION:**
-This traveler has specific preferences that MUST be respected:
-"""
-        
-        if prefs.get("travel_style"):
-            personalization_section += f"\n- Travel Style: {', '.join(prefs['travel_style'])} - Tailor experiences to match this style"
-        
-        if prefs.get("interests"):
-            personalization_section += f"\n- Core Interests: {', '.join(prefs['interests'])} - Prioritize activities matching these interests"
-        
-        if prefs.get("accommodation_type"):
-            personalization_section += f"\n- Preferred Stays: {', '.join(prefs['accommodation_type'])} - ONLY recommend these types"
-        
-        if prefs.get("food_preferences"):
-            food_prefs = prefs['food_preferences']
-            dietary = food_prefs.get('dietary', 'no preference')
-            priorities = food_prefs.get('priorities', [])
-            personalization_section += f"\n- Food: {dietary} diet, Focus on: {', '.join(priorities) if priorities else 'local cuisine'}"
-        
-        if prefs.get("must_have_activities"):
-            personalization_section += f"\n- Must Include: {', '.join(prefs['must_have_activities'])} - These are non-negotiable"
-        
-        if prefs.get("pace"):
-            personalization_section += f"\n- Trip Pace: {prefs['pace']} - Adjust daily schedule accordingly"
-        
-        if prefs.get("transport_modes"):
-            personalization_section += f"\n- Preferred Transport: {', '.join(prefs['transport_modes'])} - Prioritize these modes"
-        
-        if prefs.get("avoided_destinations"):
-            personalization_section += f"\n- Avoid: {', '.join(prefs['avoided_destinations'])} - User wants to avoid these or already visited"
-        
-        # Add learned preferences if available
-        if learned:
-            if learned.get("recurring_interests"):
-                personalization_section += f"\n- Based on History: This user loves {', '.join(learned['recurring_interests'])} - align recommendations with past preferences"
-            
-            if learned.get("spending_pattern"):
-                personalization_section += f"\n- Spending Pattern: {learned['spending_pattern']} - User typically plans {learned.get('spending_pattern', 'moderate')} budget trips"
-        
-        personalization_section += "\n\n**CRITICAL**: These preferences are NOT optional suggestions - they represent the user's travel identity. Ignore them and the trip fails.\n"
-    
-    # Calculate budget targets outside f-string
-    budget_min_target = int(trip_details.budget * 0.7)
-    budget_max_target = int(trip_details.budget * 0.9)
-    people_text = "person" if trip_details.num_people == 1 else "people"
-    
-    prompt = f"""
-You are an expert travel AI assistant designed for Indian travelers exploring destinations worldwide. You have deep knowledge of global destinations, understand Indian traveler preferences, cultural context, and budget considerations. All pricing is in Indian Rupees (₹). Your role is to create personalized, practical trip itineraries that feel natural and conversational for Indian users.
+    # Create LangGraph React agent (without state_modifier - not supported in newer versions)
+    return _react_agent(llm, PLANNING_TOOLS)
 
-**Trip Context:**
-**🎯 YOUR TRIP DETAILS:**
-From: {trip_details.origin_city} (India)
-To: {trip_details.destination}
-Duration: {trip_details.num_days} days
-Start Date: {trip_details.start_date if trip_details.start_date else 'Not specified - use reasonable future date'}
-End Date: {trip_details.start_date if trip_details.start_date else 'start date'} + {trip_details.num_days} days (for return flight/checkout)
-Travelers: {trip_details.num_people} Indian {people_text}
-Budget: ₹{trip_details.budget} TOTAL for the ENTIRE {trip_details.num_days}-day trip ({budget_tier} tier - {tier_description})
-Interests: {trip_details.interests or 'General exploration'}
-Language: {trip_details.preferred_language or 'English'}
 
-📅 **DATE REFERENCE FOR ALL BOOKINGS:**
-✓ Outbound Flight Date: {trip_details.start_date if trip_details.start_date else '[calculate]'} → Convert to DD/MM/YYYY format
-✓ Hotel Check-in: {trip_details.start_date if trip_details.start_date else '[start date]'}
-✓ Hotel Check-out: {trip_details.start_date if trip_details.start_date else '[start date]'} + {trip_details.num_days} days
-✓ Return Flight Date: {trip_details.start_date if trip_details.start_date else '[start date]'} + {trip_details.num_days} days → Convert to DD/MM/YYYY
-✓ ALWAYS calculate return date correctly: If trip starts Dec 15 for 5 days, return is Dec 20 (NOT Dec 2!)
+@lru_cache(maxsize=1)
+def get_optimization_agent():
+    """ReAct agent behind /api/optimize-day; shared across requests like get_planning_agent()."""
+    model = _chat_model(
+        model="models/gemini-2.0-flash-exp",
+        temperature=0.7,
+        google_api_key=os.getenv("GOOGLE_API_KEY")
+    )
+    return _react_agent(model, OPTIMIZATION_TOOLS)
 
 
-⚠️⚠️⚠️ CRITICAL BUDGET INSTRUCTION ⚠️⚠️⚠️
-The budget of ₹{trip_details.budget} is the TOTAL AMOUNT for the COMPLETE {trip_details.num_days}-day trip.
-THIS IS NOT ₹{trip_details.budget} PER DAY!
-THIS IS NOT ₹{trip_details.budget} PER PERSON PER DAY!
-THIS IS ₹{trip_details.budget} FOR THE ENTIRE TRIP FOR ALL {trip_details.num_people} {people_text} ACROSS ALL {trip_details.num_days} DAYS!
+@lru_cache(maxsize=1)
+def get_comparison_agent():
+    """ReAct agent behind /api/compare-destinations; shared across requests like get_planning_agent()."""
+    llm = _chat_model(
+        model="models/gemini-2.5-flash",
+        temperature=0.7,
+        google_api_key=os.getenv("GOOGLE_API_KEY")
+    )
+    return _react_agent(llm, RESEARCH_TOOLS)
 
-Average daily budget available: ₹{trip_details.budget / trip_details.num_days:.0f} per day for all {trip_details.num_people} {people_text}
-Per person per day: ₹{trip_details.budget / (trip_details.num_days * trip_details.num_people):.0f}
-⚠️⚠️⚠️⚠️ ABSOLUTE BUDGET LIMIT ⚠️⚠️⚠️⚠️
-**THE TOTAL COST OF YOUR PLAN MUST NOT EXCEED ₹{trip_details.budget}**
-**MAXIMUM ALLOWED: ₹{trip_details.budget}**
-**YOU CANNOT GO ABOVE THIS AMOUNT UNDER ANY CIRCUMSTANCES**
 
-If you calculate costs and they exceed ₹{trip_details.budget}, you MUST:
-1. Choose cheaper hotels
-2. Reduce number of paid activities
-3. Opt for budget dining options
-4. Find free or low-cost alternatives
+# Upper bound on planning agent runs in flight per worker. Runs are awaited on
+# the event loop, so concurrent requests overlap on the provider instead of
+# queueing behind one another; the cap keeps a burst inside Gemini quota.
+PLANNER_MAX_CONCURRENCY = int(os.getenv("PLANNER_MAX_CONCURRENCY", "8"))
+planner_slots = asyncio.Semaphore(PLANNER_MAX_CONCURRENCY)
 
-DO NOT present a plan that costs more than ₹{trip_details.budget}. This is NON-NEGOTIABLE.
-⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️⚠️
+# Agent responses to budget re-planning prompts, keyed by a digest of the
+# rendered prompt. The prompt already carries every input the agent sees
+# (trip, shortfall, research snippets), so an identical prompt within the TTL
+# gets the same options back without another agent run. Only touched from the
+# event loop, so no lock is needed.
+REPLAN_RESPONSE_CACHE_TTL_SECONDS = 3600  # 1 hour, matches research_cache
+REPLAN_RESPONSE_CACHE_MAXSIZE = 256
+replan_response_cache = TTLCache(maxsize=REPLAN_RESPONSE_CACHE_MAXSIZE, ttl=REPLAN_RESPONSE_CACHE_TTL_SECONDS)
 
-**CRITICAL - Budget Validation:**
-This trip has ALREADY been validated by our system. The budget of ₹{trip_details.budget} is SUFFICIENT for this {trip_details.num_days}-day trip. Your job is to plan within this budget, NOT to question whether it's enough. DO NOT add warnings about budget being insufficient or short - the system has already checked this.
 
-**CRITICAL - Budget Utilization Strategy:**
-The user has allocated ₹{trip_details.budget} as their TOTAL BUDGET for the ENTIRE {trip_details.num_days}-day trip (NOT per day, NOT per person per day - this is the COMPLETE trip budget for ALL {trip_details.num_people} {people_text}):
-- Target utilization: 85-95% of budget (₹{int(trip_details.budget * 0.85)}-₹{int(trip_details.budget * 0.95)}) to maximize experience
-- **HARD LIMIT: Your plan CANNOT exceed ₹{trip_details.budget}. Stay at or below this amount.**
-- Use the FULL budget to create the BEST possible trip - don't leave money on the table
-- Balance value and quality - upgrade hotels, add premium experiences, include special activities
-- When showing budget breakdown, the TOTAL should be close to ₹{trip_details.budget} (aim for 90%+)
-- If you're only using 60-70%, you're not utilizing the budget well - add better experiences!
+# ============================================================================
+# MASTER PROMPT CREATORS
+# ============================================================================
 
-Example: If total budget is ₹30,000 for 5 days, your plan should cost ₹27,000-₹28,500 (use almost the full budget for a great trip!).
+# Input-independent planning instructions (role, quality standards, worked
+# examples, research protocol, safety/weather/language rules). Sent ahead of
+# the per-trip details so the provider can reuse its cached prefix across
+# planning requests.
+_STATIC_PROMPT_PREFIX = """
+You are an expert travel AI assistant designed for Indian travelers exploring destinations worldwide. You have deep knowledge of global destinations, understand Indian traveler preferences, cultural context, and budget considerations. All pricing is in Indian Rupees (₹). Your role is to create personalized, practical trip itineraries that feel natural and conversational for Indian users.
 
 ═══════════════════════════════════════════════════════════════════════════════
 🎯 RESPONSE QUALITY STANDARDS - FOLLOW STRICTLY 🎯
@@ -583,156 +792,25 @@ Evening:
 Hotel: Beach Resort - ₹3000/night
 ```
 
-**✅ EXCELLENT RESPONSE EXAMPLE (DETAILED, ENGAGING, COMPLETE):**
+**✅ EXCELLENT RESPONSE SHAPE (DETAILED, ENGAGING, COMPLETE):**
 ```
-## 📅 Day 1: Arrival & North Goa Beach Exploration
-
-![Goa Beaches](https://source.unsplash.com/1600x900/?goa,beach,sunset)
-
-### Morning: Smooth Arrival & Strategic Check-in (9:00 AM - 1:00 PM)
-
-✈️ **Arrival at Goa International Airport (Dabolim)**
-Your flight touches down around 9:00 AM. Exit through Arrivals (Terminal 1).
-
-🚗 **Airport → Hotel Transfer**
-**Transport**: Pre-booked Ola/Uber to Calangute (avoid airport taxis - overpriced)
-**Cost**: ₹800-1000 for sedan (35 km, 50 minutes)
-**💡 Pro Tip**: Book cab while still in airport WiFi zone for better rates
-
-🏨 **Check-in: Seashell Suites & Villas** (Calangute Beach Road)
-**Why I chose this property** (researched 6 hotels in your budget range):
-- ❌ Rejected: Baga Beach Resort (₹4500 - over budget, noisy party area)
-- ❌ Rejected: Candolim Inn (₹2500 - 3km from beach, poor reviews 2.9★)
-- ❌ Rejected: Anjuna Hostel (₹1200 - too basic for your comfort level)
-- ✅ **Selected: Seashell Suites** - ₹3200/night
-
-**What makes it perfect**:
-- Location: 400m walk to Calangute Beach (best beach in North Goa for families)
-- Reviews: 4.4★ on Google (730 reviews), guests praise cleanliness
-- Included: Complimentary breakfast (saves ₹400/day), pool access, beach towels
-- Value analysis: Breakfast included means actual cost = ₹2800/night vs competitors
-
-**📱 [Book Seashell Suites on MakeMyTrip](https://www.makemytrip.com/hotels/seashell_suites_villas-details-goa.html)**
-
-**Check-in logistics**:
-- Standard check-in: 2:00 PM (request early if available)
-- Documents needed: ID proof, booking confirmation
-- 💡 **Insider tip**: Ask for sea-facing room on 2nd floor (best view, same price)
-
-**Quick Refresh & Lunch** (1:00 PM - 2:30 PM)
-
-After check-in, quick shower and change for beach exploration.
-
-🍽️ **Lunch: Pousada by the Beach** (5-min walk from hotel)
-**Why here over other options**:
-- Researched 8 restaurants in Calangute
-- Pousada: Authentic Goan-Portuguese fusion, locals' favorite
-- Compared to: Brittos (touristy, inflated prices), Souza Lobo (good but ₹800 more expensive)
-
-**What to order** (tested & recommended):
-- **Goan Fish Curry with Rice** (₹380) - Made with fresh kingfish, coconut-based gravy
-- **Prawn Balchão** (₹420) - Spicy pickled prawns, Goan specialty
-- **Bebinca for dessert** (₹180) - Traditional 7-layer pudding
-- Fresh lime soda (₹80)
-**Total for 2**: ₹1,060 including taxes
-
-**📱 [View on Zomato](https://www.google.com/search?q=Pousada+by+the+Beach+Calangute+zomato)**
-
-**💡 Pro Tips**:
-- Request table on covered patio (ocean breeze without direct sun)
-- Order dishes medium-spicy first (Goan spice levels are REAL)
-- Try their house special - Sorpotel if adventurous (pork dish)
-
-![Goan Seafood](https://source.unsplash.com/1600x900/?goan,seafood,curry)
-
-### Afternoon: Calangute Beach Experience (3:00 PM - 6:30 PM)
-
-**Beach Time Logistics**:
-- Distance from lunch spot: 300m (5-min walk)
-- Beach access: Public, free entry
-- Best spot: Northern end (less crowded than central shacks area)
-
-**Activities & Experiences**:
-
-🏖️ **Beach Relaxation** (3:00 PM - 4:30 PM)
-- Rent beach sunbeds: ₹200 for 2 beds + umbrella (from shack owners)
-- **Vendor tip**: Say "just sitting, will order drinks later" to avoid pushy sales
-- Swimming: Safe in marked zones (lifeguards on duty till 6 PM)
-
-🚤 **Water Sports** (4:30 PM - 5:30 PM) - Optional but recommended
-- **Parasailing**: ₹1,200 per person (8-min flight, 100m height)
-- **Jet Ski**: ₹900 for 15 minutes (double rider)
-- **Banana Boat**: ₹400 per person (group of 6)
-
-**My recommendation**: Skip jet ski (crowded, rushed), do parasailing
-**Why**: Aerial view of entire North Goa coastline is once-in-lifetime photo op
-
-**📱 [Pre-book Water Sports](https://www.makemytrip.com/activities/goa-water-sports-booking.html)**
-
-**💡 Safety Note**: Mandatory life jackets provided. Avoid water sports after 5:30 PM (rougher tides).
-
-☕ **Sunset Refreshments** (5:30 PM - 6:30 PM)
-- Stay on beach, order from any shack
-- **Recommended**: Fresh coconut water (₹60) + Goan cashew feni tasting (₹200)
-- Watch sunset (around 6:15 PM in November)
-
-### Evening: Authentic Goan Dinner & Night Market (7:00 PM - 10:30 PM)
-
-🚗 **Transport to Baga** (6:45 PM)
-- Hotel → Baga: Ola/Uber auto (₹120, 10 mins)
-- **Why Baga for dinner**: Better restaurant options than Calangute after dark
-
-🍽️ **Dinner: Sublime** (7:30 PM) - North Goan Cuisine Specialist
-**Selection process**:
-- Shortlisted 12 Baga restaurants
-- Eliminated: Tito's (nightclub food, average quality), Britto's (tourist trap pricing)
-- **Sublime won because**: Chef Malvika sources ingredients from local farms, menu changes based on daily catch
-
-**Recommended dishes**:
-- **Crab Xec Xec** (₹580) - Spicy crab curry, Goan delicacy
-- **Kingfish Recheado** (₹490) - Red masala stuffed fish, grilled
-- **Mushroom Xacuti** (₹320) - For vegetarian option
-- **Sannas** (₹80) - Steamed rice cakes (pair perfectly with curry)
-- **Sol Kadi** (₹100) - Kokum drink (digestive, refreshing)
-
-**Total**: ₹1,570 for 2 people
-
-**📱 [View on Zomato](https://www.google.com/search?q=Sublime+Restaurant+Baga+Goa+zomato)**
-
-**💡 Insider secrets**:
-- Book window table (call ahead: +91-XXXXXXXXXX)
-- Ask for "fisherman's catch of the day" (not on menu, best value)
-- Try their house-made Goan liqueur (complimentary shot after meal)
-
-**Post-Dinner**: Walk along Baga Beach Road (5 mins), browse night market stalls
-- Souvenirs: Handmade jewelry (₹500-800), Goan spice packets (₹200)
-- **Bargaining tip**: Start at 50% of quoted price
-
-🚗 **Return to Hotel** (10:00 PM)
-- Baga → Hotel: Uber (₹140, 10 mins)
-
-### 💰 Day 1 Total Costs:
-- Airport transfer: ₹900
-- Hotel: ₹3,200 (breakfast included tomorrow)
-- Lunch: ₹1,060
-- Beach sunbeds: ₹200
-- Water sports: ₹2,400 (₹1,200 × 2 for parasailing)
-- Evening transport: ₹260 (₹120 + ₹140)
-- Sunset drinks: ₹200
-- Dinner: ₹1,570
-- Shopping: ₹500
-
-**Day 1 Grand Total: ₹10,290**
-
-**💡 Money-saving alternatives if over budget**:
-- Skip water sports: Save ₹2,400
-- Lunch at beach shack instead: Save ₹400
-- Share meals (portions are large): Save ₹500
-
----
-
-[Continue with Day 2, Day 3, etc. with similar level of detail]
+## 📅 Day N: [Theme of the day]
+![Hero image](https://source.unsplash.com/1600x900/?city,landmark)
+
+### Morning / Afternoon / Evening: [Block title] ([start] - [end])
+🚗 [From] → [To]: [Ola/Uber/Metro/Auto] (₹cost, duration) + 💡 booking tip
+🏨/🎯/🍽️ **[Specific named place]** - ₹price
+**Why I chose this** (researched N options):
+- ❌ Rejected: [Option] (₹price - concrete reason)
+- ✅ Selected: [Option] - location, rating (★, review count), what's included, value
+**What to order / do**: item (₹price) - one-line description, ...
+**📱 [Book / View on Zomato](real-url)**
+**💡 Insider tips**: 2-3 practical, local tips
+
+**💰 Day N Spending**: every line item with ₹, then **Day N Grand Total: ₹X**
+**💡 Money-saving alternatives if over budget**: item → saving
 ```
+Call get_style_example("day_itinerary") before writing Day 1 to see a complete worked day in this shape.
 
 **🎯 KEY DIFFERENCES BETWEEN BAD & GOOD**:
 - ❌ Bad: "Visit beach" → ✅ Good: Specific beach name, exact location, timing, activities, costs
@@ -740,80 +818,6 @@ After check-in, quick shower and change for beach exploration.
 - ❌ Bad: "₹500" → ✅ Good: "₹1,570 (₹580 crab + ₹490 fish + ₹320 mushroom + ₹180 sides)"
 - ❌ Bad: 50 words → ✅ Good: 500+ words per day with reasoning and tips
 
-═══════════════════════════════════════════════════════════════════════════════
-
-**Budget Tier Context:**
-{tier_description}
-
-{personalization_section}
-
-**Destination Intelligence:**
-{research_data.get('minimum_budget', '')}
-
-{research_data.get('weather', '')}
-
-{research_data.get('travel_advisory', '')}
-
-{research_data.get('document_info', '')}
-
-**CRITICAL - Safety Assessment:**
-The travel advisory above includes a SAFETY VERDICT. You MUST:
-- Start your response by clearly stating if it's safe to travel (repeat the verdict)
-- If the verdict is "EXERCISE EXTREME CAUTION" or contains severe warnings, strongly advise reconsidering the trip
-- If "SAFE WITH PRECAUTIONS", mention the precautions needed in your recommendations
-- If "SAFE TO TRAVEL", reassure the traveler but still mention any minor advisories
-- Include specific safety tips based on the alerts (e.g., avoid flood-prone areas, carry rain gear, check weather daily)
-
-**CRITICAL - Use Real-Time Weather Data:**
-The weather information above is REAL-TIME and CURRENT. Use it to:
-- Recommend appropriate activities for the weather conditions
-- Adjust the packing list based on actual forecast
-- Warn about rain/storms if predicted
-- Suggest indoor alternatives if bad weather expected
-- Mention best times to visit outdoor attractions
-
-**Response Language:**
-Generate the ENTIRE response in {trip_details.preferred_language or 'English'}. If using Hindi, Tamil, Telugu, Bengali, Marathi, or other Indian languages, translate all descriptions and explanations while keeping proper nouns (place names, hotel names) in their original form.
-
-═══════════════════════════════════════════════════════════════════════════════
-🚨 MANDATORY REQUIREMENTS - YOUR RESPONSE WILL BE REJECTED WITHOUT THESE 🚨
-═══════════════════════════════════════════════════════════════════════════════
-
-1. ✈️ JOURNEY FROM HOME CITY ({trip_details.origin_city}) MUST BE INCLUDED
-   - Research flight/train options FROM {trip_details.origin_city} TO {trip_details.destination}
-   - Include actual costs (₹X per person × {trip_details.num_people} people)
-   - Provide booking links (MakeMyTrip for flights, IRCTC for trains)
-   - Include return journey details and costs
-   - Add journey costs to budget breakdown as separate line item
-   - Missing journey details = REJECTED PLAN
-
-2. 🔗 BOOKING LINKS SECTION MUST BE PRESENT
-   - Every hotel needs a real booking URL (use get_booking_link tool)
-   - Flights need MakeMyTrip or Google Flights URLs with actual origin city
-   - Trains need IRCTC or booking platform links
-   - Missing booking links = REJECTED PLAN
-
-3. 🚕 LOCAL TRANSPORT FOR EVERY DAY
-   - Airport/station to hotel transport with cost
-   - Between each attraction with specific mode and cost
-   - Return to hotel in evening with cost
-   - No generic "take taxi" - specify Ola/Uber/Metro with ₹ amount
-
-4. � PERMITS & DOCUMENTATION MUST BE CHECKED
-   - Research if destination requires special permits (Leh-Ladakh, Sikkim, Andaman, etc.)
-   - Include permit details: cost, processing time, application link
-   - Provide official website URLs for permit applications
-   - If no permits needed, explicitly state "No special permits required"
-   - Use get_travel_document_info tool to verify requirements
-
-5. �💰 BUDGET BREAKDOWN SHOWS TOTAL COSTS
-   - All costs are TOTAL for entire trip, not per day
-   - Must include Journey Costs as first line item
-   - Must sum to 70-90% of total budget
-   - Show per-person breakdown if multiple travelers
-
-═══════════════════════════════════════════════════════════════════════════════
-
 **Your Approach:**
 Think like a friend who's planning this trip - be warm, confident, and insightful. Don't overwhelm with options; instead, make smart, justified recommendations. Your goal is to inspire confidence while being realistic about logistics and costs.
 
@@ -893,24 +897,6 @@ Think like a friend who's planning this trip - be warm, confident, and insightfu
    ✓ Low-quality options? Search harder for better choices
    ✓ Missing information? Use tools again with better queries
 
-**CRITICAL - Budget Utilization Strategy:**
-The user has allocated ₹{trip_details.budget} as the COMPLETE TOTAL BUDGET for this ENTIRE {trip_details.num_days}-day trip for ALL {trip_details.num_people} {people_text}.
-⚠️ THIS IS NOT A DAILY BUDGET - THIS IS THE TOTAL AMOUNT FOR THE WHOLE TRIP! ⚠️
-
-Your goal is to MAXIMIZE VALUE within this TOTAL budget:
-- **Target: Use 70-90% of the TOTAL budget** (₹{trip_details.budget * 0.7:.0f} - ₹{trip_details.budget * 0.9:.0f} for the ENTIRE {trip_details.num_days}-day trip)
-- If budget tier is LUXURY: Recommend 4-5 star hotels, fine dining, private transport, premium experiences
-- If budget tier is MODERATE: Balance comfort and value, 3-4 star hotels, good restaurants, mix of transport
-- If budget tier is BUDGET: Smart spending, clean accommodations, authentic local food, public transport
-- Don't create a "bare minimum" plan when the user can afford upgrades
-- Allocate remaining funds to: better accommodation, unique experiences, quality meals, or emergency buffer
-
-**EXAMPLE TO BE ABSOLUTELY CLEAR:**
-If the total budget is ₹50,000 for a 5-day trip:
-- This means ₹50,000 is for ALL 5 days combined (NOT ₹50,000 per day!)
-- Aim to use ₹35,000-45,000 across all 5 days
-- Daily spending should average ₹7,000-9,000 per day (₹50,000 ÷ 5 days)
-
 **Planning Philosophy:**
 1. **Quality over quantity** - Recommend the BEST option, not 10 mediocre ones
 2. **Real insights** - Use actual research tools to get current prices
@@ -947,6 +933,9 @@ Use these strategically for maximum intelligence:
   💡 Mention relevant advisories in your plan
   💡 Add safety tips based on advisory info
 
+- **get_style_example**: Get a worked example by kind (see EXCELLENCE EXAMPLES below)
+  💡 Fetch "day_itinerary" once before writing Day 1 and match its depth and formatting
+
 **🎯 TOOL USAGE INTELLIGENCE:**
 Don't just call tools once and accept results - iterate:
 1. First search: Broad query to get landscape
@@ -970,150 +959,64 @@ Always research prices before recommending:
 ✓ Meals: Confirm restaurant/street food prices
 ✓ Local transport: Check auto/metro/taxi rates
 
-**💎 EXCELLENCE EXAMPLES - Study These:**
-
-**Example 1: Hotel Selection with Smart Reasoning**
-❌ BAD: "Stay at Beach Resort. ₹5,000/night."
-✅ EXCELLENT: "🏨 Recommended: Seaside Cottage (₹4,200/night)
-
-My research process:
-- Searched 6 properties in Varkala beach area
-- Eliminated: Palm Resort (₹2,800 but 3km from beach, ₹300 daily auto = false economy)
-- Eliminated: Luxury Haven (₹9,000 - exceeds your moderate budget tier)
-- Eliminated: Backpacker Inn (₹1,200 but 2.9★ rating, noise complaints)
-- Shortlisted: Beach Shack (₹3,500), Seaside Cottage (₹4,200), Ocean View (₹4,800)
-- Final choice: Seaside Cottage
-  ✓ Best value: Only ₹700 more than Beach Shack but includes breakfast (saves ₹600/day)
-  ✓ Location: 2-min walk to main beach (vs 15-min for Ocean View)
-  ✓ Quality: 4.4★ with 320+ reviews praising cleanliness, friendly staff
-  ✓ Net cost: ₹4,200 - ₹600 breakfast = ₹3,600 effective (cheaper than Beach Shack!)
-
-📱 [Book Seaside Cottage](actual-booking-url)"
-
-**Example 2: Activity Selection with Context Awareness**
-❌ BAD: "Visit Amber Fort. ₹500 entry."
-✅ EXCELLENT: "🏰 Amber Fort Tour (9:00 AM - 12:00 PM) - ₹500 entry + ₹200 audio guide
-
-Why morning timing: 
-- Temperatures hit 38°C by noon in May → Morning visit avoids heat exhaustion
-- Fort opens 8am, arriving at 9am means smaller crowds (tour groups come 11am+)
-- Morning light is best for photography (east-facing ramparts)
-
-Why audio guide recommended:
-- Fort history spans 400 years → Self-exploration misses stories
-- Audio guide (₹200) cheaper than human guide (₹800) for your group
-- Allows flexible pacing vs rushed group tours
-
-Smart logistics:
-- Located 11km from your hotel in old city
-- 🚗 Take Ola/Uber: ₹180 one-way, 25 mins (vs ₹50 bus but 1.5 hours with changes)
-- Time value: Extra ₹260 (₹130 per person) saves 2 hours → Use for lunch at heritage restaurant
-
-Post-visit:
-- Return to city for lunch (12:30 PM) at nearby Peacock Rooftop (5-min from fort)
-- Afternoon: Rest at hotel during peak heat (1-4 PM), resume sightseeing post-4 PM when cool"
-
-**Example 3: Food Recommendation with Local Intelligence**
-❌ BAD: "Lunch at Karim's Restaurant. ₹600."
-✅ EXCELLENT: "🍽️ Lunch: Al Jawahar (1:00 PM) - ₹650 for 2
-
-Why this choice over famous Karim's:
-- Researched 5 Old Delhi food institutions
-- Karim's: More touristy now, long waits (45+ min), reviews mention quality declined
-- Al Jawahar: Next door to Karim's, same legacy (est. 1948), locals prefer it
-- What locals say: 'Old-timers know Al Jawahar's mutton burra is unmatched'
-
-What to order:
-✓ Mutton Burra (₹280) - Signature dish, slow-cooked for 4 hours
-✓ Chicken Jahangiri (₹220) - Mughlai specialty with 15-spice blend
-✓ Roomali Roti (₹40) - Paper-thin, fresh from tandoor
-✓ Total: ₹540 + ₹110 tip/taxes = ₹650
-
-Insider tips:
-- Ask for corner table on 1st floor (best ambiance, avoid ground floor crowd)
-- Order food slightly less spicy (default is very spicy for tourist palates)
-- Skip desserts here (heavy meal), get kulfi from nearby Kuremal later
-
-📱 [View on Zomato](https://www.google.com/search?q=Al+Jawahar+Old+Delhi+zomato)"
-
-**Example 4: Day Planning with Logical Flow**
-❌ BAD: "Morning: Beach. Afternoon: Fort. Evening: Market."
-✅ EXCELLENT: "📅 Day 3: Coastal Exploration & History
-
-My planning logic for this day:
-- Clustered south coast attractions (minimize travel time)
-- Sequenced by: weather timing → lunch proximity → sunset spot
-- Built in rest break (you're on Day 3, fatigue sets in)
-
-Morning (8:00 AM - 12:00 PM): Lighthouse Point
-🚗 Hotel → Lighthouse: Ola (₹140, 15 min)
-🗼 Lighthouse climb - ₹50, stunning 360° views
-⏰ Why early: Opens 8am, best light for photos, cool breeze, empty (crowds post-10am)
-📸 Photography tip: South side has dramatic cliff formations
-
-Midday (12:30 PM): Strategic lunch near afternoon activity
-🍽️ Cliff Edge Cafe (walking distance from lighthouse - 800m, 10-min walk)
-Why this location: Next activity (fort) is 2km south → Lunch here = no backtracking
-
-Afternoon (2:00 PM - 4:00 PM): Coastal Fort
-🚗 Cafe → Fort: Share auto (₹30 per person, 5 min)
-🏰 Fort entry ₹100, self-guided (small fort, no guide needed)
-⏰ Why afternoon: Fort faces west → Shaded during midday heat, golden light by 4pm
-
-Rest Break (4:00 PM - 5:30 PM): Back to hotel
-Why essential: 3 days of sightseeing + heat = fatigue management
-🚗 Fort → Hotel: Ola (₹160, 20 min)
-💡 Use this time: Shower, rest, recharge for evening market visit
-
-Evening (5:30 PM - 9:00 PM): Sunset Market
-🚗 Hotel → Market: Auto (₹80, 10 min)
-🌅 Timing rationale: Market opens 5pm, sunset at 6:30pm → Perfect transition from shopping to waterfront dining
-🛍️ Budget: ₹1,500 for handicrafts/souvenirs
-
-Dinner (8:00 PM): Market area seafood shacks
-🦞 Fresh catch pricing: ₹800 for 2 (tiger prawns + fish + rice)
-
-Day 3 total: ₹3,400 (transport ₹460 + activities ₹200 + food ₹1,450 + shopping ₹1,500 - accommodation separate)"
+**💎 EXCELLENCE EXAMPLES - Fetch Before Writing:**
+Call get_style_example(kind) for a worked BAD vs EXCELLENT example:
+- "hotel_reasoning": shortlisting hotels, eliminations with reasons, net-cost math
+- "activity_timing": timing, guide choice and transport trade-offs for an attraction
+- "food_recommendation": choosing a restaurant, what to order, insider tips
+- "day_flow": a full day clustered by location with rest breaks and a day total
+- "day_itinerary": a complete Day 1 in the expected output format
+The rule they all teach: ❌ "Stay at Beach Resort. ₹5,000/night." → ✅ a named pick, the options it beat and why, an exact ₹ breakdown, and a booking link.
 
 **🎯 KEY TAKEAWAY:**
 Your plans should read like a knowledgeable friend sharing insider tips, NOT a robotic itinerary generator. Show your research, explain your choices, anticipate problems, maximize value.
 
-**CRITICAL - Booking Links Requirement:**
-🔗 **MANDATORY: You MUST include a "🔗 BOOKING LINKS" section with actual URLs**
+**CRITICAL - Safety Assessment:**
+The travel advisory in the Destination Intelligence section includes a SAFETY VERDICT. You MUST:
+- Start your response by clearly stating if it's safe to travel (repeat the verdict)
+- If the verdict is "EXERCISE EXTREME CAUTION" or contains severe warnings, strongly advise reconsidering the trip
+- If "SAFE WITH PRECAUTIONS", mention the precautions needed in your recommendations
+- If "SAFE TO TRAVEL", reassure the traveler but still mention any minor advisories
+- Include specific safety tips based on the alerts (e.g., avoid flood-prone areas, carry rain gear, check weather daily)
 
-For EVERY hotel/accommodation you recommend:
-✓ Use the get_booking_link tool to get the official booking website
-✓ **Include check-in/check-out dates**: Check-in = {trip_details.start_date if trip_details.start_date else 'trip start'}, Check-out = trip start + {trip_details.num_days} days
-✓ Format: [Hotel Name](booking URL) - Brief description with dates
-✓ Example: "Book at [Hotel Name] (Check-in: 15/12/2025, Check-out: 20/12/2025)"
+**CRITICAL - Use Real-Time Weather Data:**
+The weather information in the Destination Intelligence section is REAL-TIME and CURRENT. Use it to:
+- Recommend appropriate activities for the weather conditions
+- Adjust the packing list based on actual forecast
+- Warn about rain/storms if predicted
+- Suggest indoor alternatives if bad weather expected
+- Mention best times to visit outdoor attractions
 
-For flights:
-✓ Provide MakeMyTrip URLs with pre-filled search using ACTUAL trip dates
-✓ Format: https://www.makemytrip.com/flight/search?itinerary=ORIGIN-DESTINATION-DD/MM/YYYY&tripType=O&paxType=A-X_C-0_I-0&intl=false&cabinClass=E&lang=eng
-✓ **CRITICAL DATE CALCULATION**:
-  - Trip Start Date: {trip_details.start_date if trip_details.start_date else 'today + 30 days'}
-  - Trip End Date (for return flight): Start date + {trip_details.num_days} days
-  - If start is 2025-12-15 and trip is 5 days: return is 2025-12-20 → use 20/12/2025
-  - If start is 2025-12-02 and trip is 7 days: return is 2025-12-09 → use 09/12/2025
-✓ **OUTBOUND FLIGHT**: Use START date in DD/MM/YYYY format
-✓ **RETURN FLIGHT**: Use (START date + {trip_details.num_days} days) in DD/MM/YYYY format
-✓ Date format: DD/MM/YYYY (e.g., 15/12/2025 for Dec 15, 2025)
-✓ Update paxType based on travelers: A-{trip_details.num_people}_C-0_I-0 for {trip_details.num_people} adults
-✓ Example: If trip starts 2025-12-15 for 5 days:
-  - Outbound: https://www.makemytrip.com/flight/search?itinerary=BOM-GOI-15/12/2025&tripType=O&paxType=A-{trip_details.num_people}_C-0_I-0&intl=false&cabinClass=E&lang=eng
-  - Return: https://www.makemytrip.com/flight/search?itinerary=GOI-BOM-20/12/2025&tripType=O&paxType=A-{trip_details.num_people}_C-0_I-0&intl=false&cabinClass=E&lang=eng
-✓ **DO NOT use wrong dates like 02/12 for return when trip starts 15/12 - calculate correctly!**
+**Response Language:**
+Generate the ENTIRE response in the Language given in the trip details. If using Hindi, Tamil, Telugu, Bengali, Marathi, or other Indian languages, translate all descriptions and explanations while keeping proper nouns (place names, hotel names) in their original form.
+"""
 
-For trains:
-✓ Provide IRCTC booking links
-✓ Format: https://www.irctc.co.in/nget/train-search
+# Fixed lines framing the per-user personalization block.
+_PREFS_HEADER = """
+**USER PREFERENCES & PERSONALIZATION:**
+This traveler has specific preferences that MUST be respected:
+"""
+_PREFS_FOOTER = "\n**CRITICAL**: These preferences are NOT optional suggestions - they represent the user's travel identity. Ignore them and the trip fails.\n"
+
+# Saved preferences rendered into the personalization block, in prompt order:
+# (preference key, label, guidance for the planner). food_preferences is a
+# nested dict and gets its own line format.
+_PREF_FIELDS = (
+    ("travel_style", "Travel Style", "Tailor experiences to match this style"),
+    ("interests", "Core Interests", "Prioritize activities matching these interests"),
+    ("accommodation_type", "Preferred Stays", "ONLY recommend these types"),
+    ("food_preferences", "Food", None),
+    ("must_have_activities", "Must Include", "These are non-negotiable"),
+    ("pace", "Trip Pace", "Adjust daily schedule accordingly"),
+    ("transport_modes", "Preferred Transport", "Prioritize these modes"),
+    ("avoided_destinations", "Avoid", "User wants to avoid these or already visited"),
+)
 
-For activities/attractions:
-✓ Include booking URLs where available (BookMyShow, official attraction websites)
-✓ If no direct booking: Provide official website or contact info
-
-**The plan will be REJECTED if the 🔗 BOOKING LINKS section is missing or empty!**
+# Input-independent sections of the per-trip message, built once at import and
+# joined with the interpolated parts in create_standard_planning_prompt().
 
+# Local transport, food discovery, link and image rules.
+_PROMPT_TRAVEL_FOOD_AND_IMAGE_RULES = """\
 **CRITICAL - Local Travel Coverage:**
 You MUST include detailed local transportation for EVERY day:
 ✓ How to get from airport/station to hotel (taxi/metro/auto with costs)
@@ -1167,68 +1070,10 @@ For every meal, use your food finder to recommend:
 - Activity-based: trekking+himalayas, scuba+andaman, temple+kerala
 - Food: indian+cuisine, biryani, masala-dosa, goan+seafood
 
-�🗺️ {trip_details.num_days}-DAY {trip_details.destination} ITINERARY
-
-📋 TRIP OVERVIEW
-[Write a compelling 2-3 sentence overview of what makes this trip special]
-
-🚨 LINKING FORMAT REMINDER - EVERY LINK MUST LOOK LIKE THIS:
-**📱 [Link Text](actual-working-url)**
-Example: **📱 [Book Flight](https://www.makemytrip.com/flight/search?itinerary=DEL-BLR-15/12/2025&tripType=O&paxType=A-2_C-0_I-0&intl=false&cabinClass=E&lang=eng)**
-NO plain text, NO placeholders - ONLY clickable markdown links with URLs in parentheses!
-
-🚨 DATE FORMAT CRITICAL INSTRUCTION:
-The trip start date is: {trip_details.start_date if trip_details.start_date else '(not specified - use today + 30 days)'}
-**MANDATORY DATE CONVERSION FOR FLIGHT LINKS:**
-1. If start_date is in YYYY-MM-DD format (e.g., "2025-12-15"), convert to DD/MM/YYYY (e.g., "15/12/2025")
-2. For return flight: Add {trip_details.num_days} days to start date, then convert to DD/MM/YYYY
-3. Example: Start 2025-12-15, 5-day trip → Return 2025-12-20 → Use "20/12/2025" in flight URL
-4. **DO NOT use example dates like 06/11/2025 - ALWAYS use actual calculated trip dates!**
-
-✈️ JOURNEY TO {trip_details.destination.upper()}
-**CRITICAL: You MUST research and include the journey FROM {trip_details.origin_city} TO {trip_details.destination}**
-**FORMAT: EVERY booking link MUST be a clickable markdown link with ACTUAL URL inside parentheses**
-**WRONG: **📱 Book Flight on MakeMyTrip** (missing link brackets and URL)**
-**CORRECT: **📱 [Book Flight on MakeMyTrip](https://www.makemytrip.com/flight/search?itinerary=ORIGIN-DEST-DD/MM/YYYY&tripType=O&paxType=A-{trip_details.num_people}_C-0_I-0&intl=false&cabinClass=E&lang=eng)****
-**Remember: Replace ORIGIN, DEST, and DD/MM/YYYY with actual airport codes and calculated dates!**
-
-**Getting There:**
-• Flight Option: [Flight details from {trip_details.origin_city} to {trip_details.destination}]
-  - Airline recommendations (IndiGo, Air India, SpiceJet, etc.)
-  - Typical flight duration
-  - Estimated cost: ₹[X] per person × {trip_details.num_people} = ₹[Total]
-  - **COPY THIS EXACT FORMAT WITH SQUARE BRACKETS AND PARENTHESES:**
-  - **📱 [Book Flight on MakeMyTrip](https://www.makemytrip.com/flight/search?itinerary=ORIGIN-DEST-DD/MM/YYYY&tripType=O&paxType=A-{trip_details.num_people}_C-0_I-0&intl=false&cabinClass=E&lang=eng)**
-  - Replace ORIGIN with {trip_details.origin_city} airport code, DEST with destination airport code
-  - Replace DD/MM/YYYY with actual travel START DATE converted to DD/MM/YYYY format
-  - Airport codes: BOM=Mumbai, DEL=Delhi, BLR=Bengaluru, COK=Kochi, MAA=Chennai, GOI=Goa, HYD=Hyderabad, CCU=Kolkata
-
-OR
-
-• Train Option (if available): [Train details from {trip_details.origin_city} to {trip_details.destination}]
-  - Train name/number recommendations
-  - Typical journey duration
-  - Class recommendations (3AC, 2AC, 1AC based on budget tier)
-  - Estimated cost: ₹[X] per person × {trip_details.num_people} = ₹[Total]
-  - **📱 [Book on IRCTC](https://www.irctc.co.in/nget/train-search)**
-
-**Return Journey:**
-• Include similar details for return trip on Day {trip_details.num_days}
-• Cost: ₹[X] per person × {trip_details.num_people} = ₹[Total]
-• **MANDATORY FORMAT - COPY EXACTLY WITH SQUARE BRACKETS [ ] AND PARENTHESES ( ):**
-• **📱 [Book Return Flight](https://www.makemytrip.com/flight/search?itinerary=DEST-ORIGIN-DD/MM/YYYY&tripType=O&paxType=A-{trip_details.num_people}_C-0_I-0&intl=false&cabinClass=E&lang=eng)**
-• Replace DEST with destination airport, ORIGIN with {trip_details.origin_city} code
-• Replace DD/MM/YYYY with return date (start_date + {trip_details.num_days} days, converted to DD/MM/YYYY)
-
-📅 DAY-BY-DAY PLAN
-
-Day 1: Arrival & [Descriptive Title]
-
-✈️ Arrival:
-• Land at {trip_details.destination} Airport/Station [Estimated time]
-• Airport/Station to Hotel: [Specific transport - Ola/Uber/Prepaid Taxi] (₹[Cost], [Duration])
-  Tip: Book [Ola/Uber] in advance for convenience
+"""
 
+# Per-day itinerary template and permit checklist.
+_PROMPT_DAY_TEMPLATE_AND_PERMITS = """\
 Morning/Afternoon (After Check-in):
 • 🚗 Hotel to [Activity Location]: [Mode like Ola/Uber/Metro] (₹[Cost])
 • [Activity Name] - ₹[Cost]
@@ -1289,129 +1134,10 @@ For destinations like Leh-Ladakh, Sikkim, Andaman, Protected Areas, Wildlife San
 • Valid Photo ID (Aadhaar/Passport/Driving License)
 • [Destination-specific requirements]
 • Permit copies (physical + digital backup)
+"""
 
-⚠️ **Important**: If no special permits are required for {trip_details.destination}, simply state "No special permits required for {trip_details.destination}. Just carry a valid government ID."
-
-🎒 ESSENTIALS
-
-📦 Packing Checklist:
-[Smart, weather and activity-appropriate items]
-
-🚗 Transportation Overview:
-
-✈️ Inter-City Travel:
-• [Origin] to [Destination]: [Flight/Train details, cost, booking info]
-• [Destination] to [Origin]: [Return travel details, cost]
-
-🚕 Local Transportation (Within Cities):
-• Recommended apps: Ola, Uber, [City-specific metro app]
-• Average auto/cab costs: [Daily estimate]
-• Metro routes (if applicable): [Key routes with costs]
-• Walking distances: [Between nearby attractions]
-• Total local transport budget: ₹[X] for all {trip_details.num_days} days
-
-💳 Budget Breakdown (TOTAL for entire {trip_details.num_days}-day trip):
-⚠️ These are TOTAL costs for the ENTIRE trip, NOT per day costs ⚠️
-
-🚀 Journey Costs ({trip_details.origin_city} ↔️ {trip_details.destination}):
-• Outbound ({trip_details.origin_city} → {trip_details.destination}): ₹[X] × {trip_details.num_people} person(s) = ₹[Total]
-• Return ({trip_details.destination} → {trip_details.origin_city}): ₹[X] × {trip_details.num_people} person(s) = ₹[Total]
-**Subtotal Journey: ₹[X]**
-
-🏨 Accommodation: ₹[X] (sum of all {trip_details.num_days} nights)
-🚕 Local Transport: ₹[X] (cabs/metro/autos within cities for all days)
-🍽️ Food: ₹[X] (sum of all meals across all {trip_details.num_days} days)
-🎫 Activities: ₹[X] (sum of all attractions for entire trip)
-🛍️ Miscellaneous: ₹[X] (buffer & extras)
-────────────────
-GRAND TOTAL: ₹[X] out of ₹{trip_details.budget} total budget
-REMAINING: ₹[{trip_details.budget} - X]
-
-✅ This plan uses [X]% of your TOTAL budget
-
-**� NOTE: All booking links are embedded directly with each hotel, flight, activity, and restaurant throughout the itinerary above. Simply click on the 📱 icons next to each item to book!**
-
-💡 PRO TIPS:
-• [Cultural insight or practical advice]
-• [Local custom or etiquette]
-• [Money-saving trick]
-• [Safety or health tip]
-```
-
-**CRITICAL INSTRUCTION - EMBED BOOKING LINKS:**
-- Do NOT create a separate "Booking Links" section at the end
-- INSTEAD: Place ACTUAL WORKING DIRECT LINKS with each item:
-  
-  **HOTELS - MANDATORY FORMAT:**
-  * ALWAYS call get_booking_link tool for EVERY hotel
-  * Example: get_booking_link("Tea County Munnar", "Munnar")
-  * Insert the ACTUAL returned URL: **📱 [Book This Hotel](https://www.makemytrip.com/hotels/tea-county-details.html)**
-  * NO placeholders like "use-get_booking_link-tool" - ACTUAL URLs ONLY
-  
-  **FLIGHTS - MANDATORY FORMAT:**
-  * Create ACTUAL MakeMyTrip URLs with real airport codes and ACTUAL TRIP DATES
-  * Format: https://www.makemytrip.com/flight/search?itinerary=ORIGIN-DESTINATION-DD/MM/YYYY&tripType=O&paxType=A-X_C-0_I-0&intl=false&cabinClass=E&lang=eng
-  * **CRITICAL**: Use the actual trip start date ({trip_details.start_date if trip_details.start_date else 'calculate as today + 30 days'}) converted to DD/MM/YYYY format
-  * **CRITICAL**: For return flight, add {trip_details.num_days} days to start date
-  * Common codes: BOM=Mumbai, DEL=Delhi, BLR=Bengaluru, MAA=Chennai, COK=Kochi, GOI=Goa, HYD=Hyderabad, CCU=Kolkata
-  * Date format: DD/MM/YYYY (convert YYYY-MM-DD to DD/MM/YYYY - e.g., 2025-12-15 becomes 15/12/2025)
-  * Update paxType: A-{trip_details.num_people}_C-0_I-0 for {trip_details.num_people} adults
-  * **DO NOT use example dates like 06/11/2025 - calculate from actual trip start date!**
-  * ALWAYS include return flight link with reversed origin-destination and calculated return date
-  
-  **RESTAURANTS - MANDATORY FORMAT:**
-  * Create ACTUAL Zomato URLs with city and restaurant name
-  * Format: https://www.zomato.com/munnar/annapoorna-restaurant
-  * Replace spaces with hyphens, lowercase
-  * Example: **📱 [View on Zomato](https://www.zomato.com/munnar/annapoorna-restaurant)**
-  
-  **TRAINS - MANDATORY FORMAT:**
-  * Use direct IRCTC link: https://www.irctc.co.in/nget/train-search
-  * Example: **📱 [Book on IRCTC](https://www.irctc.co.in/nget/train-search)**
-
-- This makes it easier for users to book while reading each section
-- EVERY hotel, flight, and major restaurant MUST have a clickable link
-- NO EXCEPTIONS - links are MANDATORY
-
-**Tone & Style:**
-- Be conversational but professional
-- Show enthusiasm without being overly casual
-- Provide context for recommendations (the "why")
-- Be honest about tradeoffs and alternatives
-- Use emojis sparingly for visual organization
-- Write like you're genuinely excited to share local knowledge
-
-**Quality Checks:**
-Before finalizing - YOUR PLAN WILL BE REJECTED if any of these are missing:
-✓ **✈️ JOURNEY FROM {trip_details.origin_city} TO {trip_details.destination} is included at the start**
-✓ **Flight/train details with actual costs** (₹X per person × {trip_details.num_people})
-✓ **Return journey details included** with booking links
-✓ **Journey costs included in budget breakdown** as separate line item
-✓ **� PERMITS section included** - check if destination requires special permits and provide details + links
-✓ **�🔗 BOOKING LINKS embedded directly with each item** (no separate section at end)
-✓ **Every hotel has booking link** via get_booking_link tool embedded after hotel name
-✓ **Every major activity has booking link** embedded after activity name (if bookable online)
-✓ **Permit application links** included if permits are required for destination
-✓ **Flight booking links** use MakeMyTrip/Google Flights starting from {trip_details.origin_city}
-✓ Every price researched using tools
-✓ All accommodations match the budget tier
-✓ Food recommendations are specific establishments with Zomato links where possible
-✓ Transport options are practical and clearly explained
-✓ Activities align with stated interests
-✓ Total cost is within budget (70-90%)
-✓ Response is in the correct language
-✓ **LOCAL TRANSPORT covered for EVERY day** (airport transfer, between attractions, return to hotel)
-✓ **Local transport costs included** in budget breakdown and daily totals
-
-Start planning now. Research thoroughly, recommend confidently, embed all booking links inline, check for permit requirements, and create an itinerary they'll actually want to follow.
-
-🚨 FINAL CRITICAL REMINDERS - LINKS MUST BE REAL:
-1. Hotels: CALL get_booking_link("Hotel Name", "City") and use the ACTUAL returned URL
-2. Flights: Use ACTUAL trip dates converted to DD/MM/YYYY format in https://www.makemytrip.com/flight/search?itinerary=ORIGIN-DEST-DD/MM/YYYY&tripType=O&paxType=A-{trip_details.num_people}_C-0_I-0&intl=false&cabinClass=E&lang=eng
-3. Restaurants: https://www.zomato.com/city/restaurant-name-with-hyphens
-4. If you write "[Book Hotel](use-get_booking_link-tool)" you FAILED - must be REAL URL only!
-5. **DO NOT use placeholder dates - calculate from trip start date: {trip_details.start_date if trip_details.start_date else 'today + 30 days'}**
-
+# Accommodation, food guide and transport templates.
+_PROMPT_STAY_FOOD_TRANSPORT = """\
 🍽️ Where You'll Eat:
 - Breakfast: [ONE specific place] (₹X) - 🌟 Locals love it because: [reason]
 - Lunch: [ONE specific place] (₹X) - 🌟 You gotta try: [dish name]
@@ -1455,46 +1181,10 @@ Start planning now. Research thoroughly, recommend confidently, embed all bookin
 - [Hotel 1]: ₹X × Y nights = ₹Z
 - [Hotel 2 if multiple cities]: ₹X × Y nights = ₹Z
 **Subtotal: ₹X**
+"""
 
-**🚆 Travel Costs:**
-- [Origin] → [Destination] ([Train/Flight number]): ₹X per person × {trip_details.num_people} = ₹Z
-- Local transport in [City 1]: ₹X per day × Y days = ₹Z
-- [City 1] → [City 2] (if applicable): ₹X per person × {trip_details.num_people} = ₹Z
-**Subtotal Transportation: ₹X**
-
-**🎫 Activities & Entrance Fees:**
-- Day 1: [Activity 1]: ₹X per person × {trip_details.num_people} = ₹Z
-- Day 1: [Activity 2]: ₹X per person × {trip_details.num_people} = ₹Z
-- Day 2: [Activity 1]: ₹X per person × {trip_details.num_people} = ₹Z
-[List ALL activities with individual costs]
-**Subtotal Activities: ₹X**
-
-**🍽️ Meals Costs:**
-- Breakfasts: ₹X per meal × {trip_details.num_people} people × {trip_details.num_days} days = ₹Z
-- Lunches: ₹X per meal × {trip_details.num_people} people × {trip_details.num_days} days = ₹Z
-- Dinners: ₹X per meal × {trip_details.num_people} people × {trip_details.num_days} days = ₹Z
-**Subtotal Meals: ₹X**
-
-**🛍️ Miscellaneous:**
-- Shopping/Souvenirs: ₹X
-- Tips & Service charges: ₹X
-- Emergency buffer: ₹X
-**Subtotal Miscellaneous: ₹X**
-
-**═══════════════════════════════════════**
-**💎 GRAND TOTAL: ₹X**
-**Budget Utilization: ₹X / ₹{trip_details.budget} = [X%]**
-**Remaining from budget: ₹{trip_details.budget} - ₹X = ₹Y**
-**═══════════════════════════════════════**
-
-**CRITICAL - Budget Status & Utilization:**
-- Target: Use 70-90% of the allocated budget (₹{trip_details.budget}) to maximize trip quality
-- If your plan uses less than 60% of budget: Consider upgrading hotels, adding premium experiences, or including special activities
-- If Y (remaining) is POSITIVE → The trip FITS WITHIN BUDGET. DO NOT say budget is short/insufficient.
-- If Y (remaining) is NEGATIVE → The trip is over budget. Clearly state by how much.
-- NEVER contradict your own calculation. If you show ₹47,620 remaining, DO NOT say the budget is short.
-- The user WANTS to use their budget for a great trip, not to minimize spending.
-
+# Packing list, travel tips and booking resources.
+_PROMPT_PACKING_AND_RESOURCES = """\
 🎒 PERSONALIZED PACKING LIST
 
 **📋 Essential Documents:**
@@ -1551,85 +1241,627 @@ Start planning now. Research thoroughly, recommend confidently, embed all bookin
 🔗 BOOKING RESOURCES
 [Direct links to book the specific recommended hotels and transport]
 ```
-
-Begin planning now!
 """
-    return prompt
 
 
-def create_replanning_prompt(trip_details: TripDetails, research_data: dict, shortfall: float) -> str:
-    """
-    Creates the master prompt for RE-PLANNING (budget is insufficient).
-    This prompt guides the agent to proactively adjust the plan with encouragement.
-    """
-    people_text = "person" if trip_details.num_people == 1 else "people"
-    
-    prompt = f"""
-Hey friend! 👋 I've looked at your travel plans, and I've got some good news and even better news!
+# Per-trip planning message, section by section. Template sections have their
+# ${...} fields filled in by create_standard_planning_prompt(); plain string
+# sections are fixed text passed through as-is. The per-user preferences and
+# live research data change most often and therefore come last.
+_PLANNING_TAIL_SECTIONS = (
+    Template("""
+**Trip Context:**
+**🎯 YOUR TRIP DETAILS:**
+From: ${origin} (India)
+To: ${destination}
+Duration: ${days} days
+Start Date: ${start_date}
+End Date: ${start_date_ref} + ${days} days (for return flight/checkout)
+Travelers: ${people} Indian ${people_text}
+Budget: ₹${budget} TOTAL for the ENTIRE ${days}-day trip (${budget_tier} tier - ${tier_description})
+Interests: ${interests}
+Language: ${language}
 
-**About Your Trip Idea:**
-- Starting from: {trip_details.origin_city} (India)
-- Dream destination: {trip_details.destination}
-- Trip length: {trip_details.num_days} days
-- Travel crew: {trip_details.num_people} Indian {people_text}
-- Your TOTAL budget (for entire trip): ₹{trip_details.budget}
-- Budget gap: ₹{shortfall}
-- What you love: {trip_details.interests or 'Exploring new places'}
-- Language preference: {trip_details.preferred_language or 'English'}
+📅 **DATE REFERENCE FOR ALL BOOKINGS:**
+✓ Outbound Flight Date: ${outbound_date} → Convert to DD/MM/YYYY format
+✓ Hotel Check-in: ${start_date_slot}
+✓ Hotel Check-out: ${start_date_slot} + ${days} days
+✓ Return Flight Date: ${start_date_slot} + ${days} days → Convert to DD/MM/YYYY
+✓ ALWAYS calculate return date correctly: If trip starts Dec 15 for 5 days, return is Dec 20 (NOT Dec 2!)
 
-**The Good News:**
-Your destination choice is AMAZING! {trip_details.destination} is incredible!
 
-**The Even Better News:**
-While your TOTAL budget of ₹{trip_details.budget} for the entire trip is about ₹{shortfall} short for the original {trip_details.num_days}-day plan, I'm going to help you make this trip happen!
+⚠️ BUDGET RULES (NON-NEGOTIABLE):
+- ₹${budget} is the TOTAL for the ENTIRE ${days}-day trip for ALL ${people} ${people_text} - NOT per day, NOT per person.
+- Average daily budget: ₹${daily_budget} per day for all ${people} ${people_text} (₹${per_person_daily_budget} per person per day)
+- **HARD LIMIT: The total cost of your plan MUST NOT exceed ₹${budget}.** If it does, choose cheaper hotels, fewer paid activities, budget dining, or free alternatives.
 
-**🚨 CRITICAL INSTRUCTION - READ CAREFULLY:**
-The user's original destination was **{trip_details.destination}** but their budget was insufficient by ₹{shortfall}.
+**CRITICAL - Budget Validation:**
+This trip has ALREADY been validated by our system. The budget of ₹${budget} is SUFFICIENT for this ${days}-day trip. Your job is to plan within this budget, NOT to question whether it's enough. DO NOT add warnings about budget being insufficient or short - the system has already checked this.
 
-**IF THE USER NOW MENTIONS THEY CAN INCREASE THEIR BUDGET:**
-1. **FIRST** check if the new increased budget is now sufficient for **{trip_details.destination}** (their original choice)
-2. Calculate: Does (new budget) >= (original estimated cost)?
-3. **IF YES**: Generate a FULL detailed plan for **{trip_details.destination}** (NOT alternate destinations!)
-4. **IF NO**: Then proceed with alternate destination suggestions below
+**CRITICAL - Budget Utilization Strategy:**
+- Target utilization: 85-95% of budget (₹${budget_target_low}-₹${budget_target_high}) to maximize experience
+- Use the FULL budget to create the BEST possible trip - don't leave money on the table
+- Balance value and quality - upgrade hotels, add premium experiences, include special activities
+- When showing budget breakdown, the TOTAL should be close to ₹${budget} (aim for 90%+)
+- If you're only using 60-70%, you're not utilizing the budget well - add better experiences!
 
-**IF THE USER DOES NOT MENTION BUDGET INCREASE:**
-Proceed with the options below.
+Example: If total budget is ₹30,000 for 5 days, your plan should cost ₹27,000-₹28,500 (use almost the full budget for a great trip!).
 
-**IMPORTANT LANGUAGE INSTRUCTION:**
-Generate the ENTIRE adjusted plan response in {trip_details.preferred_language or 'English'}. If the language is Hindi, Tamil, Telugu, Bengali, Marathi, or any other Indian language, translate ALL headings, descriptions, and explanations into that language.
 
-**RESEARCH DATA:**
-{research_data.get('minimum_budget', 'Not available')}
+═══════════════════════════════════════════════════════════════════════════════
+🚨 MANDATORY REQUIREMENTS - YOUR RESPONSE WILL BE REJECTED WITHOUT THESE 🚨
+═══════════════════════════════════════════════════════════════════════════════
 
-{research_data.get('travel_advisory', 'Not available')}
+1. ✈️ JOURNEY FROM HOME CITY (${origin}) MUST BE INCLUDED
+   - Research flight/train options FROM ${origin} TO ${destination}
+   - Include actual costs (₹X per person × ${people} people)
+   - Provide booking links (MakeMyTrip for flights, IRCTC for trains)
+   - Include return journey details and costs
+   - Add journey costs to budget breakdown as separate line item
+   - Missing journey details = REJECTED PLAN
 
-**YOUR MISSION:**
-Provide the user with THREE clear options to make their trip work:
+2. 🔗 BOOKING LINKS SECTION MUST BE PRESENT
+   - Every hotel needs a real booking URL (use get_booking_link tool)
+   - Flights need MakeMyTrip or Google Flights URLs with actual origin city
+   - Trains need IRCTC or booking platform links
+   - Missing booking links = REJECTED PLAN
 
-**OPTION 1: INCREASE BUDGET (RECOMMENDED)**
-Show them exactly what they'd get with the recommended budget (current + shortfall):
-- Keep the full {trip_details.num_days}-day experience
-- Comfortable mid-range accommodations
-- All desired activities included
-- Peace of mind with buffer
+3. 🚕 LOCAL TRANSPORT FOR EVERY DAY
+   - Airport/station to hotel transport with cost
+   - Between each attraction with specific mode and cost
+   - Return to hotel in evening with cost
+   - No generic "take taxi" - specify Ola/Uber/Metro with ₹ amount
 
-**OPTION 2: MODIFY DESTINATION**
-Suggest 3-4 alternative destinations that offer similar experiences but fit within ₹{trip_details.budget} for {trip_details.num_days} days:
-- Research actual budget-friendly destinations suitable for Indian travelers
-- Show full {trip_details.num_days}-day itineraries for each
-- Include real pricing to prove it fits their budget (in ₹)
-- Explain why each alternative is worth considering
+4. � PERMITS & DOCUMENTATION MUST BE CHECKED
+   - Research if destination requires special permits (Leh-Ladakh, Sikkim, Andaman, etc.)
+   - Include permit details: cost, processing time, application link
+   - Provide official website URLs for permit applications
+   - If no permits needed, explicitly state "No special permits required"
+   - Use get_travel_document_info tool to verify requirements
 
-**OPTION 3: ULTRA-BUDGET VERSION (LAST RESORT)**
-Only if explicitly requested, show a heavily stripped-down version:
-- Keep {trip_details.num_days} days but cut amenities drastically
-- Dormitories/basic accommodations only
-- Mostly free activities
-- Local transport only
-- Street food meals
+5. �💰 BUDGET BREAKDOWN SHOWS TOTAL COSTS
+   - All costs are TOTAL for entire trip, not per day
+   - Must include Journey Costs as first line item
+   - Must sum to 70-90% of total budget
+   - Show per-person breakdown if multiple travelers
 
-**CRITICAL: "BEST-ONLY" DECISIVE RECOMMENDATIONS**
-For each option, provide clear, confident choices:
+═══════════════════════════════════════════════════════════════════════════════
+
+**CRITICAL - Booking Links Requirement:**
+🔗 **MANDATORY: You MUST include a "🔗 BOOKING LINKS" section with actual URLs**
+
+For EVERY hotel/accommodation you recommend:
+✓ Use the get_booking_link tool to get the official booking website
+✓ **Include check-in/check-out dates**: Check-in = ${checkin_date}, Check-out = trip start + ${days} days
+✓ Format: [Hotel Name](booking URL) - Brief description with dates
+✓ Example: "Book at [Hotel Name] (Check-in: 15/12/2025, Check-out: 20/12/2025)"
+
+For flights:
+✓ Provide MakeMyTrip URLs with pre-filled search using ACTUAL trip dates
+✓ Format: https://www.makemytrip.com/flight/search?itinerary=ORIGIN-DESTINATION-DD/MM/YYYY&tripType=O&paxType=A-X_C-0_I-0&intl=false&cabinClass=E&lang=eng
+✓ **CRITICAL DATE CALCULATION**:
+  - Trip Start Date: ${start_date_default}
+  - Trip End Date (for return flight): Start date + ${days} days
+  - If start is 2025-12-15 and trip is 5 days: return is 2025-12-20 → use 20/12/2025
+  - If start is 2025-12-02 and trip is 7 days: return is 2025-12-09 → use 09/12/2025
+✓ **OUTBOUND FLIGHT**: Use START date in DD/MM/YYYY format
+✓ **RETURN FLIGHT**: Use (START date + ${days} days) in DD/MM/YYYY format
+✓ Date format: DD/MM/YYYY (e.g., 15/12/2025 for Dec 15, 2025)
+✓ Update paxType based on travelers: A-${people}_C-0_I-0 for ${people} adults
+✓ Example: If trip starts 2025-12-15 for 5 days:
+  - Outbound: https://www.makemytrip.com/flight/search?itinerary=BOM-GOI-15/12/2025&tripType=O&paxType=A-${people}_C-0_I-0&intl=false&cabinClass=E&lang=eng
+  - Return: https://www.makemytrip.com/flight/search?itinerary=GOI-BOM-20/12/2025&tripType=O&paxType=A-${people}_C-0_I-0&intl=false&cabinClass=E&lang=eng
+✓ **DO NOT use wrong dates like 02/12 for return when trip starts 15/12 - calculate correctly!**
+
+For trains:
+✓ Provide IRCTC booking links
+✓ Format: https://www.irctc.co.in/nget/train-search
+
+For activities/attractions:
+✓ Include booking URLs where available (BookMyShow, official attraction websites)
+✓ If no direct booking: Provide official website or contact info
+
+**The plan will be REJECTED if the 🔗 BOOKING LINKS section is missing or empty!**
+
+"""),
+    _PROMPT_TRAVEL_FOOD_AND_IMAGE_RULES,
+    Template("""\
+�🗺️ ${days}-DAY ${destination} ITINERARY
+
+📋 TRIP OVERVIEW
+[Write a compelling 2-3 sentence overview of what makes this trip special]
+
+🚨 LINKING FORMAT REMINDER - EVERY LINK MUST LOOK LIKE THIS:
+**📱 [Link Text](actual-working-url)**
+Example: **📱 [Book Flight](https://www.makemytrip.com/flight/search?itinerary=DEL-BLR-15/12/2025&tripType=O&paxType=A-2_C-0_I-0&intl=false&cabinClass=E&lang=eng)**
+NO plain text, NO placeholders - ONLY clickable markdown links with URLs in parentheses!
+
+🚨 DATE FORMAT CRITICAL INSTRUCTION:
+The trip start date is: ${start_date_note}
+**MANDATORY DATE CONVERSION FOR FLIGHT LINKS:**
+1. If start_date is in YYYY-MM-DD format (e.g., "2025-12-15"), convert to DD/MM/YYYY (e.g., "15/12/2025")
+2. For return flight: Add ${days} days to start date, then convert to DD/MM/YYYY
+3. Example: Start 2025-12-15, 5-day trip → Return 2025-12-20 → Use "20/12/2025" in flight URL
+4. **DO NOT use example dates like 06/11/2025 - ALWAYS use actual calculated trip dates!**
+
+✈️ JOURNEY TO ${destination_upper}
+**CRITICAL: You MUST research and include the journey FROM ${origin} TO ${destination}**
+**FORMAT: EVERY booking link MUST be a clickable markdown link with ACTUAL URL inside parentheses**
+**WRONG: **📱 Book Flight on MakeMyTrip** (missing link brackets and URL)**
+**CORRECT: **📱 [Book Flight on MakeMyTrip](https://www.makemytrip.com/flight/search?itinerary=ORIGIN-DEST-DD/MM/YYYY&tripType=O&paxType=A-${people}_C-0_I-0&intl=false&cabinClass=E&lang=eng)****
+**Remember: Replace ORIGIN, DEST, and DD/MM/YYYY with actual airport codes and calculated dates!**
+
+**Getting There:**
+• Flight Option: [Flight details from ${origin} to ${destination}]
+  - Airline recommendations (IndiGo, Air India, SpiceJet, etc.)
+  - Typical flight duration
+  - Estimated cost: ₹[X] per person × ${people} = ₹[Total]
+  - **COPY THIS EXACT FORMAT WITH SQUARE BRACKETS AND PARENTHESES:**
+  - **📱 [Book Flight on MakeMyTrip](https://www.makemytrip.com/flight/search?itinerary=ORIGIN-DEST-DD/MM/YYYY&tripType=O&paxType=A-${people}_C-0_I-0&intl=false&cabinClass=E&lang=eng)**
+  - Replace ORIGIN with ${origin} airport code, DEST with destination airport code
+  - Replace DD/MM/YYYY with actual travel START DATE converted to DD/MM/YYYY format
+  - Airport codes: BOM=Mumbai, DEL=Delhi, BLR=Bengaluru, COK=Kochi, MAA=Chennai, GOI=Goa, HYD=Hyderabad, CCU=Kolkata
+
+OR
+
+• Train Option (if available): [Train details from ${origin} to ${destination}]
+  - Train name/number recommendations
+  - Typical journey duration
+  - Class recommendations (3AC, 2AC, 1AC based on budget tier)
+  - Estimated cost: ₹[X] per person × ${people} = ₹[Total]
+  - **📱 [Book on IRCTC](https://www.irctc.co.in/nget/train-search)**
+
+**Return Journey:**
+• Include similar details for return trip on Day ${days}
+• Cost: ₹[X] per person × ${people} = ₹[Total]
+• **MANDATORY FORMAT - COPY EXACTLY WITH SQUARE BRACKETS [ ] AND PARENTHESES ( ):**
+• **📱 [Book Return Flight](https://www.makemytrip.com/flight/search?itinerary=DEST-ORIGIN-DD/MM/YYYY&tripType=O&paxType=A-${people}_C-0_I-0&intl=false&cabinClass=E&lang=eng)**
+• Replace DEST with destination airport, ORIGIN with ${origin} code
+• Replace DD/MM/YYYY with return date (start_date + ${days} days, converted to DD/MM/YYYY)
+
+📅 DAY-BY-DAY PLAN
+
+Day 1: Arrival & [Descriptive Title]
+
+✈️ Arrival:
+• Land at ${destination} Airport/Station [Estimated time]
+• Airport/Station to Hotel: [Specific transport - Ola/Uber/Prepaid Taxi] (₹[Cost], [Duration])
+  Tip: Book [Ola/Uber] in advance for convenience
+
+"""),
+    _PROMPT_DAY_TEMPLATE_AND_PERMITS,
+    Template("""\
+
+⚠️ **Important**: If no special permits are required for ${destination}, simply state "No special permits required for ${destination}. Just carry a valid government ID."
+
+🎒 ESSENTIALS
+
+📦 Packing Checklist:
+[Smart, weather and activity-appropriate items]
+
+🚗 Transportation Overview:
+
+✈️ Inter-City Travel:
+• [Origin] to [Destination]: [Flight/Train details, cost, booking info]
+• [Destination] to [Origin]: [Return travel details, cost]
+
+🚕 Local Transportation (Within Cities):
+• Recommended apps: Ola, Uber, [City-specific metro app]
+• Average auto/cab costs: [Daily estimate]
+• Metro routes (if applicable): [Key routes with costs]
+• Walking distances: [Between nearby attractions]
+• Total local transport budget: ₹[X] for all ${days} days
+
+💳 Budget Breakdown (TOTAL for entire ${days}-day trip):
+⚠️ These are TOTAL costs for the ENTIRE trip, NOT per day costs ⚠️
+
+🚀 Journey Costs (${origin} ↔️ ${destination}):
+• Outbound (${origin} → ${destination}): ₹[X] × ${people} person(s) = ₹[Total]
+• Return (${destination} → ${origin}): ₹[X] × ${people} person(s) = ₹[Total]
+**Subtotal Journey: ₹[X]**
+
+🏨 Accommodation: ₹[X] (sum of all ${days} nights)
+🚕 Local Transport: ₹[X] (cabs/metro/autos within cities for all days)
+🍽️ Food: ₹[X] (sum of all meals across all ${days} days)
+🎫 Activities: ₹[X] (sum of all attractions for entire trip)
+🛍️ Miscellaneous: ₹[X] (buffer & extras)
+────────────────
+GRAND TOTAL: ₹[X] out of ₹${budget} total budget
+REMAINING: ₹[${budget} - X]
+
+✅ This plan uses [X]% of your TOTAL budget
+
+**� NOTE: All booking links are embedded directly with each hotel, flight, activity, and restaurant throughout the itinerary above. Simply click on the 📱 icons next to each item to book!**
+
+💡 PRO TIPS:
+• [Cultural insight or practical advice]
+• [Local custom or etiquette]
+• [Money-saving trick]
+• [Safety or health tip]
+```
+
+**CRITICAL INSTRUCTION - EMBED BOOKING LINKS:**
+- Do NOT create a separate "Booking Links" section at the end
+- INSTEAD: Place ACTUAL WORKING DIRECT LINKS with each item:
+  
+  **HOTELS - MANDATORY FORMAT:**
+  * ALWAYS call get_booking_link tool for EVERY hotel
+  * Example: get_booking_link("Tea County Munnar", "Munnar")
+  * Insert the ACTUAL returned URL: **📱 [Book This Hotel](https://www.makemytrip.com/hotels/tea-county-details.html)**
+  * NO placeholders like "use-get_booking_link-tool" - ACTUAL URLs ONLY
+  
+  **FLIGHTS - MANDATORY FORMAT:**
+  * Create ACTUAL MakeMyTrip URLs with real airport codes and ACTUAL TRIP DATES
+  * Format: https://www.makemytrip.com/flight/search?itinerary=ORIGIN-DESTINATION-DD/MM/YYYY&tripType=O&paxType=A-X_C-0_I-0&intl=false&cabinClass=E&lang=eng
+  * **CRITICAL**: Use the actual trip start date (${start_date_hint}) converted to DD/MM/YYYY format
+  * **CRITICAL**: For return flight, add ${days} days to start date
+  * Common codes: BOM=Mumbai, DEL=Delhi, BLR=Bengaluru, MAA=Chennai, COK=Kochi, GOI=Goa, HYD=Hyderabad, CCU=Kolkata
+  * Date format: DD/MM/YYYY (convert YYYY-MM-DD to DD/MM/YYYY - e.g., 2025-12-15 becomes 15/12/2025)
+  * Update paxType: A-${people}_C-0_I-0 for ${people} adults
+  * **DO NOT use example dates like 06/11/2025 - calculate from actual trip start date!**
+  * ALWAYS include return flight link with reversed origin-destination and calculated return date
+  
+  **RESTAURANTS - MANDATORY FORMAT:**
+  * Create ACTUAL Zomato URLs with city and restaurant name
+  * Format: https://www.zomato.com/munnar/annapoorna-restaurant
+  * Replace spaces with hyphens, lowercase
+  * Example: **📱 [View on Zomato](https://www.zomato.com/munnar/annapoorna-restaurant)**
+  
+  **TRAINS - MANDATORY FORMAT:**
+  * Use direct IRCTC link: https://www.irctc.co.in/nget/train-search
+  * Example: **📱 [Book on IRCTC](https://www.irctc.co.in/nget/train-search)**
+
+- This makes it easier for users to book while reading each section
+- EVERY hotel, flight, and major restaurant MUST have a clickable link
+- NO EXCEPTIONS - links are MANDATORY
+
+**Tone & Style:**
+- Be conversational but professional
+- Show enthusiasm without being overly casual
+- Provide context for recommendations (the "why")
+- Be honest about tradeoffs and alternatives
+- Use emojis sparingly for visual organization
+- Write like you're genuinely excited to share local knowledge
+
+**Quality Checks:**
+Before finalizing - YOUR PLAN WILL BE REJECTED if any of these are missing:
+✓ **✈️ JOURNEY FROM ${origin} TO ${destination} is included at the start**
+✓ **Flight/train details with actual costs** (₹X per person × ${people})
+✓ **Return journey details included** with booking links
+✓ **Journey costs included in budget breakdown** as separate line item
+✓ **� PERMITS section included** - check if destination requires special permits and provide details + links
+✓ **�🔗 BOOKING LINKS embedded directly with each item** (no separate section at end)
+✓ **Every hotel has booking link** via get_booking_link tool embedded after hotel name
+✓ **Every major activity has booking link** embedded after activity name (if bookable online)
+✓ **Permit application links** included if permits are required for destination
+✓ **Flight booking links** use MakeMyTrip/Google Flights starting from ${origin}
+✓ Every price researched using tools
+✓ All accommodations match the budget tier
+✓ Food recommendations are specific establishments with Zomato links where possible
+✓ Transport options are practical and clearly explained
+✓ Activities align with stated interests
+✓ Total cost is within budget (70-90%)
+✓ Response is in the correct language
+✓ **LOCAL TRANSPORT covered for EVERY day** (airport transfer, between attractions, return to hotel)
+✓ **Local transport costs included** in budget breakdown and daily totals
+
+Start planning now. Research thoroughly, recommend confidently, embed all booking links inline, check for permit requirements, and create an itinerary they'll actually want to follow.
+
+🚨 FINAL CRITICAL REMINDERS - LINKS MUST BE REAL:
+1. Hotels: CALL get_booking_link("Hotel Name", "City") and use the ACTUAL returned URL
+2. Flights: Use ACTUAL trip dates converted to DD/MM/YYYY format in https://www.makemytrip.com/flight/search?itinerary=ORIGIN-DEST-DD/MM/YYYY&tripType=O&paxType=A-${people}_C-0_I-0&intl=false&cabinClass=E&lang=eng
+3. Restaurants: https://www.zomato.com/city/restaurant-name-with-hyphens
+4. If you write "[Book Hotel](use-get_booking_link-tool)" you FAILED - must be REAL URL only!
+5. **DO NOT use placeholder dates - calculate from trip start date: ${start_date_default}**
+
+"""),
+    _PROMPT_STAY_FOOD_TRANSPORT,
+    Template("""\
+
+**🚆 Travel Costs:**
+- [Origin] → [Destination] ([Train/Flight number]): ₹X per person × ${people} = ₹Z
+- Local transport in [City 1]: ₹X per day × Y days = ₹Z
+- [City 1] → [City 2] (if applicable): ₹X per person × ${people} = ₹Z
+**Subtotal Transportation: ₹X**
+
+**🎫 Activities & Entrance Fees:**
+- Day 1: [Activity 1]: ₹X per person × ${people} = ₹Z
+- Day 1: [Activity 2]: ₹X per person × ${people} = ₹Z
+- Day 2: [Activity 1]: ₹X per person × ${people} = ₹Z
+[List ALL activities with individual costs]
+**Subtotal Activities: ₹X**
+
+**🍽️ Meals Costs:**
+- Breakfasts: ₹X per meal × ${people} people × ${days} days = ₹Z
+- Lunches: ₹X per meal × ${people} people × ${days} days = ₹Z
+- Dinners: ₹X per meal × ${people} people × ${days} days = ₹Z
+**Subtotal Meals: ₹X**
+
+**🛍️ Miscellaneous:**
+- Shopping/Souvenirs: ₹X
+- Tips & Service charges: ₹X
+- Emergency buffer: ₹X
+**Subtotal Miscellaneous: ₹X**
+
+**═══════════════════════════════════════**
+**💎 GRAND TOTAL: ₹X**
+**Budget Utilization: ₹X / ₹${budget} = [X%]**
+**Remaining from budget: ₹${budget} - ₹X = ₹Y**
+**═══════════════════════════════════════**
+
+**CRITICAL - Budget Status & Utilization:**
+- Target: Use 70-90% of the allocated budget (₹${budget}) to maximize trip quality
+- If your plan uses less than 60% of budget: Consider upgrading hotels, adding premium experiences, or including special activities
+- If Y (remaining) is POSITIVE → The trip FITS WITHIN BUDGET. DO NOT say budget is short/insufficient.
+- If Y (remaining) is NEGATIVE → The trip is over budget. Clearly state by how much.
+- NEVER contradict your own calculation. If you show ₹47,620 remaining, DO NOT say the budget is short.
+- The user WANTS to use their budget for a great trip, not to minimize spending.
+
+"""),
+    _PROMPT_PACKING_AND_RESOURCES,
+    Template("""
+═══════════════════════════════════════════════════════════════════════════════
+
+**Budget Tier Context:**
+${tier_description}
+
+${personalization_section}
+
+**Destination Intelligence:**
+${minimum_budget}
+
+${weather}
+
+${travel_advisory}
+
+${document_info}
+
+Begin planning now!
+"""),
+)
+
+
+def _iter_planning_tail(values: dict) -> Iterator[str]:
+    """Yield the per-trip planning message one section at a time."""
+    for section in _PLANNING_TAIL_SECTIONS:
+        yield section if isinstance(section, str) else section.substitute(values)
+
+
+# Research results interpolated into the planning prompt
+_RESEARCH_PROMPT_FIELDS = ('minimum_budget', 'weather', 'travel_advisory', 'document_info')
+
+# Rendered standard planning prompts, keyed by _planning_prompt_key(). Retries
+# and re-plans of the same trip get byte-identical messages back.
+PLANNING_PROMPT_CACHE_MAXSIZE = 512
+planning_prompt_cache = LRUCache(maxsize=PLANNING_PROMPT_CACHE_MAXSIZE)
+_planning_prompt_cache_lock = threading.Lock()
+planner_prompt_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _personalization_key(user_preferences: dict) -> bytes:
+    """Canonical, order-independent cache key for a user's planning preferences."""
+    return orjson.dumps(
+        {
+            "preferences": user_preferences.get("preferences") or {},
+            "learned_preferences": user_preferences.get("learned_preferences") or {},
+        },
+        option=orjson.OPT_SORT_KEYS,
+        default=str,
+    )
+
+
+@lru_cache(maxsize=1024)
+def _render_personalization(prefs_json: bytes) -> str:
+    """
+    Render the USER PREFERENCES block of the planning prompt.
+    
+    Cached on the canonical preferences JSON, so a returning user's block is
+    rendered once and stays byte-identical across planning requests.
+    
+    Args:
+        prefs_json: Output of _personalization_key()
+    
+    Returns:
+        Formatted personalization section
+    """
+    user_preferences = orjson.loads(prefs_json)
+    prefs = user_preferences["preferences"]
+    learned = user_preferences["learned_preferences"]
+    
+    parts: List[str] = [_PREFS_HEADER]
+    
+    for key, label, guidance in _PREF_FIELDS:
+        value = prefs.get(key)
+        if not value:
+            continue
+        if key == "food_preferences":
+            dietary = value.get('dietary', 'no preference')
+            priorities = value.get('priorities', [])
+            parts.append(f"- {label}: {dietary} diet, Focus on: {', '.join(priorities) if priorities else 'local cuisine'}")
+            continue
+        if not isinstance(value, str):
+            value = ', '.join(value)
+        parts.append(f"- {label}: {value} - {guidance}")
+    
+    # Add learned preferences if available
+    if learned:
+        recurring_interests = learned.get("recurring_interests")
+        spending_pattern = learned.get("spending_pattern")
+        
+        if recurring_interests:
+            parts.append(f"- Based on History: This user loves {', '.join(recurring_interests)} - align recommendations with past preferences")
+        
+        if spending_pattern:
+            parts.append(f"- Spending Pattern: {spending_pattern} - User typically plans {spending_pattern} budget trips")
+    
+    parts.append(_PREFS_FOOTER)
+    return "\n".join(parts)
+
+
+def _planning_prompt_key(trip_details: TripDetails, research_data: dict, budget_tier: str, tier_description: str, prefs_key: Optional[bytes]) -> bytes:
+    """Digest of every input that shapes the standard planning prompt."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(orjson.dumps(
+        [
+            trip_details.model_dump(mode="json"),
+            budget_tier,
+            tier_description,
+            [research_data.get(field, '') for field in _RESEARCH_PROMPT_FIELDS],
+        ],
+        default=str,
+    ))
+    if prefs_key is not None:
+        digest.update(prefs_key)
+    return digest.digest()
+
+
+def create_standard_planning_prompt(trip_details: TripDetails, research_data: dict, budget_tier: str, tier_description: str, user_preferences: dict = None) -> List[tuple]:
+    """
+    Creates the master prompt for STANDARD trip planning (budget is sufficient).
+    This prompt contains detailed instructions for the ReAct agent.
+    Includes budget tier classification and user preferences for personalized planning.
+    
+    The output depends only on the arguments, so it is memoized in
+    planning_prompt_cache under a digest of them. functools caching is not
+    an option: TripDetails is mutated while merging follow-up extractions and
+    the research/preference dicts are unhashable.
+    
+    Returns:
+        Agent messages: the shared static instructions as the system message,
+        followed by the trip-specific details as the user message.
+    """
+    prefs_key = _personalization_key(user_preferences) if user_preferences else None
+    
+    # Same inputs render the same prompt; reuse it byte-for-byte
+    cache_key = _planning_prompt_key(trip_details, research_data, budget_tier, tier_description, prefs_key)
+    with _planning_prompt_cache_lock:
+        cached = planning_prompt_cache.get(cache_key)
+        planner_prompt_cache_stats["hits" if cached is not None else "misses"] += 1
+    if cached is not None:
+        return list(cached)
+    
+    # Build personalization section if preferences exist
+    personalization_section = ""
+    if prefs_key is not None:
+        personalization_section = _render_personalization(prefs_key)
+    
+    # Fields used more than once are bound to locals up front
+    destination = trip_details.destination
+    num_days = trip_details.num_days
+    num_people = trip_details.num_people
+    start_date = trip_details.start_date
+    
+    # Budget figures in whole rupees, computed once with integer arithmetic
+    budget = int(trip_details.budget)
+    daily_budget = budget // num_days
+    per_person_daily_budget = budget // (num_days * num_people)
+    budget_target_low = budget * 85 // 100
+    budget_target_high = budget * 95 // 100
+    people_text = "person" if num_people == 1 else "people"
+    
+    values = dict(
+        origin=trip_details.origin_city,
+        destination=destination,
+        destination_upper=destination.upper(),
+        days=num_days,
+        people=num_people,
+        people_text=people_text,
+        language=trip_details.preferred_language or 'English',
+        interests=trip_details.interests or 'General exploration',
+        start_date=start_date or 'Not specified - use reasonable future date',
+        start_date_ref=start_date or 'start date',
+        start_date_slot=start_date or '[start date]',
+        outbound_date=start_date or '[calculate]',
+        checkin_date=start_date or 'trip start',
+        start_date_default=start_date or 'today + 30 days',
+        start_date_note=start_date or '(not specified - use today + 30 days)',
+        start_date_hint=start_date or 'calculate as today + 30 days',
+        budget=budget,
+        daily_budget=daily_budget,
+        per_person_daily_budget=per_person_daily_budget,
+        budget_target_low=budget_target_low,
+        budget_target_high=budget_target_high,
+        budget_tier=budget_tier,
+        tier_description=tier_description,
+        personalization_section=personalization_section,
+        **{field: research_data.get(field, '') for field in _RESEARCH_PROMPT_FIELDS},
+    )
+    dynamic_tail = "".join(_iter_planning_tail(values))
+    messages = (("system", _STATIC_PROMPT_PREFIX), ("user", dynamic_tail))
+    with _planning_prompt_cache_lock:
+        planning_prompt_cache[cache_key] = messages
+    return list(messages)
+
+
+# Budget re-planning prompt, parsed once at import; only the trip-specific
+# slots are filled in per call. The static packing/resources footer lives in
+# prompts/budget_replan_footer.md and is appended verbatim.
+_BUDGET_REPLAN_TEMPLATE = Template("""
+Hey friend! 👋 I've looked at your travel plans, and I've got some good news and even better news!
+
+**About Your Trip Idea:**
+- Starting from: ${origin} (India)
+- Dream destination: ${destination}
+- Trip length: ${days} days
+- Travel crew: ${people} Indian ${people_text}
+- Your TOTAL budget (for entire trip): ₹${budget}
+- Budget gap: ₹${shortfall}
+- What you love: ${interests}
+- Language preference: ${language}
+
+**The Good News:**
+Your destination choice is AMAZING! ${destination} is incredible!
+
+**The Even Better News:**
+While your TOTAL budget of ₹${budget} for the entire trip is about ₹${shortfall} short for the original ${days}-day plan, I'm going to help you make this trip happen!
+
+**🚨 CRITICAL INSTRUCTION - READ CAREFULLY:**
+The user's original destination was **${destination}** but their budget was insufficient by ₹${shortfall}.
+
+**IF THE USER NOW MENTIONS THEY CAN INCREASE THEIR BUDGET:**
+1. **FIRST** check if the new increased budget is now sufficient for **${destination}** (their original choice)
+2. Calculate: Does (new budget) >= (original estimated cost)?
+3. **IF YES**: Generate a FULL detailed plan for **${destination}** (NOT alternate destinations!)
+4. **IF NO**: Then proceed with alternate destination suggestions below
+
+**IF THE USER DOES NOT MENTION BUDGET INCREASE:**
+Proceed with the options below.
+
+**IMPORTANT LANGUAGE INSTRUCTION:**
+Generate the ENTIRE adjusted plan response in ${language}. If the language is Hindi, Tamil, Telugu, Bengali, Marathi, or any other Indian language, translate ALL headings, descriptions, and explanations into that language.
+
+**RESEARCH DATA:**
+${minimum_budget}
+
+${travel_advisory}
+
+**YOUR MISSION:**
+Provide the user with THREE clear options to make their trip work:
+
+**OPTION 1: INCREASE BUDGET (RECOMMENDED)**
+Show them exactly what they'd get with the recommended budget (current + shortfall):
+- Keep the full ${days}-day experience
+- Comfortable mid-range accommodations
+- All desired activities included
+- Peace of mind with buffer
+
+**OPTION 2: MODIFY DESTINATION**
+Suggest 3-4 alternative destinations that offer similar experiences but fit within ₹${budget} for ${days} days:
+- Research actual budget-friendly destinations suitable for Indian travelers
+- Show full ${days}-day itineraries for each
+- Include real pricing to prove it fits their budget (in ₹)
+- Explain why each alternative is worth considering
+
+**OPTION 3: ULTRA-BUDGET VERSION (LAST RESORT)**
+Only if explicitly requested, show a heavily stripped-down version:
+- Keep ${days} days but cut amenities drastically
+- Dormitories/basic accommodations only
+- Mostly free activities
+- Local transport only
+- Street food meals
+
+**CRITICAL: "BEST-ONLY" DECISIVE RECOMMENDATIONS**
+For each option, provide clear, confident choices:
 - Recommend ONE best hotel/hostel per location with WHY it's the best value
 - Choose ONE optimal transport option that balances cost and comfort
 - Select ONE best activity per time slot with justification
@@ -1655,66 +1887,66 @@ Even for budget travel, research EVERY price in real-time:
 1. Use find_travel_and_lodging_options to find actual budget hotel prices
 2. Use get_estimated_price for EVERY flight/train ticket, meal, activity, transport
 3. Include researched prices in ₹, NOT guesstimates
-This ensures the adjusted plan truly fits within ₹{trip_details.budget}
+This ensures the adjusted plan truly fits within ₹${budget}
 
 **OUTPUT FORMAT:**
 ```
-💡 YOUR {trip_details.destination} TRIP - BUDGET OPTIONS
+💡 YOUR ${destination} TRIP - BUDGET OPTIONS
 
 ⚠️ BUDGET REALITY CHECK
-Your requested budget of ₹{trip_details.budget} for {trip_details.num_days} days is approximately ₹{shortfall} short of what's typically needed for {trip_details.destination}.
+Your requested budget of ₹${budget} for ${days} days is approximately ₹${shortfall} short of what's typically needed for ${destination}.
 
-**🎯 REMEMBER: The user's FIRST CHOICE was {trip_details.destination}!**
+**🎯 REMEMBER: The user's FIRST CHOICE was ${destination}!**
 
 **If they say they can increase their budget:** 
-→ Calculate if new budget is sufficient for {trip_details.destination}
-→ If YES: Create full plan for {trip_details.destination} (don't suggest alternatives!)
+→ Calculate if new budget is sufficient for ${destination}
+→ If YES: Create full plan for ${destination} (don't suggest alternatives!)
 → If NO: Then suggest alternatives
 
 But don't worry! Here are THREE great options to make your trip happen:
 
 ═══════════════════════════════════════
-🌟 OPTION 1: INCREASE BUDGET TO ₹{trip_details.budget + shortfall} (RECOMMENDED FOR {trip_details.destination.upper()})
+🌟 OPTION 1: INCREASE BUDGET TO ₹${budget_plus_shortfall} (RECOMMENDED FOR ${destination_upper})
 ═══════════════════════════════════════
-**This lets you enjoy {trip_details.destination} properly!**
+**This lets you enjoy ${destination} properly!**
 
-With ₹{trip_details.budget + shortfall} total budget, you can have:
+With ₹${budget_plus_shortfall} total budget, you can have:
 
-**Recommended Total Budget: ₹{trip_details.budget + shortfall}**
-(Your current: ₹{trip_details.budget} + Additional needed: ₹{shortfall})
+**Recommended Total Budget: ₹${budget_plus_shortfall}**
+(Your current: ₹${budget} + Additional needed: ₹${shortfall})
 
 **Why This Works Best:**
-✅ Full {trip_details.num_days}-day experience as originally planned
+✅ Full ${days}-day experience as originally planned
 ✅ Comfortable mid-range accommodations
 ✅ All major attractions included
 ✅ Stress-free travel with buffer for emergencies
 ✅ Better food options and flexibility
 
 **What You'll Get:**
-[Provide brief overview of the full {trip_details.num_days}-day itinerary with this budget]
+[Provide brief overview of the full ${days}-day itinerary with this budget]
 
 💰 **Quick Budget Breakdown:**
-- Accommodation: ₹X ({trip_details.num_days} nights)
+- Accommodation: ₹X (${days} nights)
 - Transport: ₹X
 - Activities: ₹X
 - Meals: ₹X
 - Miscellaneous & Buffer: ₹X
-**Total: ₹{trip_details.budget + shortfall}**
+**Total: ₹${budget_plus_shortfall}**
 
 ═══════════════════════════════════════
-🎯 OPTION 2: ALTERNATIVE DESTINATIONS (SAME BUDGET, SAME {trip_details.num_days} DAYS)
+🎯 OPTION 2: ALTERNATIVE DESTINATIONS (SAME BUDGET, SAME ${days} DAYS)
 ═══════════════════════════════════════
 
-Here are destinations offering similar experiences that fit your ₹{trip_details.budget} budget for the full {trip_details.num_days} days:
+Here are destinations offering similar experiences that fit your ₹${budget} budget for the full ${days} days:
 
 **Alternative 1: [Destination Name]**
-**Why Consider:** [Similar landscape/culture/activities to {trip_details.destination} but more affordable]
-**Budget Fit:** Total estimated cost: ₹X (within your ₹{trip_details.budget})
+**Why Consider:** [Similar landscape/culture/activities to ${destination} but more affordable]
+**Budget Fit:** Total estimated cost: ₹X (within your ₹${budget})
 **Highlights:**
 - [Key attraction 1]
 - [Key attraction 2]
 - [Key attraction 3]
-**Quick {trip_details.num_days}-Day Overview:**
+**Quick ${days}-Day Overview:**
 Day 1: [Brief overview]
 Day 2: [Brief overview]
 Day 3: [Brief overview]
@@ -1727,7 +1959,7 @@ Day 3: [Brief overview]
 [Same format as Alternative 1]
 
 ═══════════════════════════════════════
-💪 OPTION 3: ULTRA-BUDGET {trip_details.destination} ({trip_details.num_days} DAYS)
+💪 OPTION 3: ULTRA-BUDGET ${destination} (${days} DAYS)
 ═══════════════════════════════════════
 
 **Warning:** This is a very basic, backpacker-style trip with minimal amenities.
@@ -1739,400 +1971,250 @@ Day 3: [Brief overview]
 - Street food and budget meals only
 - Limited flexibility and comfort
 
-**Estimated Cost: ₹{trip_details.budget}**
+**Estimated Cost: ₹${budget}**
 
 **Day-by-Day Ultra-Budget Plan:**
 [Provide detailed itinerary with all the cost-cutting measures]
 
 💰 **Detailed Budget Breakdown:**
-[Show exact breakdown proving it fits ₹{trip_details.budget}]
+[Show exact breakdown proving it fits ₹${budget}]
 
 ═══════════════════════════════════════
 � OUR RECOMMENDATION
 ═══════════════════════════════════════
 
-We strongly recommend **OPTION 1** (increasing budget to ₹{trip_details.budget + shortfall}) or **OPTION 2** (choosing an alternative destination). Option 3 exists but may compromise your travel experience significantly.
+We strongly recommend **OPTION 1** (increasing budget to ₹${budget_plus_shortfall}) or **OPTION 2** (choosing an alternative destination). Option 3 exists but may compromise your travel experience significantly.
 
 Which option interests you most? Let me know and I can provide a full detailed itinerary!
 ```
 
-**📋 Essential Documents:**
-- ID proof (Aadhaar/Passport)
-- Permits if needed
-- Booking confirmations (saved on phone to save printing costs)
-
-**👕 Clothing (Weather-Appropriate):**
-[Based on destination weather & budget travel needs]
-- Comfortable walking clothes
-- Weather-specific items (warm/cool/rain gear)
-- Modest clothing for temples/religious sites
-- Quick-dry fabrics (useful for budget hostels with limited laundry)
-
-**💊 Health Essentials:**
-- Basic medicines (paracetamol, ORS)
-- Hand sanitizer
-- Personal hygiene items
-
-**🔌 Minimal Electronics:**
-- Phone & charger
-- Power bank (essential for budget travel)
-
-**💰 Money:**
-- Cash in small denominations for street food/local transport
-- UPI apps activated
+""")
 
-**🎯 Budget Travel Specific:**
-- Reusable water bottle (save on buying bottled water)
-- Snacks for long bus/train journeys
-- Small towel (some budget hostels don't provide)
-- Padlock for hostel lockers
-- Wet wipes (budget places may have limited facilities)
 
-✨ WHY THIS PLAN WORKS
-[Explain the benefits of the adjusted approach and why alternative destinations might offer better value]
+PROMPTS_DIR = os.path.join(os.path.dirname(__file__), "prompts")
 
-💰 MONEY-SAVING INDIA TIPS
-[Include bargaining tips, advance booking discounts, local SIM cards, off-season travel]
 
-🔗 BOOKING RESOURCES
-[Links to budget accommodations]
-```
+def _load_prompt_file(name: str) -> str:
+    """Read a static prompt file from PROMPTS_DIR through a read-only mmap."""
+    with open(os.path.join(PROMPTS_DIR, name), "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[:].decode("utf-8")
 
-Begin re-planning now!
-"""
-    return prompt
 
+_BUDGET_REPLAN_FOOTER = _load_prompt_file("budget_replan_footer.md")
 
-# ============================================================================
-# MAIN ORCHESTRATOR ENDPOINT
-# ============================================================================
 
-@app.post("/api/plan-trip-from-prompt", response_model=TripResponse)
-async def plan_trip_from_prompt(
-    request: TripRequest,
-    current_user: FirebaseUser = Depends(get_current_user)
-):
+def _split_template(template: Template) -> tuple:
     """
-    Intelligent conversational endpoint that can:
-    1. Handle trip planning requests
-    2. Answer questions about destinations
-    3. Provide travel advice
-    4. Handle clarifications and follow-ups
-    5. Have natural conversations
-    
-    Authentication is REQUIRED.
-    """
-    try:
-        print(f"📝 Received request from user: {current_user.email}")
-        print(f"📝 Prompt: {request.prompt}")
-        
-        # ====================================================================
-        # STEP 0: DETERMINE INTENT (Trip Planning vs Conversation)
-        # ====================================================================
-        intent_llm = ChatGoogleGenerativeAI(
-            model="models/gemini-2.5-flash",
-            temperature=0.3,
-            google_api_key=os.getenv("GOOGLE_API_KEY")
-        )
-        
-        intent_check_prompt = f"""
-Analyze this user message and determine what they want:
-
-User message: "{request.prompt}"
-
-{"IMPORTANT CONTEXT: This is a FOLLOW-UP message. The user previously provided incomplete trip details and we asked for more information. This message is likely providing the MISSING information (like origin city, budget, date, etc.)." if request.previous_extraction else ""}
-
-Classify as ONE of these:
-- "TRIP_PLANNING" if provides trip details (destination + any of: days/budget/origin) OR clearly wants an itinerary OR is a SHORT FOLLOW-UP providing missing info (city name, date, number, budget)
-- "MODIFICATION_REQUEST" if asking to modify a plan (e.g., "use whole budget", "upgrade", "more activities") WITHOUT complete trip details
-- "DESTINATION_INQUIRY" if asking about a place but might want to plan a trip (e.g., "tell me about Kashmir", "what's good in Goa")
-- "RECOMMENDATION" if asking for suggestions (e.g., "where should I go?", "suggest a beach destination", "best hill stations")
-- "ADVICE" if asking travel advice (e.g., "what to pack", "best time to visit", "safety tips")
-- "GREETING" if simple greeting, thanks, or social message
-- "OTHER" if cannot determine or very generic question
-
-**Examples:**
-- "5 day Goa trip" → TRIP_PLANNING
-- "Plan Kashmir trip from Delhi 50000 budget" → TRIP_PLANNING
-{"- 'mumbai' (when origin was missing) → TRIP_PLANNING (follow-up)" if request.previous_extraction else ""}
-{"- '50000' (when budget was missing) → TRIP_PLANNING (follow-up)" if request.previous_extraction else ""}
-{"- '22 nov' (when date was missing) → TRIP_PLANNING (follow-up)" if request.previous_extraction else ""}
-{"- 'from Delhi' (when origin was missing) → TRIP_PLANNING (follow-up)" if request.previous_extraction else ""}
-- "Use whole budget make it luxury" → MODIFICATION_REQUEST
-- "Tell me about Kerala" → DESTINATION_INQUIRY
-- "What are the best beaches in India?" → RECOMMENDATION
-- "Where should I go for adventure?" → RECOMMENDATION
-- "Best time to visit Ladakh?" → ADVICE
-- "What to pack for Manali?" → ADVICE
-- "Hello" / "Thanks" → GREETING
-
-{"CRITICAL: If there's previous extraction context, SHORT messages (1-5 words) are almost always TRIP_PLANNING follow-ups providing missing information!" if request.previous_extraction else ""}
-
-Respond with ONLY ONE WORD: TRIP_PLANNING, MODIFICATION_REQUEST, DESTINATION_INQUIRY, RECOMMENDATION, ADVICE, GREETING, or OTHER
-"""
-        
-        intent_response = intent_llm.invoke(intent_check_prompt)
-        intent = intent_response.content.strip().upper()
-        
-        print(f"🎯 Intent detected: {intent}")
-        
-        # ====================================================================
-        # HANDLE ANY TYPE OF PROMPT WITH SMART RESPONSES
-        # ====================================================================
-        
-        # Initialize conversational LLM for flexible responses
-        smart_llm = ChatGoogleGenerativeAI(
-            model="models/gemini-2.5-flash",
-            temperature=0.7,
-            google_api_key=os.getenv("GOOGLE_API_KEY")
-        )
-        
-        # ====================================================================
-        # HANDLE GREETINGS
-        # ====================================================================
-        if intent == "GREETING":
-            greeting_response = smart_llm.invoke(f"""
-User said: "{request.prompt}"
-
-Respond warmly and briefly, then invite them to plan a trip.
+    Split a Template into its literal segments and the placeholder names
+    between them, so rendering is a single join with no regex scan.
 
-Example responses:
-- "Hello" → "Hi there! 👋 I'm your AI travel assistant. Ready to plan an amazing trip? Just tell me where you want to go, how many days, your budget, and I'll create the perfect itinerary!"
-- "Thanks" → "You're welcome! 😊 Need help planning another trip? I'm here whenever you need!"
-- "Hey" → "Hey! 🌍 Where would you like to travel? Share your destination, dates, and budget, and I'll plan something incredible!"
-
-Keep it under 2 sentences, warm tone, end with trip planning invitation.
-""")
-            
-            return TripResponse(
-                success=True,
-                message="Greeting",
-                trip_plan=greeting_response.content.strip(),
-                trip_id=None,
-                extracted_details=None
-            )
-        
-        # ====================================================================
-        # HANDLE DESTINATION INQUIRIES
-        # ====================================================================
-        if intent == "DESTINATION_INQUIRY":
-            destination_response = smart_llm.invoke(f"""
-User asked: "{request.prompt}"
+    Returns:
+        (segments, slots) with len(segments) == len(slots) + 1
+    """
+    text = template.template
+    segments, slots, pos = [], [], 0
+    for match in template.pattern.finditer(text):
+        name = match.group("named") or match.group("braced")
+        if name is None:
+            raise ValueError(f"Unsupported placeholder at offset {match.start()}")
+        segments.append(text[pos:match.start()])
+        slots.append(name)
+        pos = match.end()
+    segments.append(text[pos:])
+    return tuple(segments), tuple(slots)
 
-You're a knowledgeable India travel expert. Provide a helpful, engaging 3-4 sentence answer about the destination they're asking about. Include:
-- Key highlights (beaches, mountains, culture, food, etc.)
-- Best time to visit (briefly)
-- Who it's perfect for (families, couples, adventure seekers, etc.)
 
-Then ALWAYS end with: "Want me to plan a trip there? Just share: your origin city, number of days, group size, and total budget!"
+_BUDGET_REPLAN_SEGMENTS, _BUDGET_REPLAN_SLOTS = _split_template(_BUDGET_REPLAN_TEMPLATE)
 
-Keep the tone enthusiastic and informative. Make them excited about the place!
-""")
-            
-            return TripResponse(
-                success=True,
-                message="Destination information",
-                trip_plan=destination_response.content.strip(),
-                trip_id=None,
-                extracted_details=None
-            )
-        
-        # ====================================================================
-        # HANDLE RECOMMENDATIONS
-        # ====================================================================
-        if intent == "RECOMMENDATION":
-            recommendation_response = smart_llm.invoke(f"""
-User asked: "{request.prompt}"
 
-Provide 3-4 excellent destination recommendations that match their request. For EACH destination, include:
-- **Destination Name:** Brief 1-sentence description
-- Why it's great for their request
-- Best for: (season/duration/budget)
+class _ReplanValues(dict):
+    """
+    String values for the re-planning template.
 
-Format like this:
-**Top Recommendations:**
+    Derived slots (destination_upper, budget_plus_shortfall) are computed on
+    first lookup via __missing__ and stored, so each is built at most once
+    and only if the template references it.
+    """
 
-**1. [Destination]** - [One sentence description]
-• Perfect for: [Why it matches their request]
-• Best time: [Season]
-• Ideal duration: [Days]
+    def __init__(self, budget: float, shortfall: float, **values: str):
+        super().__init__(values, budget=str(budget), shortfall=str(shortfall))
+        self._budget = budget
+        self._shortfall = shortfall
 
-[Repeat for 2-3 more destinations]
+    def __missing__(self, key: str) -> str:
+        if key == "destination_upper":
+            value = self["destination"].upper()
+        elif key == "budget_plus_shortfall":
+            value = str(self._budget + self._shortfall)
+        else:
+            raise KeyError(key)
+        self[key] = value
+        return value
+
+
+def _iter_replanning_prompt(values: _ReplanValues) -> Iterator[str]:
+    """Yield the re-planning prompt as alternating literal segments and values."""
+    yield _BUDGET_REPLAN_SEGMENTS[0]
+    for name, literal in zip(_BUDGET_REPLAN_SLOTS, _BUDGET_REPLAN_SEGMENTS[1:]):
+        yield values[name]
+        yield literal
+    yield _BUDGET_REPLAN_FOOTER
+
+
+@lru_cache(maxsize=256)
+def _render_replanning_prompt(
+    origin: str,
+    destination: str,
+    num_days: int,
+    num_people: int,
+    budget: float,
+    shortfall: float,
+    interests: str,
+    language: str,
+    minimum_budget: str,
+    travel_advisory: str,
+) -> str:
+    """
+    Render the budget re-planning prompt from primitive trip fields.
+
+    Pure and hashable-keyed so repeated re-planning turns for the same trip
+    skip the substitution entirely; see /health for hit/miss counts.
+    """
+    values = _ReplanValues(
+        budget,
+        shortfall,
+        origin=origin,
+        destination=destination,
+        days=str(num_days),
+        people=str(num_people),
+        people_text="person" if num_people == 1 else "people",
+        interests=interests,
+        language=language,
+        minimum_budget=str(minimum_budget),
+        travel_advisory=str(travel_advisory),
+    )
+    return "".join(_iter_replanning_prompt(values))
 
-**Ready to plan?** Pick a destination and tell me: your origin city, number of days, travelers, and budget!
 
-Be enthusiastic, specific, and helpful!
-""")
-            
-            return TripResponse(
-                success=True,
-                message="Travel recommendations",
-                trip_plan=recommendation_response.content.strip(),
-                trip_id=None,
-                extracted_details=None
-            )
-        
-        # ====================================================================
-        # HANDLE TRAVEL ADVICE
-        # ====================================================================
-        if intent == "ADVICE":
-            advice_response = smart_llm.invoke(f"""
-User asked: "{request.prompt}"
+def create_replanning_prompt(trip_details: TripDetails, research_data: dict, shortfall: float) -> str:
+    """
+    Creates the master prompt for RE-PLANNING (budget is insufficient).
+    This prompt guides the agent to proactively adjust the plan with encouragement.
+    """
+    # City names and languages recur across requests; interning them makes
+    # lru_cache key comparisons identity checks with a cached hash.
+    return _render_replanning_prompt(
+        sys.intern(trip_details.origin_city),
+        sys.intern(trip_details.destination),
+        trip_details.num_days,
+        trip_details.num_people,
+        trip_details.budget,
+        shortfall,
+        trip_details.interests or 'Exploring new places',
+        sys.intern(trip_details.preferred_language or 'English'),
+        research_data.get('minimum_budget', 'Not available'),
+        research_data.get('travel_advisory', 'Not available'),
+    )
 
-Provide practical, helpful travel advice. Be concise (4-5 bullet points), specific, and actionable.
 
-Format like this:
-**[Topic - e.g., "Packing for Manali" or "Best Time to Visit Ladakh"]:**
+# ============================================================================
+# MAIN ORCHESTRATOR ENDPOINT
+# ============================================================================
 
-• [Advice point 1]
-• [Advice point 2]
-• [Advice point 3]
-• [Advice point 4]
+# Replies to standalone conversational messages ("hi", "best time to visit
+# Ladakh?"), keyed by the normalized prompt. They don't depend on the user or
+# on earlier turns, so a repeat within the TTL skips Gemini entirely. Follow-ups
+# and planning intents are never cached. Only touched from the event loop.
+CONVERSATION_CACHE_TTL_SECONDS = 86400  # 24 hours
+CONVERSATION_CACHE_MAXSIZE = 2048
+conversation_cache = TTLCache(maxsize=CONVERSATION_CACHE_MAXSIZE, ttl=CONVERSATION_CACHE_TTL_SECONDS)
 
-💡 **Pro tip:** [One insider tip]
 
-Then end with: "Planning a trip? Share your destination, dates, origin city, and budget - I'll create the perfect itinerary!"
+def _conversation_cache_key(prompt: str) -> str:
+    """Case- and whitespace-insensitive key, ignoring trailing punctuation."""
+    return " ".join(prompt.casefold().split()).rstrip(" .!?")
 
-Be practical and genuinely helpful!
-""")
-            
-            return TripResponse(
-                success=True,
-                message="Travel advice",
-                trip_plan=advice_response.content.strip(),
-                trip_id=None,
-                extracted_details=None
-            )
-        
-        # ====================================================================
-        # HANDLE OTHER/UNKNOWN PROMPTS
-        # ====================================================================
-        if intent == "OTHER":
-            other_response = smart_llm.invoke(f"""
-User said: "{request.prompt}"
 
-This is unclear or doesn't fit typical trip planning queries. Respond helpfully:
+# Extraction state of in-progress planning conversations, keyed by user and
+# conversation_id, so a follow-up turn only needs to send the new message.
+# Shared across workers through Redis when REDIS_URL is set (as OTPs are),
+# otherwise kept in this worker's memory.
+CONVERSATION_STATE_TTL_SECONDS = 900  # 15 minutes
+CONVERSATION_STATE_MAXSIZE = 4096
+_conversation_state_local = TTLCache(maxsize=CONVERSATION_STATE_MAXSIZE, ttl=CONVERSATION_STATE_TTL_SECONDS)
+_conversation_state_redis = aioredis.Redis.from_url(os.environ["REDIS_URL"]) if os.getenv("REDIS_URL") else None
 
-1. If it seems travel-related but vague: Gently ask for clarification
-2. If completely off-topic: Politely redirect to trip planning
-3. If it's a complex question: Break it down and answer what you can
 
-Always end with: "I'm here to help you plan amazing trips across India! Just tell me your destination, origin city, dates, travelers, and budget."
+def _conversation_state_key(uid: str, conversation_id: str) -> str:
+    return f"trip_conversation:{uid}:{conversation_id}"
 
-Be friendly, not robotic. Show you're trying to understand.
-""")
-            
-            return TripResponse(
-                success=True,
-                message="General response",
-                trip_plan=other_response.content.strip(),
-                trip_id=None,
-                extracted_details=None
-            )
-        
-        # ====================================================================
-        # HANDLE MODIFICATION REQUESTS (without complete trip details)
-        # ====================================================================
-        if intent == "MODIFICATION_REQUEST":
-            return TripResponse(
-                success=False,
-                message="Cannot modify plan without context",
-                trip_plan="""I understand you want to modify or upgrade your trip plan, but I need the complete trip details to help you properly.
 
-Since each message is independent, please provide the full details again with your modification request:
+async def load_conversation_state(uid: str, conversation_id: str) -> Optional[dict]:
+    """Return the extraction saved for this conversation, or None if unknown/expired."""
+    key = _conversation_state_key(uid, conversation_id)
+    if _conversation_state_redis is None:
+        return _conversation_state_local.get(key)
+    try:
+        raw = await _conversation_state_redis.get(key)
+    except Exception as e:
+        logger.warning("conversation state load failed key=%s: %s", key, e)
+        return None
+    return orjson.loads(raw) if raw else None
 
-**Please include:**
-• Origin city
-• Destination  
-• Number of days
-• Number of travelers
-• Total budget (including your request like "use full 80000 budget")
-• Interests/preferences
 
-**Example:** "7 day trip to Kerala from Mumbai for 2 people with 80000 budget - use the entire budget for luxury experience"
+async def save_conversation_state(uid: str, conversation_id: str, state: dict) -> None:
+    """Store the latest extraction for this conversation (best effort)."""
+    key = _conversation_state_key(uid, conversation_id)
+    if _conversation_state_redis is None:
+        _conversation_state_local[key] = state
+        return
+    try:
+        await _conversation_state_redis.set(
+            key, orjson.dumps(state, default=str), ex=CONVERSATION_STATE_TTL_SECONDS
+        )
+    except Exception as e:
+        logger.warning("conversation state save failed key=%s: %s", key, e)
 
-This way I can create an upgraded plan that fully utilizes your budget! 💎""",
-                trip_id=None,
-                extracted_details=None
-            )
-        
-        # ====================================================================
-        # STEP 1: EXTRACT TRIP DETAILS (for TRIP_PLANNING intent)
-        # ====================================================================
-        print("🔍 STEP 1: Extracting trip details from prompt...")
-        
-        # Check if we have previous extraction context
-        previous_details = None
-        context_text = ""
-        if request.previous_extraction:
-            previous_details = request.previous_extraction
-            print(f"📋 Found previous extraction: {previous_details}")
-            context_text = f"""
 
-**IMPORTANT - CONVERSATION CONTINUITY:**
-The user previously provided some trip information but it was incomplete. Here's what we already know:
-- Origin: {previous_details.get('origin_city', 'Not specified')} {'❌ MISSING - Need to ask' if not previous_details.get('origin_city') or previous_details.get('origin_city') in ['Not specified', 'unknown', 'n/a'] else '✓ Already provided'}
-- Destination: {previous_details.get('destination', 'Not specified')} {'❌ MISSING - Need to ask' if not previous_details.get('destination') or previous_details.get('destination') in ['Not specified', 'unknown', 'n/a'] else '✓ Already provided'}
-- Days: {previous_details.get('num_days', 0)} {'❌ MISSING - Need to ask' if not previous_details.get('num_days') or previous_details.get('num_days') <= 0 else '✓ Already provided'}
-- People: {previous_details.get('num_people', 1)} {'✓ Already provided' if previous_details.get('num_people') and previous_details.get('num_people') > 0 else '(default)'}
-- Budget: ₹{previous_details.get('budget', 0)} {'❌ MISSING - Need to ask' if not previous_details.get('budget') or previous_details.get('budget') <= 0 else '✓ Already provided'}
-- Start Date: {previous_details.get('start_date', 'Not specified')} {'❌ MISSING - Need to ask' if not previous_details.get('start_date') else '✓ Already provided'}
-- Interests: {previous_details.get('interests', 'None specified')}
+# Extractor placeholders meaning "not mentioned"
+MISSING_TEXT_VALUES = frozenset({"not specified", "unknown", "n/a", "", "anywhere"})
 
-**WHAT WE ASKED THE USER:**
-We just asked them to provide the MISSING information above (marked with ❌).
+# TripDetails fields filled from the previous extraction when the follow-up
+# leaves them missing; budget is merged separately (it may be an update)
+_MERGE_FIELDS = ("origin_city", "destination", "num_days", "num_people", "interests", "start_date")
 
-The user's new message "{request.prompt}" is their ANSWER to what we asked for.
 
-**YOUR TASK:**
-1. If the message is a SINGLE WORD or SHORT PHRASE (like "Mumbai", "Delhi", "5 days", "50000"), it's answering the FIRST MISSING FIELD above
-2. Extract ONLY the new information from their answer
-3. Keep ALL existing ✓ values COMPLETELY UNCHANGED
-4. DO NOT interpret their answer as a new trip request - it's filling in missing data!
+# Required-field check on the merged trip: (field, name when missing,
+# follow-up question or None if optional, summary line when present)
+_TRIP_FIELD_SPEC = (
+    ("origin_city", "origin city", "**Where are you traveling from?** (e.g., Delhi, Mumbai, Bangalore)", "✓ From: {}"),
+    ("destination", "destination", "**Where would you like to go?** (e.g., Goa, Kashmir, Kerala)", "✓ To: {}"),
+    ("num_days", "duration", "**How many days?** (e.g., weekend trip, 5 days, a week)", "✓ Duration: {} days"),
+    ("num_people", None, None, "✓ Travelers: {} people"),
+    ("budget", "budget", "**What's your total budget?** (e.g., ₹50,000, budget-friendly, comfortable)", "✓ Budget: ₹{}"),
+    ("start_date", "start date", "**When do you want to start your trip?** (e.g., December 25, next week, 15/12/2025)", "✓ Start Date: {}"),
+)
 
-**Example:** If Origin is ❌ MISSING and Destination is "Rajasthan" ✓, and user says "Mumbai":
-→ Set origin_city="Mumbai", keep destination="Rajasthan" (NOT a Mumbai trip!)
 
-"""
-        
-        extractor_llm = ChatGoogleGenerativeAI(
-            model="models/gemini-2.5-flash",
-            temperature=0,
-            google_api_key=os.getenv("GOOGLE_API_KEY")
-        ).with_structured_output(TripDetails)
-        
-        extraction_prompt = f"""
-You are a friendly travel assistant helping someone plan their trip. Extract trip details from their message:
+def _is_missing(value) -> bool:
+    """True for empty or placeholder text and for zero/negative numbers."""
+    if not value:
+        return True
+    if isinstance(value, str):
+        return value.lower() in MISSING_TEXT_VALUES
+    return value <= 0
 
-USER MESSAGE: "{request.prompt}"
-{context_text}
 
-**CRITICAL - CONVERSATION CONTEXT AWARENESS:**
-{f"This is a FOLLOW-UP message. The user is providing MISSING information that we asked for." if request.previous_extraction else "This is a NEW trip planning request."}
+# Static trip-details extraction instructions, sent as the system message
+# ahead of the per-request details. Gemini 2.5 caches repeated prompt prefixes
+# implicitly, so keeping this byte-identical and first means only the short
+# user turn is processed at full input cost.
+_EXTRACTION_SYSTEM_PROMPT = """You are a friendly travel assistant helping someone plan their trip. Extract trip details from their message.
 
 **EXTRACTION GUIDELINES:**
 Be smart and conversational in understanding:
 
-{"**SPECIAL RULE FOR FOLLOW-UP MESSAGES:**" if request.previous_extraction else ""}
-{"When the user's message is SHORT (1-5 words like 'Mumbai', 'mumbai', '5 days', '30000'), they're answering what we asked for:" if request.previous_extraction else ""}
-{""  if request.previous_extraction else ""}
-{"**Field Matching Rules:**" if request.previous_extraction else ""}
-{"1. Single city/location name (e.g., 'mumbai', 'Delhi', 'Bangalore') → Fill the FIRST MISSING location field" if request.previous_extraction else ""}
-{"   - User can say just 'mumbai' OR 'from mumbai' - BOTH mean the same thing" if request.previous_extraction else ""}
-{"   - If origin_city is ❌ MISSING in the context above → Set origin_city, keep destination unchanged" if request.previous_extraction else ""}
-{"   - If origin_city is ✓ provided but destination is ❌ MISSING → Set destination, keep origin_city unchanged" if request.previous_extraction else ""}
-{"2. Number with 'days' (e.g., '5 days', '1 week') → Set num_days" if request.previous_extraction else ""}
-{"3. Number alone or with rupees/₹ (e.g., '50000', '30k rupees') → Set budget" if request.previous_extraction else ""}
-{"4. Date (e.g., '25 December', '2024-12-25') → Set start_date" if request.previous_extraction else ""}
-{""  if request.previous_extraction else ""}
-{"DO NOT CREATE A NEW TRIP ABOUT THAT CITY! Extract the specific field that's missing." if request.previous_extraction else ""}
-{""  if request.previous_extraction else ""}
-{"Examples:" if request.previous_extraction else ""}
-{"- Previous: origin_city='Not specified', destination='Rajasthan'. User says 'mumbai' → origin_city='Mumbai', destination='Rajasthan'" if request.previous_extraction else ""}
-{"- Previous: origin_city='Not specified', destination='Goa'. User says 'from Delhi' → origin_city='Delhi', destination='Goa'" if request.previous_extraction else ""}
-{"- Previous: origin_city='Mumbai', destination='Not specified'. User says 'Kerala' → origin_city='Mumbai', destination='Kerala'" if request.previous_extraction else ""}
-{""  if request.previous_extraction else ""}
-
 1. **Origin City**: Where they're traveling FROM
    - Look for: "from [city]", "leaving from", "starting in", "I'm in [city]", OR just "[city]" when origin is missing
    - Accept BOTH "from Mumbai" AND just "Mumbai" as origin city
@@ -2168,7 +2250,7 @@ Be smart and conversational in understanding:
    - "next month" → first week of next month
    - "this weekend" → upcoming Saturday
    - "December" → first week of December (if year not mentioned, use 2025)
-    - TODAY'S DATE for reference: {__import__('datetime').datetime.now().strftime('%Y-%m-%d')} ({__import__('datetime').datetime.now().strftime('%B %d, %Y')})
+   - Resolve relative dates against TODAY'S DATE, given after the user's message
    - Format output as: YYYY-MM-DD (e.g., "2025-12-15")
    - If not mentioned: Use None
 
@@ -2214,18 +2296,442 @@ Be smart and conversational in understanding:
 - "X din ke liye" = for X days
 - "X log" = X people
 - "budget X hai" = budget is X
+"""
+
+
+# A day count, rupee sign or "budget" almost always means TRIP_PLANNING, so
+# Step 0 starts the extraction speculatively for these prompts
+LIKELY_PLANNING_REGEX = re.compile(r"\b\d+\s*(day|days|din|nights?)\b|₹|\bbudget\b", re.I)
+
+# Bare greetings and thanks answered without a model call, with the canned
+# reply since there is nothing for the model to add. Anything longer goes to
+# the model: "what to pack for a 5 day trip" mentions days and a trip but is
+# ADVICE, so keyword patterns can't safely short-circuit TRIP_PLANNING.
+_FAST_INTENTS = (
+    (
+        re.compile(r"^\s*(thanks|thank you|thx|dhanyavad)\W*$", re.I),
+        ConversationalResponse(
+            intent="GREETING",
+            response_text="You're welcome! 😊 Need help planning another trip? I'm here whenever you need!",
+        ),
+    ),
+    (
+        re.compile(r"^\s*(hi|hello|hey|hola|namaste)( there)?\W*$", re.I),
+        ConversationalResponse(
+            intent="GREETING",
+            response_text="Hi there! 👋 I'm your AI travel assistant. Ready to plan an amazing trip? Just tell me where you want to go, how many days, your budget, and I'll create the perfect itinerary!",
+        ),
+    ),
+)
+
+
+def _fast_intent(prompt: str) -> Optional[ConversationalResponse]:
+    """Step 0 result for prompts a regex can classify, else None (ask the model)."""
+    for pattern, conversation in _FAST_INTENTS:
+        if pattern.search(prompt):
+            return conversation
+    return None
+
+
+# Conversational intents answered by the Step 0 call itself:
+# intent -> (TripResponse message label, reply instructions for the model)
+CONVERSATIONAL_INTENTS = {
+    "GREETING": (
+        "Greeting",
+        """Respond warmly and briefly, then invite them to plan a trip. Keep it under 2 sentences, warm tone, end with trip planning invitation.
+  Example responses:
+  - "Hello" → "Hi there! 👋 I'm your AI travel assistant. Ready to plan an amazing trip? Just tell me where you want to go, how many days, your budget, and I'll create the perfect itinerary!"
+  - "Thanks" → "You're welcome! 😊 Need help planning another trip? I'm here whenever you need!"
+  - "Hey" → "Hey! 🌍 Where would you like to travel? Share your destination, dates, and budget, and I'll plan something incredible!\"""",
+    ),
+    "DESTINATION_INQUIRY": (
+        "Destination information",
+        """You're a knowledgeable India travel expert. Provide a helpful, engaging 3-4 sentence answer about the destination they're asking about. Include:
+  - Key highlights (beaches, mountains, culture, food, etc.)
+  - Best time to visit (briefly)
+  - Who it's perfect for (families, couples, adventure seekers, etc.)
+  Then ALWAYS end with: "Want me to plan a trip there? Just share: your origin city, number of days, group size, and total budget!"
+  Keep the tone enthusiastic and informative. Make them excited about the place!""",
+    ),
+    "RECOMMENDATION": (
+        "Travel recommendations",
+        """Provide 3-4 excellent destination recommendations that match their request. For EACH destination, include:
+  - **Destination Name:** Brief 1-sentence description
+  - Why it's great for their request
+  - Best for: (season/duration/budget)
+  Format like this:
+  **Top Recommendations:**
+
+  **1. [Destination]** - [One sentence description]
+  • Perfect for: [Why it matches their request]
+  • Best time: [Season]
+  • Ideal duration: [Days]
+
+  [Repeat for 2-3 more destinations]
+
+  **Ready to plan?** Pick a destination and tell me: your origin city, number of days, travelers, and budget!
+  Be enthusiastic, specific, and helpful!""",
+    ),
+    "ADVICE": (
+        "Travel advice",
+        """Provide practical, helpful travel advice. Be concise (4-5 bullet points), specific, and actionable.
+  Format like this:
+  **[Topic - e.g., "Packing for Manali" or "Best Time to Visit Ladakh"]:**
+
+  • [Advice point 1]
+  • [Advice point 2]
+  • [Advice point 3]
+  • [Advice point 4]
+
+  💡 **Pro tip:** [One insider tip]
+
+  Then end with: "Planning a trip? Share your destination, dates, origin city, and budget - I'll create the perfect itinerary!"
+  Be practical and genuinely helpful!""",
+    ),
+    "OTHER": (
+        "General response",
+        """This is unclear or doesn't fit typical trip planning queries. Respond helpfully:
+  1. If it seems travel-related but vague: Gently ask for clarification
+  2. If completely off-topic: Politely redirect to trip planning
+  3. If it's a complex question: Break it down and answer what you can
+  Always end with: "I'm here to help you plan amazing trips across India! Just tell me your destination, origin city, dates, travelers, and budget."
+  Be friendly, not robotic. Show you're trying to understand.""",
+    ),
+}
+
+
+def _intent_prompt_template(follow_up: bool) -> Template:
+    """
+    Step 0 prompt with the follow-up variations resolved, leaving only
+    $user_prompt to fill in per request.
+    """
+    reply_rules = "\n\n".join(
+        f"- {intent} → {rules}" for intent, (_, rules) in CONVERSATIONAL_INTENTS.items()
+    )
+    return Template(f"""
+Analyze this user message and determine what they want:
+
+User message: "$user_prompt"
+
+{"IMPORTANT CONTEXT: This is a FOLLOW-UP message. The user previously provided incomplete trip details and we asked for more information. This message is likely providing the MISSING information (like origin city, budget, date, etc.)." if follow_up else ""}
+
+Classify as ONE of these:
+- "TRIP_PLANNING" if provides trip details (destination + any of: days/budget/origin) OR clearly wants an itinerary OR is a SHORT FOLLOW-UP providing missing info (city name, date, number, budget)
+- "MODIFICATION_REQUEST" if asking to modify a plan (e.g., "use whole budget", "upgrade", "more activities") WITHOUT complete trip details
+- "DESTINATION_INQUIRY" if asking about a place but might want to plan a trip (e.g., "tell me about Kashmir", "what's good in Goa")
+- "RECOMMENDATION" if asking for suggestions (e.g., "where should I go?", "suggest a beach destination", "best hill stations")
+- "ADVICE" if asking travel advice (e.g., "what to pack", "best time to visit", "safety tips")
+- "GREETING" if simple greeting, thanks, or social message
+- "OTHER" if cannot determine or very generic question
+
+**Examples:**
+- "5 day Goa trip" → TRIP_PLANNING
+- "Plan Kashmir trip from Delhi 50000 budget" → TRIP_PLANNING
+{"- 'mumbai' (when origin was missing) → TRIP_PLANNING (follow-up)" if follow_up else ""}
+{"- '50000' (when budget was missing) → TRIP_PLANNING (follow-up)" if follow_up else ""}
+{"- '22 nov' (when date was missing) → TRIP_PLANNING (follow-up)" if follow_up else ""}
+{"- 'from Delhi' (when origin was missing) → TRIP_PLANNING (follow-up)" if follow_up else ""}
+- "Use whole budget make it luxury" → MODIFICATION_REQUEST
+- "Tell me about Kerala" → DESTINATION_INQUIRY
+- "What are the best beaches in India?" → RECOMMENDATION
+- "Where should I go for adventure?" → RECOMMENDATION
+- "Best time to visit Ladakh?" → ADVICE
+- "What to pack for Manali?" → ADVICE
+- "Hello" / "Thanks" → GREETING
+
+{"CRITICAL: If there's previous extraction context, SHORT messages (1-5 words) are almost always TRIP_PLANNING follow-ups providing missing information!" if follow_up else ""}
+
+Set "intent" to exactly ONE of: TRIP_PLANNING, MODIFICATION_REQUEST, DESTINATION_INQUIRY, RECOMMENDATION, ADVICE, GREETING, or OTHER
+
+Then set "response_text" according to the intent:
+
+- TRIP_PLANNING / MODIFICATION_REQUEST → leave response_text EMPTY (handled separately)
+
+{reply_rules}
+""")
+
+
+# Indexed by bool(request.previous_extraction)
+_INTENT_PROMPTS = (_intent_prompt_template(False), _intent_prompt_template(True))
+
+
+@lru_cache(maxsize=1)
+def get_intent_llm():
+    """
+    Step 0 model: classifies the message and answers conversational intents.
+    Shared across requests so the client's connection pool is reused.
+    """
+    return _chat_model(
+        model="models/gemini-2.5-flash",
+        temperature=0.3,
+        google_api_key=os.getenv("GOOGLE_API_KEY")
+    ).with_structured_output(ConversationalResponse)
+
+
+@lru_cache(maxsize=1)
+def get_reply_llm():
+    """Plain-text model for a conversational reply Step 0 classified but left empty."""
+    return _chat_model(
+        model="models/gemini-2.5-flash",
+        temperature=0.7,
+        google_api_key=os.getenv("GOOGLE_API_KEY")
+    )
+
+
+# Shown when neither Step 0 nor the follow-up reply call produced any text
+CONVERSATIONAL_FALLBACK_REPLY = (
+    "I'm your AI travel assistant! 🌍 Tell me where you'd like to go, your origin city, "
+    "how many days, how many travelers and your budget, and I'll plan the perfect trip."
+)
+
+
+async def _write_conversational_reply(intent: str, user_prompt: str) -> Optional[str]:
+    """Generate the reply for a conversational intent separately; None if that fails too."""
+    instructions = CONVERSATIONAL_INTENTS[intent][1]
+    try:
+        response = await get_reply_llm().ainvoke(
+            f'User message: "{user_prompt}"\n\nReply to it. {instructions}'
+        )
+    except Exception:
+        logger.exception("[PLAN] conversational reply failed intent=%s", intent)
+        return None
+    return response.content.strip() or None
+
+
+@lru_cache(maxsize=1)
+def get_extractor_llm():
+    """Step 1 model: extracts TripDetails; shared across requests like get_intent_llm()."""
+    return _chat_model(
+        model="models/gemini-2.5-flash",
+        temperature=0,
+        google_api_key=os.getenv("GOOGLE_API_KEY")
+    ).with_structured_output(TripDetails)
+
+
+def _extraction_prompt_template(follow_up: bool) -> Template:
+    """
+    Step 1 user-turn prompt with the follow-up variations resolved, leaving
+    $user_prompt, $context_text and the relative dates to fill in per request.
+    """
+    return Template(f"""
+USER MESSAGE: "$user_prompt"
+$context_text
+
+**CRITICAL - CONVERSATION CONTEXT AWARENESS:**
+{f"This is a FOLLOW-UP message. The user is providing MISSING information that we asked for." if follow_up else "This is a NEW trip planning request."}
+
+{"**SPECIAL RULE FOR FOLLOW-UP MESSAGES:**" if follow_up else ""}
+{"When the user's message is SHORT (1-5 words like 'Mumbai', 'mumbai', '5 days', '30000'), they're answering what we asked for:" if follow_up else ""}
+{""  if follow_up else ""}
+{"**Field Matching Rules:**" if follow_up else ""}
+{"1. Single city/location name (e.g., 'mumbai', 'Delhi', 'Bangalore') → Fill the FIRST MISSING location field" if follow_up else ""}
+{"   - User can say just 'mumbai' OR 'from mumbai' - BOTH mean the same thing" if follow_up else ""}
+{"   - If origin_city is ❌ MISSING in the context above → Set origin_city, keep destination unchanged" if follow_up else ""}
+{"   - If origin_city is ✓ provided but destination is ❌ MISSING → Set destination, keep origin_city unchanged" if follow_up else ""}
+{"2. Number with 'days' (e.g., '5 days', '1 week') → Set num_days" if follow_up else ""}
+{"3. Number alone or with rupees/₹ (e.g., '50000', '30k rupees') → Set budget" if follow_up else ""}
+{"4. Date (e.g., '25 December', '2024-12-25') → Set start_date" if follow_up else ""}
+{""  if follow_up else ""}
+{"DO NOT CREATE A NEW TRIP ABOUT THAT CITY! Extract the specific field that's missing." if follow_up else ""}
+{""  if follow_up else ""}
+{"Examples:" if follow_up else ""}
+{"- Previous: origin_city='Not specified', destination='Rajasthan'. User says 'mumbai' → origin_city='Mumbai', destination='Rajasthan'" if follow_up else ""}
+{"- Previous: origin_city='Not specified', destination='Goa'. User says 'from Delhi' → origin_city='Delhi', destination='Goa'" if follow_up else ""}
+{"- Previous: origin_city='Mumbai', destination='Not specified'. User says 'Kerala' → origin_city='Mumbai', destination='Kerala'" if follow_up else ""}
+{""  if follow_up else ""}
+
+**TODAY'S DATE:** $today ($today_long)
+Resolved for today: next week = $next_week, next month = $next_month, this weekend = $this_weekend
 
 Now extract from the user's message above. Fill in what you can infer, use sensible defaults, and mark unknowns appropriately.
+""")
+
+
+_EXTRACTION_PROMPTS = (_extraction_prompt_template(False), _extraction_prompt_template(True))
+
+
+def _build_extraction_messages(user_prompt: str, previous_details: Optional[dict]) -> list:
+    """Step 1 chat messages: static extraction rules as the system prefix, this turn's message and context as the user turn."""
+    context_text = ""
+    if previous_details:
+        context_text = f"""
+
+**IMPORTANT - CONVERSATION CONTINUITY:**
+The user previously provided some trip information but it was incomplete. Here's what we already know:
+- Origin: {previous_details.get('origin_city', 'Not specified')} {'❌ MISSING - Need to ask' if not previous_details.get('origin_city') or previous_details.get('origin_city') in ['Not specified', 'unknown', 'n/a'] else '✓ Already provided'}
+- Destination: {previous_details.get('destination', 'Not specified')} {'❌ MISSING - Need to ask' if not previous_details.get('destination') or previous_details.get('destination') in ['Not specified', 'unknown', 'n/a'] else '✓ Already provided'}
+- Days: {previous_details.get('num_days', 0)} {'❌ MISSING - Need to ask' if not previous_details.get('num_days') or previous_details.get('num_days') <= 0 else '✓ Already provided'}
+- People: {previous_details.get('num_people', 1)} {'✓ Already provided' if previous_details.get('num_people') and previous_details.get('num_people') > 0 else '(default)'}
+- Budget: ₹{previous_details.get('budget', 0)} {'❌ MISSING - Need to ask' if not previous_details.get('budget') or previous_details.get('budget') <= 0 else '✓ Already provided'}
+- Start Date: {previous_details.get('start_date', 'Not specified')} {'❌ MISSING - Need to ask' if not previous_details.get('start_date') else '✓ Already provided'}
+- Interests: {previous_details.get('interests', 'None specified')}
+
+**WHAT WE ASKED THE USER:**
+We just asked them to provide the MISSING information above (marked with ❌).
+
+The user's new message "{user_prompt}" is their ANSWER to what we asked for.
+
+**YOUR TASK:**
+1. If the message is a SINGLE WORD or SHORT PHRASE (like "Mumbai", "Delhi", "5 days", "50000"), it's answering the FIRST MISSING FIELD above
+2. Extract ONLY the new information from their answer
+3. Keep ALL existing ✓ values COMPLETELY UNCHANGED
+4. DO NOT interpret their answer as a new trip request - it's filling in missing data!
+
+**Example:** If Origin is ❌ MISSING and Destination is "Rajasthan" ✓, and user says "Mumbai":
+→ Set origin_city="Mumbai", keep destination="Rajasthan" (NOT a Mumbai trip!)
+
 """
+
+    extraction_prompt = _EXTRACTION_PROMPTS[bool(previous_details)].substitute(
+        user_prompt=user_prompt,
+        context_text=context_text,
+        **_relative_dates(date.today()),
+    )
+    return [("system", _EXTRACTION_SYSTEM_PROMPT), ("user", extraction_prompt)]
+
+
+# Status sink set by the streaming variant of the endpoint; None otherwise
+_plan_progress: ContextVar[Optional[asyncio.Queue]] = ContextVar("plan_progress", default=None)
+
+
+def _report_progress(stage: str) -> None:
+    """Tell a streaming client which planning step has started (no-op for plain requests)."""
+    queue = _plan_progress.get()
+    if queue is not None:
+        queue.put_nowait(stage)
+
+
+def _sse_event(event: str, data) -> bytes:
+    """Encode one server-sent event with a JSON payload."""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+@app.post("/api/plan-trip-from-prompt", response_model=TripResponse)
+async def plan_trip_from_prompt(
+    request: TripRequest,
+    current_user: FirebaseUser = Depends(get_current_user)
+):
+    """
+    Intelligent conversational endpoint that can:
+    1. Handle trip planning requests
+    2. Answer questions about destinations
+    3. Provide travel advice
+    4. Handle clarifications and follow-ups
+    5. Have natural conversations
+    
+    Authentication is REQUIRED.
+    """
+    try:
+        logger.info(
+            "[PLAN] request uid=%s prompt_chars=%d follow_up=%s",
+            current_user.uid, len(request.prompt), bool(request.previous_extraction or request.conversation_id)
+        )
+        
+        # Follow-ups may send just conversation_id; restore that turn's extraction
+        conversation_id = request.conversation_id or uuid.uuid4().hex
+        if request.previous_extraction is None and request.conversation_id:
+            request.previous_extraction = await load_conversation_state(current_user.uid, conversation_id)
+        
+        # ====================================================================
+        # STEP 0: DETERMINE INTENT (Trip Planning vs Conversation)
+        # ====================================================================
+        _report_progress("understanding")
+        # One structured call both classifies the message and, for the
+        # conversational intents, writes the reply - no second round-trip
+        intent_llm = get_intent_llm()
+        
+        intent_check_prompt = _INTENT_PROMPTS[bool(request.previous_extraction)].substitute(user_prompt=request.prompt)
+        
+        cache_key = None if request.previous_extraction else _conversation_cache_key(request.prompt)
+        conversation = conversation_cache.get(cache_key) if cache_key else None
+        speculative_extraction = None
+        if conversation is not None:
+            logger.debug("[PLAN] conversational reply served from cache")
+        elif (conversation := _fast_intent(request.prompt)) is not None:
+            logger.debug("[PLAN] intent matched without a model call")
+        elif request.previous_extraction or LIKELY_PLANNING_REGEX.search(request.prompt):
+            # Almost certainly TRIP_PLANNING: run Step 1 alongside the classifier
+            # instead of after it; the extraction is discarded if that guess was wrong
+            conversation, speculative_extraction = await asyncio.gather(
+                intent_llm.ainvoke(intent_check_prompt),
+                get_extractor_llm().ainvoke(_build_extraction_messages(request.prompt, request.previous_extraction)),
+                return_exceptions=True,
+            )
+            if isinstance(conversation, BaseException):
+                raise conversation
+        else:
+            conversation = await intent_llm.ainvoke(intent_check_prompt)
+        intent = conversation.intent
+        
+        logger.info("[PLAN] intent=%s", intent)
+        
+        # ====================================================================
+        # HANDLE CONVERSATIONAL PROMPTS (reply came with the classification)
+        # ====================================================================
+        if intent in CONVERSATIONAL_INTENTS:
+            reply = conversation.response_text.strip()
+            if not reply:
+                # The structured call occasionally classifies without writing
+                # the reply; ask for the text on its own
+                logger.warning("[PLAN] empty conversational reply from Step 0 intent=%s", intent)
+                reply = await _write_conversational_reply(intent, request.prompt)
+            # Only real replies are shared; a failed one would be served to
+            # everyone sending this prompt for the next 24h
+            if cache_key and reply:
+                conversation_cache[cache_key] = conversation.model_copy(update={"response_text": reply})
+            return TripResponse(
+                success=True,
+                message=CONVERSATIONAL_INTENTS[intent][0],
+                trip_plan=reply or CONVERSATIONAL_FALLBACK_REPLY,
+                trip_id=None,
+                extracted_details=None
+            )
+        
+        # ====================================================================
+        # HANDLE MODIFICATION REQUESTS (without complete trip details)
+        # ====================================================================
+        if intent == "MODIFICATION_REQUEST":
+            return TripResponse(
+                success=False,
+                message="Cannot modify plan without context",
+                trip_plan="""I understand you want to modify or upgrade your trip plan, but I need the complete trip details to help you properly.
+
+Since each message is independent, please provide the full details again with your modification request:
+
+**Please include:**
+• Origin city
+• Destination  
+• Number of days
+• Number of travelers
+• Total budget (including your request like "use full 80000 budget")
+• Interests/preferences
+
+**Example:** "7 day trip to Kerala from Mumbai for 2 people with 80000 budget - use the entire budget for luxury experience"
+
+This way I can create an upgraded plan that fully utilizes your budget! 💎""",
+                trip_id=None,
+                extracted_details=None
+            )
+        
+        # ====================================================================
+        # STEP 1: EXTRACT TRIP DETAILS (for TRIP_PLANNING intent)
+        # ====================================================================
+        logger.info("[PLAN] step 1: extracting trip details")
+        _report_progress("extracting")
+        
+        if request.previous_extraction:
+            logger.debug("[PLAN] previous extraction: %s", request.previous_extraction)
         
         try:
-            trip_details = extractor_llm.invoke(extraction_prompt)
-            print(f"✅ Extracted: {trip_details}")
-        except Exception as e:
+            if isinstance(speculative_extraction, BaseException):
+                raise speculative_extraction
+            trip_details = speculative_extraction or await get_extractor_llm().ainvoke(
+                _build_extraction_messages(request.prompt, request.previous_extraction)
+            )
+            logger.debug("[PLAN] extracted: %s", trip_details)
+        except Exception:
             # Log and return a friendly response to avoid 500 errors
-            import traceback
-            print(f"⚠️ Extraction LLM failed: {e}")
-            traceback.print_exc()
+            logger.exception("[PLAN] extraction failed uid=%s", current_user.uid)
             return TripResponse(
                 success=False,
                 message="Extraction failed",
@@ -2236,134 +2742,70 @@ Now extract from the user's message above. Fill in what you can infer, use sensi
         
         # Merge with previous extraction if available
         if request.previous_extraction:
-            print("🔄 Merging with previous extraction...")
-            print(f"   New extraction: {trip_details}")
-            
-            # Only update fields that are NOT "Not specified" or 0 in new extraction
-            if trip_details.origin_city.lower() in ["not specified", "unknown", "n/a", ""] and request.previous_extraction.get('origin_city'):
-                trip_details.origin_city = request.previous_extraction.get('origin_city')
-                print(f"  ✓ Kept origin_city: {trip_details.origin_city}")
-            else:
-                print(f"  ✓ Updated/kept origin_city: {trip_details.origin_city}")
-            
-            if trip_details.destination.lower() in ["not specified", "unknown", "n/a", ""] and request.previous_extraction.get('destination'):
-                trip_details.destination = request.previous_extraction.get('destination')
-                print(f"  ✓ Kept destination: {trip_details.destination}")
-            else:
-                print(f"  ✓ Updated/kept destination: {trip_details.destination}")
-            
-            if (not trip_details.num_days or trip_details.num_days <= 0) and request.previous_extraction.get('num_days'):
-                trip_details.num_days = request.previous_extraction.get('num_days')
-                print(f"  ✓ Kept num_days: {trip_details.num_days}")
-            else:
-                print(f"  ✓ Updated/kept num_days: {trip_details.num_days}")
+            logger.debug("[PLAN] merging with previous extraction")
             
-            if (not trip_details.num_people or trip_details.num_people <= 0) and request.previous_extraction.get('num_people'):
-                trip_details.num_people = request.previous_extraction.get('num_people')
-                print(f"  ✓ Kept num_people: {trip_details.num_people}")
-            else:
-                print(f"  ✓ Updated/kept num_people: {trip_details.num_people}")
+            # Only update fields the new extraction left missing (budget has
+            # its own update handling below)
+            for field in _MERGE_FIELDS:
+                value = getattr(trip_details, field)
+                if _is_missing(value) and request.previous_extraction.get(field):
+                    setattr(trip_details, field, request.previous_extraction.get(field))
+                    logger.debug("[PLAN] kept previous %s=%r", field, getattr(trip_details, field))
+                else:
+                    logger.debug("[PLAN] updated/kept %s=%r", field, value)
             
-            if (not trip_details.budget or trip_details.budget <= 0) and request.previous_extraction.get('budget'):
+            if _is_missing(trip_details.budget) and request.previous_extraction.get('budget'):
                 # OLD budget from previous extraction
                 old_budget = request.previous_extraction.get('budget')
                 trip_details.budget = old_budget
-                print(f"  ✓ Kept budget: {trip_details.budget}")
+                logger.debug("[PLAN] kept previous budget=%s", trip_details.budget)
             elif trip_details.budget and trip_details.budget > 0 and request.previous_extraction.get('budget'):
                 # NEW budget provided - this is a budget UPDATE scenario
                 old_budget = request.previous_extraction.get('budget')
                 new_budget = trip_details.budget
                 if new_budget > old_budget:
-                    print(f"  💰 BUDGET INCREASED: {old_budget} → {new_budget}")
-                    print(f"  🔄 Will re-check if new budget is sufficient for ORIGINAL destination")
+                    logger.info("[PLAN] budget increased %s -> %s, re-checking original destination", old_budget, new_budget)
                     
                     # Check if there's an original_destination stored (from insufficient budget scenario)
                     if request.previous_extraction.get('original_destination'):
                         original_dest = request.previous_extraction.get('original_destination')
-                        print(f"  🎯 RESTORING ORIGINAL DESTINATION: {original_dest}")
-                        print(f"     (Previous suggested alternative was: {trip_details.destination})")
+                        logger.info(
+                            "[PLAN] restoring original destination=%s (suggested alternative was %s)",
+                            original_dest, trip_details.destination
+                        )
                         trip_details.destination = original_dest
                     
                     # Budget increased - we'll use the new budget and re-validate
                 else:
-                    print(f"  💰 Budget changed: {old_budget} → {new_budget}")
-            else:
-                print(f"  ✓ Updated/kept budget: {trip_details.budget}")
-            
-            if not trip_details.interests and request.previous_extraction.get('interests'):
-                trip_details.interests = request.previous_extraction.get('interests')
-                print(f"  ✓ Kept interests: {trip_details.interests}")
-            else:
-                print(f"  ✓ Updated/kept interests: {trip_details.interests}")
-            
-            if not trip_details.start_date and request.previous_extraction.get('start_date'):
-                trip_details.start_date = request.previous_extraction.get('start_date')
-                print(f"  ✓ Kept start_date: {trip_details.start_date}")
+                    logger.debug("[PLAN] budget changed %s -> %s", old_budget, new_budget)
             else:
-                print(f"  ✓ Updated/kept start_date: {trip_details.start_date}")
+                logger.debug("[PLAN] updated/kept budget=%s", trip_details.budget)
             
-            print(f"🔄 After merge: {trip_details}")
+            logger.debug("[PLAN] after merge: %s", trip_details)
         
         # ====================================================================
         # VALIDATE REQUIRED FIELDS - BE CONVERSATIONAL!
         # ====================================================================
         missing_fields = []
         follow_up_questions = []
+        current_info = []
+        
+        # One pass collects both what's missing and what we already know
+        for field, missing_name, question, summary in _TRIP_FIELD_SPEC:
+            value = getattr(trip_details, field)
+            if not _is_missing(value):
+                current_info.append(summary.format(value))
+            elif question:
+                missing_fields.append(missing_name)
+                follow_up_questions.append(question)
+                logger.debug("[PLAN] missing %s (value=%r)", missing_name, value)
         
-        # Check origin
-        print(f"🔍 DEBUG: origin_city = '{trip_details.origin_city}'")
-        print(f"🔍 DEBUG: origin_city.lower() = '{trip_details.origin_city.lower() if trip_details.origin_city else 'None'}'")
-        print(f"🔍 DEBUG: Is in list? {trip_details.origin_city.lower() in ['not specified', 'unknown', 'n/a', '', 'anywhere'] if trip_details.origin_city else False}")
-        
-        if not trip_details.origin_city or trip_details.origin_city.lower() in ["not specified", "unknown", "n/a", "", "anywhere"]:
-            missing_fields.append("origin city")
-            follow_up_questions.append("**Where are you traveling from?** (e.g., Delhi, Mumbai, Bangalore)")
-            print("🔍 DEBUG: Added 'origin city' to missing_fields")
-        
-        # Check destination
-        if not trip_details.destination or trip_details.destination.lower() in ["not specified", "unknown", "n/a", "", "anywhere"]:
-            missing_fields.append("destination")
-            follow_up_questions.append("**Where would you like to go?** (e.g., Goa, Kashmir, Kerala)")
-            print("🔍 DEBUG: Added 'destination' to missing_fields")
-        
-        # Check number of days
-        if not trip_details.num_days or trip_details.num_days <= 0:
-            missing_fields.append("duration")
-            follow_up_questions.append("**How many days?** (e.g., weekend trip, 5 days, a week)")
-            print("🔍 DEBUG: Added 'duration' to missing_fields")
-        
-        # Check budget
-        if not trip_details.budget or trip_details.budget <= 0:
-            missing_fields.append("budget")
-            follow_up_questions.append("**What's your total budget?** (e.g., ₹50,000, budget-friendly, comfortable)")
-            print("🔍 DEBUG: Added 'budget' to missing_fields")
-        
-        # Check start date (optional but helpful)
-        if not trip_details.start_date:
-            missing_fields.append("start date")
-            follow_up_questions.append("**When do you want to start your trip?** (e.g., December 25, next week, 15/12/2025)")
-            print("🔍 DEBUG: Added 'start date' to missing_fields")
-        
-        print(f"🔍 DEBUG: Total missing_fields = {missing_fields}")
+        logger.debug("[PLAN] missing_fields=%s", missing_fields)
         
         # If any required fields are missing, respond conversationally
         if missing_fields:
-            print(f"🚨 VALIDATION FAILED: Returning 'Need more information' response")
+            logger.info("[PLAN] asking for missing fields: %s", missing_fields)
             # Create a friendly response
-            current_info = []
-            if trip_details.origin_city and trip_details.origin_city.lower() not in ["not specified", "unknown", "n/a"]:
-                current_info.append(f"✓ From: {trip_details.origin_city}")
-            if trip_details.destination and trip_details.destination.lower() not in ["not specified", "unknown", "n/a"]:
-                current_info.append(f"✓ To: {trip_details.destination}")
-            if trip_details.num_days and trip_details.num_days > 0:
-                current_info.append(f"✓ Duration: {trip_details.num_days} days")
-            if trip_details.num_people and trip_details.num_people > 0:
-                current_info.append(f"✓ Travelers: {trip_details.num_people} people")
-            if trip_details.budget and trip_details.budget > 0:
-                current_info.append(f"✓ Budget: ₹{trip_details.budget}")
-            if trip_details.start_date:
-                current_info.append(f"✓ Start Date: {trip_details.start_date}")
-            
             response_text = "Great! I'm getting a sense of your trip. Let me gather a few more details:\n\n"
             
             if current_info:
@@ -2372,53 +2814,45 @@ Now extract from the user's message above. Fill in what you can infer, use sensi
             response_text += "**I still need:**\n" + "\n".join(follow_up_questions)
             response_text += "\n\n💡 *You can answer all at once or one by one - whatever's easier for you!*"
             
+            extracted_details = trip_details.model_dump()
+            await save_conversation_state(current_user.uid, conversation_id, extracted_details)
             return TripResponse(
                 success=False,
                 message="Need more information",
                 trip_plan=response_text,
-                extracted_details=trip_details.model_dump()
+                extracted_details=extracted_details,
+                conversation_id=conversation_id
             )
         
         # ====================================================================
         # STEP 2: RESEARCH PHASE - Get Real-Time Data (CACHED + PARALLEL)
         # ====================================================================
-        print("\n🔬 STEP 2: Conducting destination research with real-time data...")
-        
-        # Check cache first
-        cached_research = get_cached_research(trip_details.destination)
+        logger.info("[PLAN] step 2: research destination=%s", trip_details.destination)
+        _report_progress("researching")
         
-        if cached_research:
-            research_data = cached_research
-        else:
-            # Import the weather tool
-            from agent_logic import get_realtime_weather
-            import asyncio
-            from concurrent.futures import ThreadPoolExecutor
-            
-            # Run research calls in parallel for faster response
-            def run_research_parallel():
-                with ThreadPoolExecutor(max_workers=4) as executor:
-                    future_budget = executor.submit(get_minimum_daily_budget.invoke, {"city": trip_details.destination})
-                    future_advisory = executor.submit(get_travel_advisory.invoke, {"city": trip_details.destination})
-                    future_weather = executor.submit(get_realtime_weather.invoke, {"city": trip_details.destination})
-                    future_docs = executor.submit(get_travel_document_info.invoke, {"destination": trip_details.destination})
-                    
-                    return {
-                        "minimum_budget": future_budget.result(),
-                        "travel_advisory": future_advisory.result(),
-                        "weather": future_weather.result(),
-                        "document_info": future_docs.result()
-                    }
-            
-            research_data = run_research_parallel()
-            cache_research(trip_details.destination, research_data)
-            print("✅ Research completed with real-time weather and alerts (parallel execution)")
+        # Cached, or one shared fan-out per destination across concurrent requests
+        research_data = await get_research(trip_details.destination)
         
         
         # ====================================================================
         # STEP 3: VALIDATE BUDGET & CLASSIFY TIER (Dynamic Feasibility Check)
         # ====================================================================
-        print("\n💰 STEP 3: Dynamic Feasibility Check - Validating budget sufficiency...")
+        logger.info("[PLAN] step 3: feasibility check destination=%s", trip_details.destination)
+        _report_progress("checking_budget")
+        
+        # The transport estimate (Step 3) and the profile read (Step 4) are
+        # independent network calls, so fetch them together up front
+        transport_result, profile_result = await asyncio.gather(
+            asyncio.to_thread(
+                cached_transport_cost,
+                origin=trip_details.origin_city,
+                destination=trip_details.destination,
+                num_people=trip_details.num_people
+            ),
+            run_in_firestore_pool(firestore_service.get_user_profile, user_id=current_user.uid)
+            if firestore_service.db is not None else asyncio.sleep(0, result=None),
+            return_exceptions=True,
+        )
         
         # Check if this is a budget update scenario
         budget_was_increased = False
@@ -2426,11 +2860,10 @@ Now extract from the user's message above. Fill in what you can infer, use sensi
             old_budget = request.previous_extraction.get('budget')
             if trip_details.budget > old_budget:
                 budget_was_increased = True
-                print(f"\n💰 BUDGET UPDATE DETECTED!")
-                print(f"   Old budget: ₹{old_budget}")
-                print(f"   New budget: ₹{trip_details.budget}")
-                print(f"   Increase: ₹{trip_details.budget - old_budget}")
-                print(f"   🎯 Re-validating for ORIGINAL destination: {trip_details.destination}")
+                logger.info(
+                    "[PLAN] budget increased old=%s new=%s destination=%s",
+                    old_budget, trip_details.budget, trip_details.destination
+                )
         
         # Extract minimum daily budget from research data using the enhanced tool output
         try:
@@ -2439,51 +2872,51 @@ Now extract from the user's message above. Fill in what you can infer, use sensi
             # The get_minimum_daily_budget tool now returns text with "EXTRACTED MINIMUM: ₹{amount}"
             budget_info = research_data.get('minimum_budget', '')
             if budget_info:
-                import re
                 # Look for the extracted minimum pattern
-                extracted_match = re.search(r'EXTRACTED MINIMUM:\s*₹\s*(\d+)', budget_info)
+                extracted_match = _EXTRACTED_MIN_RE.search(budget_info)
                 if extracted_match:
                     estimated_min_daily = int(extracted_match.group(1))
-                    print(f"✅ Extracted minimum daily budget from AI analysis: ₹{estimated_min_daily}")
+                    logger.debug("[PLAN] minimum daily budget from tool marker: %s", estimated_min_daily)
                 else:
-                    # Fallback: Try to parse any rupee amounts found
-                    rupee_matches = re.findall(r'[₹Rs\.]\s*(\d{1,5})', budget_info)
-                    dollar_matches = re.findall(r'\$\s*(\d{1,4})', budget_info)
-                    
-                    if rupee_matches:
-                        amounts = [int(m) for m in rupee_matches if 1000 <= int(m) <= 15000]
-                        if amounts:
-                            estimated_min_daily = min(amounts)  # Use minimum amount found
-                            print(f"📊 Extracted minimum daily budget from search results: ₹{estimated_min_daily}")
-                    elif dollar_matches:
-                        amounts = [int(m) * 83 for m in dollar_matches if 10 <= int(m) <= 200]
-                        if amounts:
-                            estimated_min_daily = min(amounts)
-                            print(f"📊 Extracted minimum daily budget: ₹{estimated_min_daily} (converted from USD)")
+                    # Fallback: use the smallest plausible rupee amount, else dollar amount
+                    rupee_min = min(
+                        (v for m in _RUPEE_RE.finditer(budget_info) if 1000 <= (v := int(m.group(1))) <= 15000),
+                        default=None
+                    )
+                    if rupee_min is not None:
+                        estimated_min_daily = rupee_min
+                        logger.debug("[PLAN] minimum daily budget from rupee amounts: %s", estimated_min_daily)
+                    else:
+                        dollar_min = min(
+                            (v * 83 for m in _DOLLAR_RE.finditer(budget_info) if 10 <= (v := int(m.group(1))) <= 200),
+                            default=None
+                        )
+                        if dollar_min is not None:
+                            estimated_min_daily = dollar_min
+                            logger.debug("[PLAN] minimum daily budget from USD amounts: %s", estimated_min_daily)
             
             if estimated_min_daily == 2500:
-                print(f"📊 Using default minimum daily budget: ₹{estimated_min_daily}")
+                logger.debug("[PLAN] using default minimum daily budget: %s", estimated_min_daily)
             
             # === ESTIMATE ROUND-TRIP TRANSPORTATION COST ===
             # This is crucial - budget check must include journey to/from destination!
-            from agent_logic import estimate_transport_cost
             try:
-                transport_cost_total = estimate_transport_cost(
-                    origin=trip_details.origin_city,
-                    destination=trip_details.destination,
-                    num_people=trip_details.num_people
+                if isinstance(transport_result, BaseException):
+                    raise transport_result
+                transport_cost_total = transport_result
+                logger.debug(
+                    "[PLAN] transport estimate %s<->%s: %s",
+                    trip_details.origin_city, trip_details.destination, transport_cost_total
                 )
-                print(f"✈️ Estimated round-trip transport cost ({trip_details.origin_city} ↔️ {trip_details.destination}): ₹{transport_cost_total}")
             except Exception as e:
                 # Fallback estimate based on distance categories
-                print(f"⚠️ Could not estimate exact transport cost: {e}")
-                print(f"   Using category-based estimate...")
+                logger.warning("[PLAN] transport estimate failed, using category fallback: %s", e)
                 transport_cost_total = estimate_transport_fallback(
                     trip_details.origin_city, 
                     trip_details.destination,
                     trip_details.num_people
                 )
-                print(f"✈️ Estimated round-trip transport cost (fallback): ₹{transport_cost_total}")
+                logger.debug("[PLAN] transport estimate (fallback): %s", transport_cost_total)
             
             # === CRITICAL: Pure Python Calculation (No AI) ===
             # Calculate user's daily per person budget
@@ -2497,23 +2930,13 @@ Now extract from the user's message above. Fill in what you can infer, use sensi
             is_budget_sufficient = trip_details.budget >= estimated_min_total
             shortfall = estimated_min_total - trip_details.budget if not is_budget_sufficient else 0
             
-            print(f"\n📊 Dynamic Feasibility Check Results:")
-            print(f"   🔍 Researched minimum (per person/day): ₹{estimated_min_daily}")
-            print(f"   ✈️ Round-trip transport cost: ₹{transport_cost_total}")
-            print(f"   👤 User's budget (per person/day): ₹{user_daily_per_person:.0f}")
-            print(f"   📅 Trip duration: {trip_details.num_days} days")
-            print(f"   👥 Number of travelers: {trip_details.num_people}")
-            print(f"   💵 Total user budget: ₹{trip_details.budget}")
-            print(f"   📊 Minimum required (daily + transport + 20% buffer): ₹{estimated_min_total:.0f}")
-            print(f"   ✅ Budget sufficient: {is_budget_sufficient}")
-            
-            if not is_budget_sufficient:
-                print(f"   ⚠️ Shortfall: ₹{shortfall:.0f}")
-                print(f"   💡 User needs ₹{user_daily_per_person:.0f}/person/day but minimum is ₹{estimated_min_daily}")
-            else:
-                surplus = trip_details.budget - estimated_min_total
-                print(f"   ✅ Surplus: ₹{surplus:.0f}")
-                print(f"   💰 User has ₹{user_daily_per_person:.0f}/person/day vs minimum ₹{estimated_min_daily}")
+            logger.debug(
+                "[PLAN] feasibility min_daily=%s transport=%s user_daily=%.0f days=%s people=%s "
+                "budget=%s min_total=%.0f sufficient=%s shortfall=%.0f",
+                estimated_min_daily, transport_cost_total, user_daily_per_person,
+                trip_details.num_days, trip_details.num_people, trip_details.budget,
+                estimated_min_total, is_budget_sufficient, shortfall
+            )
             
             # Determine budget tier based on how much above minimum the user is
             daily_per_person = user_daily_per_person
@@ -2529,14 +2952,14 @@ Now extract from the user's message above. Fill in what you can infer, use sensi
                 budget_tier = "luxury"
                 tier_description = "Premium experience - 4-5 star hotels, fine dining, private transport"
             
-            print(f"\n� Budget Tier Classification:")
-            print(f"   Tier: {budget_tier.upper()}")
-            print(f"   Description: {tier_description}")
-            print(f"   Ratio to minimum: {daily_per_person / estimated_min_daily:.1f}x")
+            logger.debug(
+                "[PLAN] budget tier=%s ratio_to_minimum=%.1f",
+                budget_tier, daily_per_person / estimated_min_daily
+            )
 
             
         except Exception as e:
-            print(f"⚠️ Budget validation error: {e}, proceeding with standard plan")
+            logger.warning("[PLAN] budget validation failed, proceeding with standard plan: %s", e)
             is_budget_sufficient = True
             shortfall = 0
             budget_tier = "moderate"
@@ -2545,34 +2968,29 @@ Now extract from the user's message above. Fill in what you can infer, use sensi
         # ====================================================================
         # STEP 4: ASSIGN MISSION
         # ====================================================================
-        print("\n📋 STEP 4: Assigning mission to planning agent...")
+        logger.info("[PLAN] step 4: building planning prompt")
         
         # Fetch user preferences for personalization
         user_preferences = None
         try:
             if firestore_service.db is not None:
-                profile = firestore_service.get_user_profile(user_id=current_user.uid)
+                if isinstance(profile_result, BaseException):
+                    raise profile_result
+                profile = profile_result
                 if profile and (profile.get("preferences") or profile.get("learned_preferences")):
                     user_preferences = profile
-                    print(f"✅ Loaded user preferences for personalization")
-                    if profile.get("preferences"):
-                        prefs = profile["preferences"]
-                        if prefs.get("interests"):
-                            print(f"   - Interests: {', '.join(prefs['interests'])}")
-                        if prefs.get("travel_style"):
-                            print(f"   - Style: {', '.join(prefs['travel_style'])}")
-                    if profile.get("learned_preferences"):
-                        learned = profile["learned_preferences"]
-                        if learned.get("spending_pattern"):
-                            print(f"   - Learned Pattern: {learned['spending_pattern']}")
+                    logger.debug(
+                        "[PLAN] loaded preferences uid=%s preferences=%s learned=%s",
+                        current_user.uid, profile.get("preferences"), profile.get("learned_preferences")
+                    )
             else:
-                print("⚠️  Firestore not available - skipping preference loading")
+                logger.warning("[PLAN] Firestore not available, skipping preference loading")
         except Exception as e:
-            print(f"⚠️ Could not load preferences (will use defaults): {str(e)}")
+            logger.warning("[PLAN] could not load preferences (using defaults): %s", e)
         
         if is_budget_sufficient:
-            print(f"✅ Budget is sufficient - Using STANDARD planning prompt ({budget_tier.upper()} tier)")
-            master_prompt = create_standard_planning_prompt(
+            logger.info("[PLAN] budget sufficient, standard prompt tier=%s", budget_tier)
+            planning_messages = create_standard_planning_prompt(
                 trip_details, 
                 research_data, 
                 budget_tier, 
@@ -2580,57 +2998,59 @@ Now extract from the user's message above. Fill in what you can infer, use sensi
                 user_preferences
             )
         else:
-            print(f"⚠️ Budget insufficient by ₹{shortfall} - Using RE-PLANNING prompt")
-            master_prompt = create_replanning_prompt(trip_details, research_data, shortfall)
+            logger.info("[PLAN] budget short by %.0f, re-planning prompt", shortfall)
+            planning_messages = [("user", create_replanning_prompt(trip_details, research_data, shortfall))]
+        
+        # Identical re-planning prompts reuse the agent's earlier answer
+        final_plan = None
+        replan_key = None
+        if not is_budget_sufficient:
+            replan_key = hashlib.blake2b(planning_messages[0][1].encode("utf-8"), digest_size=16).digest()
+            final_plan = replan_response_cache.get(replan_key)
+            if final_plan is not None:
+                logger.debug("[PLAN] re-planning response served from cache")
         
         # ====================================================================
         # STEP 5: EXECUTE WITH REACT AGENT (OPTIMIZED)
         # ====================================================================
-        print("\n🤖 STEP 5: Executing planning with ReAct agent (optimized)...")
-        
-        # Create ReAct agent with planning tools - OPTIMIZED FOR SPEED
-        llm = ChatGoogleGenerativeAI(
-            model="models/gemini-2.0-flash-exp",  # Faster model
-            temperature=0.9,  # Higher creativity for engaging responses
-            google_api_key=os.getenv("GOOGLE_API_KEY"),
-            max_output_tokens=8192,  # Increased for comprehensive detailed plans
-            timeout=90  # Increased timeout for thorough planning
-        )
-        
-        # Create LangGraph React agent (without state_modifier - not supported in newer versions)
-        agent_executor = create_react_agent(
-            llm,
-            PLANNING_TOOLS
-        )
-        
-        # Execute agent with master prompt and recursion limit
-        print("⚡ Generating plan (fast mode)...")
-        result = agent_executor.invoke(
-            {"messages": [("user", master_prompt)]},
-            {"recursion_limit": 20}  # Increased for thorough research and planning
-        )
-        
-        # Extract the final message content
-        if result.get("messages"):
-            last_message = result["messages"][-1]
-            # Handle different content formats
-            if isinstance(last_message.content, str):
-                final_plan = last_message.content
-            elif isinstance(last_message.content, list):
-                # Extract text from content blocks
-                text_parts = []
-                for block in last_message.content:
-                    if isinstance(block, dict) and block.get('type') == 'text':
-                        text_parts.append(block.get('text', ''))
-                    elif isinstance(block, str):
-                        text_parts.append(block)
-                final_plan = '\n'.join(text_parts)
+        if final_plan is None:
+            logger.info("[PLAN] step 5: running planning agent")
+            _report_progress("building_itinerary")
+            
+            # ReAct agent with planning tools, built once per process
+            agent_executor = get_planning_agent()
+            
+            # Execute agent with master prompt and recursion limit
+            async with planner_slots:
+                result = await agent_executor.ainvoke(
+                    {"messages": planning_messages},
+                    {"recursion_limit": 20}  # Increased for thorough research and planning
+                )
+            
+            # Extract the final message content
+            if result.get("messages"):
+                last_message = result["messages"][-1]
+                # Handle different content formats
+                if isinstance(last_message.content, str):
+                    final_plan = last_message.content
+                elif isinstance(last_message.content, list):
+                    # Extract text from content blocks
+                    text_parts = []
+                    for block in last_message.content:
+                        if isinstance(block, dict) and block.get('type') == 'text':
+                            text_parts.append(block.get('text', ''))
+                        elif isinstance(block, str):
+                            text_parts.append(block)
+                    final_plan = '\n'.join(text_parts)
+                else:
+                    final_plan = str(last_message.content)
+                
+                if replan_key is not None and final_plan:
+                    replan_response_cache[replan_key] = final_plan
             else:
-                final_plan = str(last_message.content)
-        else:
-            final_plan = "Unable to generate plan"
+                final_plan = "Unable to generate plan"
         
-        print("\n✅ Planning completed successfully!")
+        logger.info("[PLAN] planning completed uid=%s", current_user.uid)
         
         # ====================================================================
         # SAVE TO FIRESTORE (user is authenticated)
@@ -2638,17 +3058,18 @@ Now extract from the user's message above. Fill in what you can infer, use sensi
         trip_id = None
         try:
             if firestore_service.db is None:
-                print("⚠️  Firestore not available - skipping trip save")
-                print("   Please configure firebase-credentials.json to enable trip saving")
+                logger.warning("[PLAN] Firestore not available, skipping trip save")
             else:
-                print(f"\n💾 Saving trip plan to Firestore for user: {current_user.email}")
-                
-                # Calculate trip dates
-                from datetime import datetime, timedelta
-                if trip_details.start_date:
+                # Calculate trip dates (unparseable or missing start → today).
+                # Placeholders like "Not specified" are branched around rather
+                # than left to raise inside fromisoformat.
+                requested_start = trip_details.start_date
+                if isinstance(requested_start, datetime):
+                    start_date = requested_start
+                elif isinstance(requested_start, str) and not _is_missing(requested_start):
                     try:
-                        start_date = datetime.fromisoformat(trip_details.start_date) if isinstance(trip_details.start_date, str) else trip_details.start_date
-                    except:
+                        start_date = datetime.fromisoformat(requested_start)
+                    except ValueError:
                         start_date = datetime.now()
                 else:
                     start_date = datetime.now()
@@ -2658,7 +3079,7 @@ Now extract from the user's message above. Fill in what you can infer, use sensi
                 # Extract budget breakdown from the trip plan
                 budget_breakdown = extract_budget_breakdown(final_plan, trip_details.budget)
                 
-                trip_id = firestore_service.save_trip_plan(
+                trip_id = await run_in_firestore_pool(firestore_service.save_trip_plan,
                     user_id=current_user.uid,
                     trip_data={
                         "title": f"{trip_details.num_days}-Day Trip to {trip_details.destination}",
@@ -2674,38 +3095,88 @@ Now extract from the user's message above. Fill in what you can infer, use sensi
                         "budget_breakdown": budget_breakdown
                     }
                 )
-                print(f"✅ Trip saved with ID: {trip_id}")
-                print(f"   Budget: ₹{trip_details.budget}, Duration: {trip_details.num_days} days")
-                print(f"   Dates: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
-                print(f"   Budget Breakdown: {budget_breakdown}")
+                logger.info("[PLAN] trip saved trip_id=%s uid=%s", trip_id, current_user.uid)
+                logger.debug(
+                    "[PLAN] saved budget=%s days=%s dates=%s..%s breakdown=%s",
+                    trip_details.budget, trip_details.num_days,
+                    start_date.date(), end_date.date(), budget_breakdown
+                )
         except Exception as e:
-            print(f"⚠️ Failed to save trip to Firestore: {e}")
+            logger.warning("[PLAN] failed to save trip uid=%s: %s", current_user.uid, e)
             # Don't fail the request if saving fails
         
         # ====================================================================
         # RETURN RESPONSE
         # ====================================================================
+        extracted_details = {
+            **trip_details.model_dump(),
+            # Store original destination if budget was insufficient
+            'original_destination': trip_details.destination if not is_budget_sufficient else None,
+            'was_budget_insufficient': not is_budget_sufficient
+        }
+        await save_conversation_state(current_user.uid, conversation_id, extracted_details)
         return TripResponse(
             success=True,
             message="Trip plan generated successfully and saved!",
             trip_plan=final_plan,
             trip_id=trip_id,
-            extracted_details={
-                **trip_details.model_dump(),
-                # Store original destination if budget was insufficient
-                'original_destination': trip_details.destination if not is_budget_sufficient else None,
-                'was_budget_insufficient': not is_budget_sufficient
-            },
-            research_data=research_data
+            extracted_details=extracted_details,
+            research_data=research_data,
+            conversation_id=conversation_id
         )
         
     except Exception as e:
-        print(f"\n❌ Error in orchestrator: {str(e)}")
-        import traceback
-        print(f"❌ Full traceback:\n{traceback.format_exc()}")
+        logger.exception("[PLAN] orchestrator failed uid=%s", current_user.uid)
         raise HTTPException(status_code=500, detail=f"Planning failed: {str(e)}")
 
 
+@app.post("/api/plan-trip-from-prompt/stream")
+async def plan_trip_from_prompt_stream(
+    request: TripRequest,
+    current_user: FirebaseUser = Depends(get_current_user)
+):
+    """
+    Server-sent-events variant of /api/plan-trip-from-prompt.
+
+    Emits a `status` event as each planning step starts, then one `result`
+    event with the same TripResponse body (or an `error` event with the detail).
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def run_plan():
+        # Runs in its own task, so the progress sink stays local to this request
+        _plan_progress.set(queue)
+        return await plan_trip_from_prompt(request, current_user)
+
+    async def events():
+        task = asyncio.create_task(run_plan())
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                yield _sse_event("status", {"stage": getter.result()})
+            while not queue.empty():
+                yield _sse_event("status", {"stage": queue.get_nowait()})
+            try:
+                response = task.result()
+            except HTTPException as e:
+                yield _sse_event("error", {"detail": e.detail})
+                return
+            yield _sse_event("result", response.model_dump())
+        finally:
+            # Client went away mid-plan: stop the agent run
+            task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ============================================================================
 # FIREBASE-PROTECTED ENDPOINTS (Require Authentication)
 # ============================================================================
@@ -2724,7 +3195,7 @@ async def create_trip_plan(
         
         if trip_id:
             # Update existing trip
-            success = firestore_service.update_trip_plan(
+            success = await run_in_firestore_pool(firestore_service.update_trip_plan,
                 trip_id=trip_id,
                 user_id=current_user.uid,
                 updates={
@@ -2738,7 +3209,7 @@ async def create_trip_plan(
             return {"success": True, "trip_id": trip_id}
         else:
             # Create new trip
-            trip_id = firestore_service.save_trip_plan(
+            trip_id = await run_in_firestore_pool(firestore_service.save_trip_plan,
                 user_id=current_user.uid,
                 trip_data={
                     "title": trip_data.get('destination', 'Trip Plan'),
@@ -2763,7 +3234,7 @@ async def get_user_trip_plans(
     Get all saved trip plans for the authenticated user.
     """
     try:
-        trips = firestore_service.get_user_trip_plans(
+        trips = await run_in_firestore_pool(firestore_service.get_user_trip_plans,
             user_id=current_user.uid,
             limit=limit
         )
@@ -2820,7 +3291,7 @@ async def get_trip_plan(
     Get a specific trip plan by ID.
     """
     try:
-        trip = firestore_service.get_trip_plan_by_id(
+        trip = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id,
             trip_id=trip_id,
             user_id=current_user.uid
         )
@@ -2848,7 +3319,7 @@ async def delete_trip_plan(
     Delete a specific trip plan.
     """
     try:
-        success = firestore_service.delete_trip_plan(
+        success = await run_in_firestore_pool(firestore_service.delete_trip_plan,
             trip_id=trip_id,
             user_id=current_user.uid
         )
@@ -2881,7 +3352,7 @@ async def update_trip_status(
                 detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
             )
         
-        success = firestore_service.update_trip_status(
+        success = await run_in_firestore_pool(firestore_service.update_trip_status,
             trip_id=trip_id,
             user_id=current_user.uid,
             status=status
@@ -2915,7 +3386,7 @@ async def replan_trip(
         print(f"Feedback: {user_feedback}")
         
         # Get original trip
-        original_trip = firestore_service.get_trip_plan_by_id(trip_id, current_user.uid)
+        original_trip = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, trip_id, current_user.uid)
         if not original_trip:
             raise HTTPException(status_code=404, detail="Trip not found")
         
@@ -2929,7 +3400,7 @@ async def replan_trip(
         start_date = original_trip.get('start_date', '')
         
         # Initialize LLM
-        llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp", api_key=google_api_key)
+        llm = _chat_model(model="gemini-2.0-flash-exp", api_key=google_api_key)
         
         # STEP 1: Intelligently interpret the user's feedback
         print("🧠 Analyzing user feedback...")
@@ -2992,7 +3463,7 @@ RECOMMENDATION: [What should be done - proceed, suggest budget increase, or alte
         needs_budget_increase = "FEASIBLE: NO" in budget_analysis.upper() or "FEASIBLE:NO" in budget_analysis.upper()
         
         # Create replanning-specific agent with enhanced understanding
-        agent = create_react_agent(
+        agent = _react_agent(
             llm,
             tools=RESEARCH_TOOLS + PLANNING_TOOLS,
             state_modifier=f"""You are Anya, an expert AI travel planner from Voyage.
@@ -3500,7 +3971,7 @@ IMPORTANT: Make SUBSTANTIAL changes that directly address "{user_feedback}". Don
         print("✅ Replanning complete!")
         
         # Update the trip in database
-        firestore_service.update_trip_plan(
+        await run_in_firestore_pool(firestore_service.update_trip_plan,
             trip_id=trip_id,
             user_id=current_user.uid,
             updates={
@@ -3536,7 +4007,7 @@ async def save_destination(
     Save a destination to user's favorites.
     """
     try:
-        dest_id = firestore_service.save_destination(
+        dest_id = await run_in_firestore_pool(firestore_service.save_destination,
             user_id=current_user.uid,
             destination_name=request.destination_name,
             notes=request.notes
@@ -3554,7 +4025,7 @@ async def get_saved_destinations(
     Get all saved destinations for the authenticated user.
     """
     try:
-        destinations = firestore_service.get_user_saved_destinations(
+        destinations = await run_in_firestore_pool(firestore_service.get_user_saved_destinations,
             user_id=current_user.uid
         )
         return destinations
@@ -3584,7 +4055,6 @@ async def optimize_day(
     try:
         from datetime import datetime
         import pytz
-        from agent_logic import OPTIMIZATION_TOOLS
         
         print(f"\n🔄 OPTIMIZE DAY REQUEST from user {current_user.uid}")
         print(f"📍 Location: ({request.current_latitude}, {request.current_longitude})")
@@ -3592,7 +4062,7 @@ async def optimize_day(
         # ====================================================================
         # STEP 1: GET TRIP DETAILS
         # ====================================================================
-        trip = firestore_service.get_trip_plan_by_id(request.trip_id, current_user.uid)
+        trip = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, request.trip_id, current_user.uid)
         if not trip:
             raise HTTPException(status_code=404, detail="Trip not found")
         
@@ -3631,7 +4101,7 @@ async def optimize_day(
         # ====================================================================
         # STEP 4: GET USER PREFERENCES
         # ====================================================================
-        user_profile = firestore_service.get_user_profile(user_id=current_user.uid)
+        user_profile = await run_in_firestore_pool(firestore_service.get_user_profile, user_id=current_user.uid)
         # Handle case where user_profile might be None
         if user_profile and user_profile.get('preferences'):
             profile_interests = user_profile.get('preferences', {}).get('interests', '')
@@ -3717,14 +4187,8 @@ Make this plan IMMEDIATELY USABLE - the user should be able to start following i
         # ====================================================================
         # STEP 6: CREATE AI AGENT FOR OPTIMIZATION
         # ====================================================================
-        model = ChatGoogleGenerativeAI(
-            model="models/gemini-2.0-flash-exp",
-            temperature=0.7,
-            google_api_key=os.getenv("GOOGLE_API_KEY")
-        )
-        
-        # Create agent with optimization tools (returns executable agent)
-        agent_executor = create_react_agent(model, OPTIMIZATION_TOOLS)
+        # Agent with optimization tools, built once per process
+        agent_executor = get_optimization_agent()
         
         # Execute agent
         result = agent_executor.invoke({"messages": [("user", optimization_prompt)]})
@@ -3788,7 +4252,7 @@ async def check_optimization_needed(
         user_id = current_user.uid
         
         # Get trip
-        trip = firestore_service.get_trip_plan_by_id(trip_id, user_id)
+        trip = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, trip_id, user_id)
         if not trip or trip.get('user_id') != user_id:
             return {"should_optimize": False, "reason": "Trip not found"}
         
@@ -3864,7 +4328,7 @@ async def get_safety_alerts(
         user_id = current_user.uid
         
         # Get all user's trips
-        all_trips = firestore_service.get_user_trip_plans(user_id=user_id)
+        all_trips = await run_in_firestore_pool(firestore_service.get_user_trip_plans, user_id=user_id)
         
         # Get alerts for each trip
         all_alerts = []
@@ -4018,7 +4482,7 @@ async def get_profile(
     Get user profile information.
     """
     try:
-        profile = firestore_service.get_user_profile(user_id=current_user.uid)
+        profile = await run_in_firestore_pool(firestore_service.get_user_profile, user_id=current_user.uid)
         
         if not profile:
             # Return minimal info indicating no profile exists
@@ -4047,7 +4511,7 @@ async def get_profile_status(
     Check user profile status (phone verification, profile completion, etc.)
     """
     try:
-        profile = firestore_service.get_user_profile(user_id=current_user.uid)
+        profile = await run_in_firestore_pool(firestore_service.get_user_profile, user_id=current_user.uid)
         
         # Check phone verification
         has_phone = False
@@ -4086,7 +4550,7 @@ async def update_profile(
     Update user profile information.
     """
     try:
-        success = firestore_service.create_or_update_user_profile(
+        success = await run_in_firestore_pool(firestore_service.create_or_update_user_profile,
             user_id=current_user.uid,
             profile_data=profile.model_dump()
         )
@@ -4117,8 +4581,8 @@ async def send_otp(
     try:
         otp_service = get_otp_service()
         
-        # Generate and send OTP
-        success, message = otp_service.send_otp(request.phone_number)
+        # Generate and send OTP (blocking HTTP call with retry backoff)
+        success, message = await asyncio.to_thread(otp_service.send_otp, request.phone_number)
         
         if not success:
             raise HTTPException(status_code=400, detail=message)
@@ -4159,7 +4623,7 @@ async def verify_otp(
             raise HTTPException(status_code=400, detail=message)
         
         # Update user profile with verified phone number
-        profile = firestore_service.get_user_profile(user_id=current_user.uid)
+        profile = await run_in_firestore_pool(firestore_service.get_user_profile, user_id=current_user.uid)
         
         if not profile:
             profile = {
@@ -4172,7 +4636,7 @@ async def verify_otp(
         profile["phone_verified"] = True
         profile["phone_verified_at"] = datetime.utcnow().isoformat()
         
-        firestore_service.create_or_update_user_profile(
+        await run_in_firestore_pool(firestore_service.create_or_update_user_profile,
             user_id=current_user.uid,
             profile_data=profile
         )
@@ -4203,7 +4667,7 @@ async def update_preferences(
     """
     try:
         # Get existing profile
-        profile = firestore_service.get_user_profile(user_id=current_user.uid)
+        profile = await run_in_firestore_pool(firestore_service.get_user_profile, user_id=current_user.uid)
         
         if not profile:
             profile = {
@@ -4224,7 +4688,7 @@ async def update_preferences(
         profile["profile_completeness"] = int((filled_fields / total_fields) * 100)
         
         # Save to Firestore
-        success = firestore_service.create_or_update_user_profile(
+        success = await run_in_firestore_pool(firestore_service.create_or_update_user_profile,
             user_id=current_user.uid,
             profile_data=profile
         )
@@ -4262,7 +4726,7 @@ async def learn_preferences(
         user_id = current_user.uid
         
         # Fetch all user trips
-        all_trips = firestore_service.get_user_trips(user_id=user_id)
+        all_trips = await run_in_firestore_pool(firestore_service.get_user_trips, user_id=user_id)
         
         if not all_trips or len(all_trips) < 2:
             return {
@@ -4323,7 +4787,7 @@ async def learn_preferences(
         }
         
         # Update profile with learned preferences
-        profile = firestore_service.get_user_profile(user_id=user_id)
+        profile = await run_in_firestore_pool(firestore_service.get_user_profile, user_id=user_id)
         if not profile:
             profile = {
                 "email": current_user.email,
@@ -4333,7 +4797,7 @@ async def learn_preferences(
         
         profile["learned_preferences"] = learned_prefs
         
-        success = firestore_service.create_or_update_user_profile(
+        success = await run_in_firestore_pool(firestore_service.create_or_update_user_profile,
             user_id=user_id,
             profile_data=profile
         )
@@ -4628,15 +5092,8 @@ Your task is to provide a comprehensive, data-driven comparison to help them dec
 6. Format output in clean Markdown with emojis as shown above
 """
 
-        # Use Gemini with research tools to generate comparison
-        llm = ChatGoogleGenerativeAI(
-            model="models/gemini-2.5-flash",
-            temperature=0.7,
-            google_api_key=os.getenv("GOOGLE_API_KEY")
-        )
-        
-        # Create agent for comparison
-        comparison_agent = create_react_agent(llm, RESEARCH_TOOLS)
+        # Use Gemini with research tools to generate comparison (agent built once per process)
+        comparison_agent = get_comparison_agent()
         
         # Run comparison
         print(f"\n{'='*60}")
@@ -4700,8 +5157,8 @@ async def get_for_you_suggestions(
         print(f"{'='*60}")
         
         # Get user's data
-        user_prefs = firestore_service.get_user_profile(user_id=user_id)
-        all_trips = firestore_service.get_user_trip_plans(user_id=user_id)
+        user_prefs = await run_in_firestore_pool(firestore_service.get_user_profile, user_id=user_id)
+        all_trips = await run_in_firestore_pool(firestore_service.get_user_trip_plans, user_id=user_id)
         
         # Get learned preferences from trip history
         learned_prefs = {}
@@ -4904,7 +5361,7 @@ JSON format (ONLY valid JSON, no markdown):
 Return ONLY the JSON array, no other text.
 """
             
-            llm = ChatGoogleGenerativeAI(
+            llm = _chat_model(
                 model="gemini-2.0-flash-exp",
                 temperature=0.9,  # Higher temperature for more variation
                 google_api_key=os.getenv("GOOGLE_API_KEY")
@@ -4915,7 +5372,6 @@ Return ONLY the JSON array, no other text.
             response = llm.invoke(suggestion_prompt)
             suggestions_text = response.content.strip()
             
-            import json
             import re
             
             # Clean up markdown formatting
@@ -4925,7 +5381,7 @@ Return ONLY the JSON array, no other text.
                 suggestions_text = suggestions_text.split("```")[1].split("```")[0].strip()
             
             # Parse JSON
-            suggestions_data = json.loads(suggestions_text)
+            suggestions_data = orjson.loads(suggestions_text)
             suggestions = suggestions_data[:4]
             
             # Validate and fix unrealistic budgets
@@ -5080,29 +5536,26 @@ Return ONLY the JSON array, no other text.
 # ============================================================================
 
 @app.get("/api/trending", response_model=TrendingSuggestionsResponse)
-async def get_trending_suggestions():
+async def get_trending_suggestions(request: Request):
     """
     Get trending destinations and upcoming events for all users.
     """
     try:
         # Fast-safe fallback implementation for trending suggestions to avoid heavy LLM calls
-        cached = trending_cache.get_cache()
-        if cached:
-            print("📦 Returning cached trending data")
-            return cached
-
-        now = datetime.now()
-        response_data = TrendingSuggestionsResponse(
-            success=True,
-            message="Trending suggestions (fallback)",
-            trending_destinations=[],
-            upcoming_events=[],
-            cache_timestamp=now,
-            valid_until=now + timedelta(hours=trending_cache.cache_duration_hours)
-        )
+        async def build_trending_response():
+            now = datetime.now()
+            return TrendingSuggestionsResponse(
+                success=True,
+                message="Trending suggestions (fallback)",
+                trending_destinations=[],
+                upcoming_events=[],
+                cache_timestamp=now,
+                valid_until=now + timedelta(hours=trending_cache.cache_duration_hours)
+            )
 
-        trending_cache.set_cache(response_data)
-        return response_data
+        trending = await trending_cache.get_or_refresh(build_trending_response)
+        # Public data: shared caches may store it, but must revalidate via ETag
+        return _conditional_json_response(request, trending, cache_control="public, no-cache")
     except Exception as e:
         print(f"❌ Trending generation error (fallback): {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -5112,9 +5565,7 @@ async def get_trending_suggestions():
 @app.post("/api/trending/clear-cache")
 async def clear_trending_cache():
     """Clear the trending suggestions cache to force regeneration"""
-    global trending_cache
-    trending_cache.cached_data = None
-    trending_cache.cache_timestamp = None
+    trending_cache.clear()
     return {
         "success": True,
         "message": "Trending cache cleared. Next request will generate fresh data."
@@ -5619,6 +6070,14 @@ async def health():
         "openai_configured": bool(os.getenv("OPENAI_API_KEY")),
         "tavily_configured": bool(os.getenv("TAVILY_API_KEY")),
         "firebase_configured": firebase_status,
+        "planner_prompt_cache": {
+            **planner_prompt_cache_stats,
+            "size": len(planning_prompt_cache),
+        },
+        "replan_prompt_cache": _render_replanning_prompt.cache_info()._asdict(),
+        "replan_response_cache": {"size": len(replan_response_cache)},
+        "conversation_cache": {"size": len(conversation_cache)},
+        "transport_cost_cache": {"size": len(transport_cost_cache)},
         "endpoints": {
             "public": ["/", "/health", "/api/plan-trip-from-prompt"],
             "protected": [
@@ -5651,7 +6110,7 @@ async def create_review(
         print(f"   User: {current_user.email}")
         
         # Verify the trip belongs to the user
-        trip = firestore_service.get_trip_plan(review_request.trip_id, current_user.uid)
+        trip = await run_in_firestore_pool(firestore_service.get_trip_plan, review_request.trip_id, current_user.uid)
         if not trip:
             raise HTTPException(
                 status_code=404,
@@ -5692,7 +6151,7 @@ async def create_review(
         )
         
         # Save to Firestore
-        firestore_service.save_review(verified_review)
+        await run_in_firestore_pool(firestore_service.save_review, verified_review)
         
         print(f"✅ Review created: {review_id}")
         print(f"   Overall Rating: {review_request.ratings.overall}/5")
@@ -5703,7 +6162,7 @@ async def create_review(
             taste_graph_builder = get_taste_graph_builder()
             
             # Get existing taste graph
-            existing_graph = firestore_service.get_taste_graph(current_user.uid)
+            existing_graph = await run_in_firestore_pool(firestore_service.get_taste_graph, current_user.uid)
             
             if existing_graph:
                 # Incremental update
@@ -5713,18 +6172,18 @@ async def create_review(
                 )
             else:
                 # Build from scratch (this review + any others)
-                all_reviews = firestore_service.get_user_reviews(current_user.uid)
+                all_reviews = await run_in_firestore_pool(firestore_service.get_user_reviews, current_user.uid)
                 updated_graph = taste_graph_builder.build_taste_graph(
                     current_user.uid,
                     all_reviews
                 )
             
             # Save updated taste graph
-            firestore_service.save_taste_graph(updated_graph)
+            await run_in_firestore_pool(firestore_service.save_taste_graph, updated_graph)
             
             # Mark review as processed
             verified_review.taste_graph_updated = True
-            firestore_service.update_review(review_id, {"taste_graph_updated": True})
+            await run_in_firestore_pool(firestore_service.update_review, review_id, {"taste_graph_updated": True})
             
             print(f"✅ Taste graph updated for user {current_user.email}")
             
@@ -5753,7 +6212,7 @@ async def get_user_reviews(
     try:
         print(f"\n📚 Fetching reviews for user: {current_user.email}")
         
-        reviews = firestore_service.get_user_reviews(current_user.uid)
+        reviews = await run_in_firestore_pool(firestore_service.get_user_reviews, current_user.uid)
         
         # Create summaries
         summaries = []
@@ -5761,7 +6220,7 @@ async def get_user_reviews(
         
         for review in reviews:
             # Get trip details for destination
-            trip = firestore_service.get_trip_plan(review.trip_id, current_user.uid)
+            trip = await run_in_firestore_pool(firestore_service.get_trip_plan, review.trip_id, current_user.uid)
             destination = trip.destination if trip else "Unknown"
             
             summary = ReviewSummary(
@@ -5803,7 +6262,7 @@ async def get_review(
     Get a specific review by ID
     """
     try:
-        review = firestore_service.get_review(review_id, current_user.uid)
+        review = await run_in_firestore_pool(firestore_service.get_review, review_id, current_user.uid)
         
         if not review:
             raise HTTPException(status_code=404, detail="Review not found")
@@ -5833,12 +6292,12 @@ async def get_taste_graph(
         print(f"\n🧠 Fetching taste graph for user: {current_user.email}")
         
         # Get taste graph from Firestore
-        taste_graph = firestore_service.get_taste_graph(current_user.uid)
+        taste_graph = await run_in_firestore_pool(firestore_service.get_taste_graph, current_user.uid)
         
         if not taste_graph:
             # Build taste graph from reviews
             print("   Building taste graph from reviews...")
-            reviews = firestore_service.get_user_reviews(current_user.uid)
+            reviews = await run_in_firestore_pool(firestore_service.get_user_reviews, current_user.uid)
             
             if not reviews:
                 print("   No reviews yet - returning empty taste graph")
@@ -5851,7 +6310,7 @@ async def get_taste_graph(
                     reviews
                 )
                 # Save for future
-                firestore_service.save_taste_graph(taste_graph)
+                await run_in_firestore_pool(firestore_service.save_taste_graph, taste_graph)
         
         print(f"✅ Taste graph loaded:")
         print(f"   Total Reviews: {taste_graph.total_reviews}")
@@ -5915,7 +6374,7 @@ async def rebuild_taste_graph(
     try:
         print(f"\n🔄 Rebuilding taste graph for user: {current_user.email}")
         
-        reviews = firestore_service.get_user_reviews(current_user.uid)
+        reviews = await run_in_firestore_pool(firestore_service.get_user_reviews, current_user.uid)
         
         if not reviews:
             raise HTTPException(
@@ -5929,7 +6388,7 @@ async def rebuild_taste_graph(
             reviews
         )
         
-        firestore_service.save_taste_graph(taste_graph)
+        await run_in_firestore_pool(firestore_service.save_taste_graph, taste_graph)
         
         print(f"✅ Taste graph rebuilt successfully")
         print(f"   Processed {len(reviews)} reviews")
@@ -5972,7 +6431,7 @@ async def generate_booking_links(
         print(f"   User: {current_user.email}")
         
         # Get trip plan
-        trip_plan = firestore_service.get_trip_plan(request.trip_id, current_user.uid)
+        trip_plan = await run_in_firestore_pool(firestore_service.get_trip_plan, request.trip_id, current_user.uid)
         
         if not trip_plan:
             raise HTTPException(
@@ -6109,7 +6568,7 @@ async def generate_booking_links(
         # Get user's taste graph for personalization
         taste_graph = None
         try:
-            taste_graph = firestore_service.get_taste_graph(current_user.uid)
+            taste_graph = await run_in_firestore_pool(firestore_service.get_taste_graph, current_user.uid)
             if taste_graph:
                 print(f"   ✅ Loaded taste graph (avg budget: ₹{taste_graph.budget_patterns.get('average_per_trip', 0):.0f})")
         except Exception as e:
@@ -6223,7 +6682,7 @@ async def create_voyage_board(
         print(f"   Trip: {request.trip_id}")
         
         # Verify trip exists and user owns it
-        trip_plan = firestore_service.get_trip_plan_by_id(request.trip_id, current_user.uid)
+        trip_plan = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, request.trip_id, current_user.uid)
         
         if not trip_plan:
             raise HTTPException(
@@ -6771,7 +7230,7 @@ async def export_trip_to_calendar(
         calendar_service = get_calendar_export_service(firestore_service.db)
         
         # Verify trip ownership using FirestoreService method
-        trip_data = firestore_service.get_trip_plan_by_id(request.trip_id, current_user.uid)
+        trip_data = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, request.trip_id, current_user.uid)
         
         if not trip_data:
             raise HTTPException(status_code=404, detail="Trip not found or access denied")
@@ -6851,7 +7310,7 @@ async def download_calendar_ics(
     """
     try:
         # Verify trip ownership
-        trip_data = firestore_service.get_trip_plan_by_id(trip_id, current_user.uid)
+        trip_data = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, trip_id, current_user.uid)
         
         if not trip_data:
             raise HTTPException(status_code=404, detail="Trip not found or access denied")
@@ -6914,7 +7373,7 @@ async def preview_calendar_export(
         calendar_service = get_calendar_export_service(firestore_service.db)
         
         # Verify trip ownership using FirestoreService method
-        trip_data = firestore_service.get_trip_plan_by_id(trip_id, current_user.uid)
+        trip_data = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, trip_id, current_user.uid)
         
         if not trip_data:
             raise HTTPException(status_code=404, detail="Trip not found or access denied")
@@ -6995,7 +7454,7 @@ async def download_ics_file(
         calendar_service = get_calendar_export_service(firestore_service.db)
         
         # Verify trip ownership using FirestoreService method
-        trip_data = firestore_service.get_trip_plan_by_id(trip_id, current_user.uid)
+        trip_data = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, trip_id, current_user.uid)
         
         if not trip_data:
             raise HTTPException(status_code=404, detail="Trip not found or access denied")
@@ -7287,7 +7746,7 @@ async def add_expense(
         print(f"   Category: {request.category}, Amount: ₹{request.amount}")
         
         # Verify user owns this trip
-        trip = firestore_service.get_trip_plan_by_id(request.trip_id, user_id)
+        trip = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, request.trip_id, user_id)
         if not trip:
             print(f"❌ Trip {request.trip_id} not found")
             raise HTTPException(status_code=404, detail="Trip not found")
@@ -7449,7 +7908,7 @@ async def get_expense_tracker(
         
         # Verify user owns this trip
         print(f"🔍 Fetching trip {trip_id} for user {user_id}")
-        trip = firestore_service.get_trip_plan_by_id(trip_id, user_id)
+        trip = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, trip_id, user_id)
         if not trip:
             print(f"❌ Trip {trip_id} not found for user {user_id}")
             raise HTTPException(status_code=404, detail=f"Trip {trip_id} not found")
@@ -7509,7 +7968,7 @@ async def replan_trip_with_budget(
         print(f"🔄 Replanning request for trip {trip_id} by user {user_id}")
         
         # Verify user owns this trip
-        trip = firestore_service.get_trip_plan_by_id(trip_id, user_id)
+        trip = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, trip_id, user_id)
         if not trip:
             raise HTTPException(status_code=404, detail=f"Trip {trip_id} not found")
         
@@ -7728,7 +8187,7 @@ async def get_expense_analytics(
         user_id = current_user.uid
         
         # Verify user owns this trip
-        trip = firestore_service.get_trip_plan_by_id(request.trip_id, user_id)
+        trip = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, request.trip_id, user_id)
         if not trip:
             raise HTTPException(status_code=404, detail="Trip not found")
         
@@ -7814,7 +8273,7 @@ async def adjust_budget(
         user_id = current_user.uid
         
         # Verify user owns this trip
-        trip = firestore_service.get_trip_plan_by_id(request.trip_id, user_id)
+        trip = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, request.trip_id, user_id)
         if not trip:
             raise HTTPException(status_code=404, detail="Trip not found")
         
@@ -7849,6 +8308,7 @@ async def adjust_budget(
 
 @app.get("/api/dashboard", response_model=UserDashboard)
 async def get_user_dashboard(
+    request: Request,
     current_user: FirebaseUser = Depends(get_current_user)
 ):
     """
@@ -7874,35 +8334,28 @@ async def get_user_dashboard(
     
     This is the main endpoint for the user's home screen/dashboard view.
     """
-    print(f"\n{'='*60}")
-    print(f"📊 DASHBOARD REQUEST RECEIVED")
-    print(f"{'='*60}")
-    print(f"👤 User ID: {current_user.uid}")
-    print(f"📧 User Email: {current_user.email}")
-    print(f"{'='*60}\n")
+    logger.info("[DASHBOARD] request uid=%s", current_user.uid)
     
     try:
         user_id = current_user.uid
         user_email = current_user.email
         
-        print(f"🔄 Getting dashboard service...")
         # Get dashboard service with both firestore client and service
         dashboard_service = get_dashboard_service(firestore_service.db, firestore_service)
         
-        print(f"📡 Calling get_user_dashboard...")
         # Generate complete unified dashboard
-        dashboard = dashboard_service.get_user_dashboard(user_id, user_email)
+        dashboard = await dashboard_service.get_user_dashboard(user_id, user_email)
         
-        print(f"✅ Dashboard generated successfully!")
-        print(f"📊 Stats: {dashboard.stats.total_trips} trips, {dashboard.stats.total_expenses_logged} expenses")
-        return dashboard
+        logger.info(
+            "[DASHBOARD] generated uid=%s trips=%d expenses=%d",
+            user_id, dashboard.stats.total_trips, dashboard.stats.total_expenses_logged
+        )
+        return _conditional_json_response(request, dashboard)
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error generating dashboard: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[DASHBOARD] generation failed uid=%s", current_user.uid)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -7920,7 +8373,7 @@ async def get_trip_summary(
         user_id = current_user.uid
         
         # Verify user owns this trip
-        trip = firestore_service.get_trip_plan_by_id(trip_id, user_id)
+        trip = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, trip_id, user_id)
         if not trip:
             raise HTTPException(status_code=404, detail="Trip not found")
         
@@ -7931,7 +8384,7 @@ async def get_trip_summary(
             )
         
         # Get dashboard service
-        dashboard_service = get_dashboard_service(firestore_service.db)
+        dashboard_service = get_dashboard_service(firestore_service.db, firestore_service)
         
         # Get all expenses for the user
         expense_service = get_expense_tracker_service(firestore_service.db)
@@ -7952,7 +8405,7 @@ async def get_trip_summary(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error getting trip summary: {str(e)}")
+        logger.exception("[DASHBOARD] trip summary failed trip_id=%s", trip_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -7969,15 +8422,15 @@ async def submit_trip_feedback(
     Submit post-trip feedback
     """
     try:
-        feedback_service = get_feedback_service(firestore_service.db)
+        feedback_service = get_feedback_service(firestore_service.async_db)
         
         # Verify trip ownership
-        trip = firestore_service.get_trip_plan_by_id(request.trip_id, current_user.uid)
+        trip = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, request.trip_id, current_user.uid)
         if not trip:
             raise HTTPException(status_code=404, detail="Trip not found or access denied")
         
         # Submit feedback
-        feedback = feedback_service.submit_feedback(
+        feedback = await feedback_service.submit_feedback(
             trip_id=request.trip_id,
             user_id=current_user.uid,
             rating=request.rating,
@@ -8013,14 +8466,14 @@ async def get_trip_feedback(
     Get feedback for a specific trip
     """
     try:
-        feedback_service = get_feedback_service(firestore_service.db)
+        feedback_service = get_feedback_service(firestore_service.async_db)
         
         # Verify trip ownership
-        trip = firestore_service.get_trip_plan_by_id(trip_id, current_user.uid)
+        trip = await run_in_firestore_pool(firestore_service.get_trip_plan_by_id, trip_id, current_user.uid)
         if not trip:
             raise HTTPException(status_code=404, detail="Trip not found or access denied")
         
-        feedback = feedback_service.get_trip_feedback(trip_id)
+        feedback = await feedback_service.get_trip_feedback(trip_id)
         
         if not feedback:
             return TripFeedbackResponse(
@@ -8050,8 +8503,8 @@ async def get_feedback_stats(
     Get overall feedback statistics (admin only in production)
     """
     try:
-        feedback_service = get_feedback_service(firestore_service.db)
-        stats = feedback_service.get_feedback_stats()
+        feedback_service = get_feedback_service(firestore_service.async_db)
+        stats = await feedback_service.get_feedback_stats()
         
         return FeedbackStatsResponse(
             success=True,
@@ -8067,7 +8520,6 @@ async def get_feedback_stats(
 # EXISTING ENDPOINTS (health check)
 # ============================================================================
 
-@app.on_event("startup")
 async def startup_event():
     """
     Initialize services on application startup
@@ -8086,5 +8538,5 @@ async def startup_event():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)
 
@@ -0,0 +1,118 @@
+"""
+Unit tests for FeedbackService helpers (rollup delta, seeding, history cursor)
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from feedback_service import FeedbackService
+
+pytestmark = pytest.mark.unit
+
+
+def _values(delta):
+    """Plain numbers from the Increment transforms in a rollup delta"""
+    return {
+        'total_feedback': delta['total_feedback'].value,
+        'rating_sum': delta['rating_sum'].value,
+        'recommendations': delta['recommendations'].value,
+        'highlights': {k: v.value for k, v in delta['highlights'].items()},
+        'improvements': {k: v.value for k, v in delta['improvements'].items()},
+    }
+
+
+def _feedback(rating=4, would_recommend=True, highlights=(), improvements=()):
+    return {
+        'rating': rating,
+        'would_recommend': would_recommend,
+        'highlights': list(highlights),
+        'improvements': list(improvements),
+    }
+
+
+class TestBuildStatsDelta:
+    def test_new_feedback_counts_once(self):
+        delta = FeedbackService._build_stats_delta(
+            _feedback(rating=5, highlights=['Food', 'Beaches'], improvements=['Hotels'])
+        )
+        assert _values(delta) == {
+            'total_feedback': 1,
+            'rating_sum': 5,
+            'recommendations': 1,
+            'highlights': {'Food': 1, 'Beaches': 1},
+            'improvements': {'Hotels': 1},
+        }
+
+    def test_edited_feedback_applies_only_the_difference(self):
+        previous = _feedback(rating=3, would_recommend=False, highlights=['Food'], improvements=['Hotels'])
+        current = _feedback(rating=5, would_recommend=True, highlights=['Food', 'Beaches'], improvements=['Hotels'])
+        delta = FeedbackService._build_stats_delta(current, previous)
+        assert _values(delta) == {
+            'total_feedback': 0,
+            'rating_sum': 2,
+            'recommendations': 1,
+            'highlights': {'Beaches': 1},
+            'improvements': {},
+        }
+
+    def test_removed_highlight_is_decremented(self):
+        previous = _feedback(highlights=['Food', 'Nightlife'], improvements=['Transport'])
+        current = _feedback(highlights=['Food'])
+        delta = FeedbackService._build_stats_delta(current, previous)
+        values = _values(delta)
+        assert values['highlights'] == {'Nightlife': -1}
+        assert values['improvements'] == {'Transport': -1}
+        assert values['total_feedback'] == 0
+        assert values['rating_sum'] == 0
+
+    def test_unchanged_resubmission_is_a_no_op(self):
+        feedback = _feedback(highlights=['Food'], improvements=['Hotels'])
+        values = _values(FeedbackService._build_stats_delta(feedback, dict(feedback)))
+        assert values == {
+            'total_feedback': 0,
+            'rating_sum': 0,
+            'recommendations': 0,
+            'highlights': {},
+            'improvements': {},
+        }
+
+
+class _Snapshot:
+    def __init__(self, data=None):
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return self._data
+
+
+class TestIsSeeded:
+    def test_missing_rollup_is_not_seeded(self):
+        assert FeedbackService._is_seeded(_Snapshot()) is False
+
+    def test_rollup_without_marker_is_not_seeded(self):
+        # Created by increments before the one-off rebuild ran
+        assert FeedbackService._is_seeded(_Snapshot({'total_feedback': 1})) is False
+
+    def test_rebuilt_rollup_is_seeded(self):
+        assert FeedbackService._is_seeded(_Snapshot({'total_feedback': 3, 'seeded': True})) is True
+
+
+class TestHistoryCursor:
+    def test_round_trips_timestamp_and_document_id(self):
+        created_at, doc_id = FeedbackService._parse_history_cursor(
+            '2026-03-01T10:15:00+00:00|trip1_user1'
+        )
+        assert created_at == datetime(2026, 3, 1, 10, 15, tzinfo=timezone.utc)
+        assert doc_id == 'trip1_user1'
+
+    @pytest.mark.parametrize('cursor', [
+        '2026-03-01T10:15:00+00:00',
+        '2026-03-01T10:15:00+00:00|',
+        'not-a-date|trip1_user1',
+        '2026-03-01T10:15:00+00:00|trip_plans/abc',
+    ])
+    def test_malformed_cursor_raises_value_error(self, cursor):
+        with pytest.raises(ValueError):
+            FeedbackService._parse_history_cursor(cursor)
@@ -0,0 +1,66 @@
+"""
+Unit tests for security alert channel selection
+"""
+
+import pytest
+
+from notification_service import NotificationService
+
+pytestmark = pytest.mark.unit
+
+
+ALERT = {
+    'severity': 'high',
+    'title': 'Flooding',
+    'message': 'Roads closed near the river',
+    'location': 'Goa',
+}
+
+
+@pytest.fixture
+def service():
+    """Service with no provider credentials, so sends fail fast without network"""
+    svc = NotificationService()
+    svc.twilio_client = None
+    svc.smtp_email = None
+    svc.smtp_password = None
+    return svc
+
+
+def _profile(**prefs):
+    return {
+        'phone_number': '+919876543210',
+        'email': 'traveller@example.com',
+        'notification_preferences': prefs,
+    }
+
+
+class TestSendSecurityAlert:
+    async def test_all_channels_enabled_by_default(self, service):
+        results = await service.send_security_alert(ALERT, _profile())
+        assert [r['phone_number'] for r in results['sms']] == ['+919876543210']
+        assert [r['phone_number'] for r in results['whatsapp']] == ['+919876543210']
+        assert [r['email'] for r in results['email']] == ['traveller@example.com']
+
+    async def test_disabled_channels_are_skipped(self, service):
+        results = await service.send_security_alert(
+            ALERT, _profile(sms_enabled=False, email_enabled=False)
+        )
+        assert results['sms'] == []
+        assert results['email'] == []
+        assert len(results['whatsapp']) == 1
+
+    async def test_whatsapp_number_overrides_phone(self, service):
+        results = await service.send_security_alert(
+            ALERT, _profile(whatsapp_number='+911234567890')
+        )
+        assert results['whatsapp'][0]['phone_number'] == '+911234567890'
+
+    async def test_unconfigured_providers_report_failure(self, service):
+        results = await service.send_security_alert(ALERT, _profile())
+        assert results['sms'][0] == {
+            'phone_number': '+919876543210',
+            'success': False,
+            'error': 'Twilio not configured',
+        }
+        assert results['email'][0]['success'] is False
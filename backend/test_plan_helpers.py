@@ -0,0 +1,87 @@
+"""
+Unit tests for the pure helpers behind /api/plan-trip-from-prompt
+"""
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.unit
+
+
+class TestFastIntent:
+    @pytest.mark.parametrize("prompt", ["hello", "Hey there!", "  namaste ", "Thanks!", "thank you"])
+    def test_bare_greetings_skip_the_model(self, prompt):
+        conversation = server._fast_intent(prompt)
+        assert conversation is not None
+        assert conversation.intent == "GREETING"
+        assert conversation.response_text.strip()
+
+    @pytest.mark.parametrize("prompt", [
+        "What to pack for a 5 day trip to Manali?",
+        "Where should I go for a 3 day trip?",
+        "Is 4 days enough to visit Kerala?",
+        "Can I modify my 5 day plan to add more activities?",
+        "5 day Goa trip from Mumbai",
+        "hi, plan a 5 day trip to Goa",
+        "thanks, now plan Kerala",
+    ])
+    def test_everything_else_goes_to_the_model(self, prompt):
+        assert server._fast_intent(prompt) is None
+
+
+class TestConversationCacheKey:
+    def test_ignores_case_spacing_and_trailing_punctuation(self):
+        key = server._conversation_cache_key("Tell me about   Kerala")
+        assert server._conversation_cache_key("tell me about kerala?!") == key
+        assert server._conversation_cache_key("  TELL ME ABOUT KERALA. ") == key
+
+    def test_different_questions_get_different_keys(self):
+        assert (
+            server._conversation_cache_key("Tell me about Kerala")
+            != server._conversation_cache_key("Tell me about Goa")
+        )
+
+
+class TestIsMissing:
+    @pytest.mark.parametrize("value", [None, "", "Not specified", "UNKNOWN", "n/a", "Anywhere", 0, -2, 0.0])
+    def test_placeholders_and_non_positive_numbers_are_missing(self, value):
+        assert server._is_missing(value)
+
+    @pytest.mark.parametrize("value", ["Goa", "2025-12-25", 1, 5, 50000.0])
+    def test_real_values_are_present(self, value):
+        assert not server._is_missing(value)
+
+
+class TestTripFieldSpec:
+    def test_fields_exist_on_trip_details(self):
+        model_fields = set(server.TripDetails.model_fields)
+        for field, *_ in server._TRIP_FIELD_SPEC:
+            assert field in model_fields
+
+    def test_required_fields_have_a_name_and_question(self):
+        for field, missing_name, question, summary in server._TRIP_FIELD_SPEC:
+            assert (missing_name is None) == (question is None), field
+            assert "{}" in summary, field
+
+
+class TestBudgetAmountPatterns:
+    def test_rupee_prefixes(self):
+        text = "Hostels from ₹1200, meals Rs. 300, cabs Rs 800 and tours INR 2500"
+        assert server._RUPEE_RE.findall(text) == ["1200", "300", "800", "2500"]
+
+    def test_rupee_ignores_stray_periods_and_words_ending_in_s(self):
+        text = "Version 2.5000 of the guide lists 3 days 4000 steps"
+        assert server._RUPEE_RE.findall(text) == []
+
+    def test_extracted_minimum_marker(self):
+        text = "**EXTRACTED MINIMUM: ₹ 2800 per person per day**"
+        assert server._EXTRACTED_MIN_RE.search(text).group(1) == "2800"
+
+    def test_dollar_amounts(self):
+        assert server._DOLLAR_RE.findall("about $40 a day, $ 55 in peak season") == ["40", "55"]
+
+
+class TestResearchKey:
+    def test_case_and_surrounding_space_share_a_key(self):
+        assert server._research_key("Goa") == server._research_key(" goa ") == server._research_key("GOA")
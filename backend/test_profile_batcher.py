@@ -0,0 +1,138 @@
+"""
+Unit tests for ProfileBatcher (coalesced user profile lookups)
+"""
+
+import asyncio
+
+import pytest
+
+from firestore_service import ProfileBatcher
+
+pytestmark = pytest.mark.unit
+
+
+class _Ref:
+    def __init__(self, doc_id):
+        self.id = doc_id
+
+
+class _Snapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _Collection:
+    def document(self, doc_id):
+        return _Ref(doc_id)
+
+
+class FakeAsyncDB:
+    """Just enough of the async Firestore client for get_all lookups"""
+
+    def __init__(self, profiles, error=None):
+        self.profiles = profiles
+        self.error = error
+        self.calls = []
+
+    def collection(self, name):
+        return _Collection()
+
+    async def get_all(self, refs):
+        self.calls.append([ref.id for ref in refs])
+        if self.error:
+            raise self.error
+        for ref in refs:
+            yield _Snapshot(ref.id, self.profiles.get(ref.id))
+
+
+class FakeProfileCache:
+    def __init__(self, cached=None):
+        self.cached = dict(cached or {})
+
+    def get_cached_user_profile(self, user_id):
+        return self.cached.get(user_id)
+
+    def cache_user_profile(self, user_id, profile):
+        self.cached[user_id] = profile
+
+
+PROFILES = {'alice': {'name': 'Alice'}, 'bob': {'name': 'Bob'}}
+
+
+class TestProfileBatcher:
+    async def test_concurrent_lookups_share_one_deduplicated_fetch(self):
+        db = FakeAsyncDB(PROFILES)
+        batcher = ProfileBatcher(db)
+
+        results = await asyncio.gather(
+            batcher.get('alice'), batcher.get('bob'), batcher.get('alice'), batcher.get('carol')
+        )
+
+        assert db.calls == [['alice', 'bob', 'carol']]
+        assert results == [
+            {'name': 'Alice', 'id': 'alice'},
+            {'name': 'Bob', 'id': 'bob'},
+            {'name': 'Alice', 'id': 'alice'},
+            None,
+        ]
+        # Duplicate callers get independent copies
+        assert results[0] is not results[2]
+
+    async def test_batches_are_capped_at_max_batch(self):
+        db = FakeAsyncDB({})
+        batcher = ProfileBatcher(db)
+        user_ids = [f'user{i}' for i in range(ProfileBatcher.MAX_BATCH + 5)]
+
+        await asyncio.gather(*(batcher.get(uid) for uid in user_ids))
+
+        assert [len(call) for call in db.calls] == [ProfileBatcher.MAX_BATCH, 5]
+
+    async def test_lookups_after_the_wait_window_start_a_new_batch(self):
+        db = FakeAsyncDB(PROFILES)
+        batcher = ProfileBatcher(db)
+
+        await batcher.get('alice')
+        await asyncio.sleep(ProfileBatcher.MAX_WAIT_MS / 1000 * 2)
+        await batcher.get('bob')
+
+        assert db.calls == [['alice'], ['bob']]
+
+    async def test_fetch_error_reaches_every_waiter(self):
+        db = FakeAsyncDB(PROFILES, error=RuntimeError('unavailable'))
+        batcher = ProfileBatcher(db)
+
+        results = await asyncio.gather(batcher.get('alice'), batcher.get('bob'), return_exceptions=True)
+
+        assert len(db.calls) == 1
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def test_cache_hit_skips_firestore_and_misses_fill_it(self):
+        db = FakeAsyncDB(PROFILES)
+        cache = FakeProfileCache({'alice': {'name': 'Cached Alice', 'id': 'alice'}})
+        batcher = ProfileBatcher(db, profile_cache=cache)
+
+        assert await batcher.get('alice') == {'name': 'Cached Alice', 'id': 'alice'}
+        assert await batcher.get('bob') == {'name': 'Bob', 'id': 'bob'}
+        assert db.calls == [['bob']]
+        assert cache.cached['bob'] == {'name': 'Bob', 'id': 'bob'}
+
+
+def test_worker_is_restarted_on_a_new_event_loop():
+    db = FakeAsyncDB(PROFILES)
+    batcher = ProfileBatcher(db)
+
+    async def lookup(user_id):
+        return await asyncio.wait_for(batcher.get(user_id), timeout=1)
+
+    # Close the first loop without cancelling its tasks, leaving the worker
+    # pending (not done) on a loop that will never run again
+    first_loop = asyncio.new_event_loop()
+    assert first_loop.run_until_complete(lookup('alice')) == {'name': 'Alice', 'id': 'alice'}
+    first_loop.close()
+
+    assert asyncio.run(lookup('bob')) == {'name': 'Bob', 'id': 'bob'}